@@ -1,13 +1,17 @@
+# app/badges_radar.py 〔v8R7〕
+# 報表徽章：純衍生計算，只讀報表已抓好的報價快取與背景預算的新聞，不打任何上游。
 from __future__ import annotations
-import re, time
+import time
 from typing import List
 from app.state_store import get_state, save_state
 from app import us_stocks, us_news, news_scoring
+from app.lexicon import Lexicon
 
 # —— 門檻（可視需要調整或改成讀環境變數）—— #
 THRESH_RISK_ON_HIGH = 60
 THRESH_RISK_ON_LOW  = 40
 THRESH_NEWS_HOT     = 70  # BTC/ETH 任一達標即觸發
+RISK_QUOTES_MAX_AGE = 12 * 3600   # 報價快取超過此秒數就不判斷風險（休市期間沿用最後收盤）
 
 # 政策/監管正負關鍵詞（中文為主，兼顧英字）
 POLICY_POS = [
@@ -19,6 +23,8 @@ POLICY_NEG = [
     r"reject", r"rejected", r"delay", r"ban", r"sue", r"lawsuit", r"sanction", r"fine",
 ]
 
+_POLICY = Lexicon(pos=POLICY_POS, neg=POLICY_NEG)
+
 # 僅做主題名稱過濾，鎖定較可能屬政策向的 topic
 POLICY_TOPICS_HINT = [
     "FOMC", "Federal Reserve", "CPI", "PCE", "Nonfarm Payrolls",
@@ -26,12 +32,10 @@ POLICY_TOPICS_HINT = [
 ]
 
 def _risk_badge() -> List[str]:
-    # 從 us_stocks 組好的區塊中提取 Risk-On 數值
-    blk = us_stocks.format_us_block(phase="night")  # 內含 Risk-On：xx
-    m = re.search(r"Risk\-On[:：]\s*(\d+)", blk)
-    if not m:
+    # Risk-On 指數：優先用 S&P 500 廣度彙整，沒有才看報表最近抓到的十檔報價（都沒有就不判斷）
+    val = us_stocks.risk_on(us_stocks.cached_quotes(RISK_QUOTES_MAX_AGE), max_age=RISK_QUOTES_MAX_AGE)
+    if val is None:
         return []
-    val = int(m.group(1))
     if val >= THRESH_RISK_ON_HIGH:
         return ["風險開"]
     if val <= THRESH_RISK_ON_LOW:
@@ -39,19 +43,17 @@ def _risk_badge() -> List[str]:
     return []
 
 def _policy_badge() -> List[str]:
-    # 抓美股中文新聞重點，僅選政策相關主題，做簡易淨分（正負關鍵詞）
-    topics = us_news.us_recent_news(k_each=3)  # {topic: [{title_zh, ...}, ...]}
+    # 只讀背景預算的美股新聞（政策相關主題），做簡易淨分（正負關鍵詞）
+    topics = [t for t in us_news.US_SYMBOLS_NEWS
+              if any(hint.lower() in t.lower() for hint in POLICY_TOPICS_HINT)]
+    peeks = news_scoring.peek_many(topics, k=3)
     pos = neg = 0
-    for topic, heads in topics.items():
-        # 只計算較像政策面的主題
-        is_policy_topic = any(hint.lower() in topic.lower() for hint in POLICY_TOPICS_HINT)
-        if not is_policy_topic:
-            continue
-        for h in heads:
-            t = h.get("title_zh", "")
-            if any(re.search(p, t, re.I) for p in POLICY_POS):
+    for p in peeks.values():
+        for h in (p["headlines"] if p else []):
+            p_hits, n_hits = _POLICY.hits(h.get("title_zh", ""))
+            if p_hits:
                 pos += 1
-            if any(re.search(n, t, re.I) for n in POLICY_NEG):
+            if n_hits:
                 neg += 1
     if pos == 0 and neg == 0:
         return []
@@ -62,10 +64,11 @@ def _policy_badge() -> List[str]:
     return []  # 打平不顯示，避免噪音
 
 def _news_hot_badge() -> List[str]:
-    # 以 BTC/ETH 作為整體加密新聞熱度代理
+    # 以 BTC/ETH 作為整體加密新聞熱度代理（讀背景預算結果，不阻塞）
     try:
-        s_btc = news_scoring.get_news_score("BTC")
-        s_eth = news_scoring.get_news_score("ETH")
+        pk = news_scoring.peek_many(["BTC", "ETH"], k=0)
+        s_btc = pk["BTC"]["score"] if pk.get("BTC") else 0
+        s_eth = pk["ETH"]["score"] if pk.get("ETH") else 0
         if max(s_btc, s_eth) >= THRESH_NEWS_HOT:
             return ["新聞🔥"]
     except Exception:
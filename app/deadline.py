@@ -0,0 +1,82 @@
+# app/deadline.py 〔v8R7-DL〕
+# 請求層級的時間預算：compose_report / webhook 指令開一個 scope，底下所有上游呼叫
+# 把 timeout 縮到剩餘預算、預算不足時直接放棄（DeadlineExceeded），選配工作（多抓新聞、附價）也據此略過，
+# 讓報表最壞延遲有上限。以 contextvar 傳遞：async task / to_thread 自動帶入，自建執行緒池用 bind()。
+from __future__ import annotations
+import os, time, contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+REPORT_BUDGET_SEC = float(os.environ.get("SENTINEL_REPORT_BUDGET", "25"))
+WEBHOOK_BUDGET_SEC = float(os.environ.get("SENTINEL_WEBHOOK_BUDGET", "8"))
+MIN_CALL_SEC = 0.3          # 剩餘預算低於此值就不再發上游請求
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+class Deadline:
+    __slots__ = ("at", "budget")
+
+    def __init__(self, budget: float):
+        self.budget = float(budget)
+        self.at = time.monotonic() + self.budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("sentinel_deadline", default=None)
+
+@contextmanager
+def scope(budget: float) -> Iterator[Deadline]:
+    """開一個預算 scope；巢狀時取較緊的那個"""
+    outer = _current.get()
+    d = Deadline(budget)
+    if outer is not None and outer.at < d.at:
+        d = outer
+    tok = _current.set(d)
+    try:
+        yield d
+    finally:
+        _current.reset(tok)
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """背景工作（SWR 背景更新等）不受觸發它的請求預算限制"""
+    tok = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(tok)
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+def remaining() -> Optional[float]:
+    d = _current.get()
+    return None if d is None else d.remaining()
+
+def allows(sec: float) -> bool:
+    """剩餘預算是否還夠做一件約需 sec 秒的選配工作（無 scope 時永遠為真）"""
+    r = remaining()
+    return r is None or r >= sec
+
+def timeout(default: float) -> float:
+    """把單次呼叫的 timeout 縮到剩餘預算；預算已耗盡則拋 DeadlineExceeded"""
+    r = remaining()
+    if r is None:
+        return default
+    if r < MIN_CALL_SEC:
+        raise DeadlineExceeded("request budget exhausted")
+    return min(default, r)
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """把目前的預算帶進自建執行緒池（ThreadPoolExecutor 不會自動複製 contextvar）"""
+    d = _current.get()
+
+    def run(*a, **kw):
+        tok = _current.set(d)
+        try:
+            return fn(*a, **kw)
+        finally:
+            _current.reset(tok)
+    return run
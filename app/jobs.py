@@ -0,0 +1,178 @@
+# app/jobs.py 〔v8R7-JOBS〕
+# 背景工作佇列：webhook 先秒回「處理中」，耗時指令丟進佇列由 worker 執行，完成後再推播。
+# - 優先序：interactive（LINE 指令）> report（排程報表）> warm（/admin/warm 刷新）
+# - 每類有獨立並行上限，另有全域上限；有空位時永遠先跑高優先序
+# - 跑在 event loop 上：async 工作直接 await，同步工作丟 threadpool；排程執行緒可跨執行緒投遞
+#   （佇列與計數以 threading.Lock 保護，跨執行緒只透過 call_soon_threadsafe 喚醒 dispatcher）
+from __future__ import annotations
+import time, asyncio, inspect, threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+INTERACTIVE, REPORT, WARM = "interactive", "report", "warm"
+CLASSES = (INTERACTIVE, REPORT, WARM)              # 依優先序排列
+CLASS_LIMITS = {INTERACTIVE: 4, REPORT: 2, WARM: 1}
+GLOBAL_LIMIT = 5
+MAX_DEPTH = 200                                      # 單類排隊上限，超過直接拒收
+
+class Job:
+    __slots__ = ("name", "cls", "fn", "submitted", "started")
+
+    def __init__(self, name: str, cls: str, fn: Callable[[], Any]):
+        self.name, self.cls, self.fn = name, cls, fn
+        self.submitted = time.time()
+        self.started = 0.0
+
+class JobQueue:
+    def __init__(self):
+        self._queues: Dict[str, Deque[Job]] = {c: deque() for c in CLASSES}
+        self._running: Dict[str, int] = {c: 0 for c in CLASSES}
+        self._metrics: Dict[str, Dict[str, float]] = {
+            c: {"submitted": 0, "done": 0, "failed": 0, "rejected": 0,
+                "wait_ms_sum": 0.0, "wait_ms_max": 0.0, "run_ms_sum": 0.0} for c in CLASSES
+        }
+        self._last_error: Dict[str, str] = {}
+        self._lock = threading.Lock()          # 保護 _queues 與 submitted/rejected 計數（submit 可來自任何執行緒）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: set = set()
+
+    # ---- 啟動（需在 event loop 內呼叫） ---- #
+    def start(self) -> None:
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._spawn(self._dispatch())
+
+    def _spawn(self, coro) -> None:
+        t = self._loop.create_task(coro)
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+    # ---- 投遞 ---- #
+    def submit(self, cls: str, name: str, fn: Callable[[], Any]) -> bool:
+        """投遞工作（任何執行緒皆可）；佇列已滿回 False。佇列尚未啟動時直接同步執行。"""
+        if cls not in self._queues:
+            raise ValueError(f"unknown job class: {cls}")
+        job = Job(name, cls, fn)
+        if self._loop is None:
+            return self._run_inline(job)
+        with self._lock:
+            if len(self._queues[cls]) >= MAX_DEPTH:
+                self._metrics[cls]["rejected"] += 1
+                return False
+            self._queues[cls].append(job)
+            self._metrics[cls]["submitted"] += 1
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def _run_inline(self, job: Job) -> bool:
+        # 佇列未啟動（啟動前/腳本）：同步工作就地執行；async 工作只在本執行緒已有 event loop 時排進去，
+        # 不另開臨時 loop（共用的 upstream AsyncClient 不能綁在用完即丟的 loop 上）
+        try:
+            if inspect.iscoroutinefunction(job.fn):
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    print(f"[JOBS] inline {job.name} skipped: async job without a running loop")
+                    return False
+                task = loop.create_task(job.fn())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                return True
+            res = job.fn()
+            if inspect.isawaitable(res):
+                print(f"[JOBS] inline {job.name}: returned awaitable ignored (no running queue)")
+                getattr(res, "close", lambda: None)()
+        except Exception as e:
+            print(f"[JOBS] inline {job.name} failed:", e)
+        return True
+
+    # ---- 排程 ---- #
+    def _next_runnable(self) -> Optional[Job]:
+        if sum(self._running.values()) >= GLOBAL_LIMIT:
+            return None
+        with self._lock:
+            for c in CLASSES:
+                if self._queues[c] and self._running[c] < CLASS_LIMITS[c]:
+                    return self._queues[c].popleft()
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                job = self._next_runnable()
+                if job is None:
+                    break
+                self._running[job.cls] += 1
+                self._spawn(self._run(job))
+
+    async def _run(self, job: Job) -> None:
+        m = self._metrics[job.cls]
+        job.started = time.time()
+        wait_ms = (job.started - job.submitted) * 1000
+        m["wait_ms_sum"] += wait_ms
+        m["wait_ms_max"] = max(m["wait_ms_max"], wait_ms)
+        try:
+            if inspect.iscoroutinefunction(job.fn):
+                await job.fn()
+            else:
+                res = await asyncio.to_thread(job.fn)
+                if inspect.isawaitable(res):
+                    await res
+            m["done"] += 1
+        except Exception as e:
+            m["failed"] += 1
+            self._last_error[job.cls] = f"{job.name}: {e}"
+            print(f"[JOBS] {job.name} failed:", e)
+        finally:
+            m["run_ms_sum"] += (time.time() - job.started) * 1000
+            self._running[job.cls] -= 1
+            self._wake.set()
+
+    # ---- 指標 ---- #
+    def metrics(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"started": self._loop is not None, "global_limit": GLOBAL_LIMIT, "classes": {}}
+        with self._lock:
+            depth = {c: len(self._queues[c]) for c in CLASSES}
+        for c in CLASSES:
+            m = self._metrics[c]
+            finished = max(1, int(m["done"] + m["failed"]))
+            started = max(1, int(m["done"] + m["failed"] + self._running[c]))
+            out["classes"][c] = {
+                "depth": depth[c],
+                "running": self._running[c],
+                "limit": CLASS_LIMITS[c],
+                "submitted": int(m["submitted"]), "done": int(m["done"]),
+                "failed": int(m["failed"]), "rejected": int(m["rejected"]),
+                "wait_ms_avg": round(m["wait_ms_sum"] / started, 1),
+                "wait_ms_max": round(m["wait_ms_max"], 1),
+                "run_ms_avg": round(m["run_ms_sum"] / finished, 1),
+                "last_error": self._last_error.get(c, ""),
+            }
+        return out
+
+    def pending(self) -> List[str]:
+        with self._lock:
+            return [j.name for c in CLASSES for j in self._queues[c]]
+
+QUEUE = JobQueue()
+
+def start() -> None:
+    QUEUE.start()
+
+def submit(cls: str, name: str, fn: Callable[[], Any]) -> bool:
+    return QUEUE.submit(cls, name, fn)
+
+def metrics() -> Dict[str, Any]:
+    return QUEUE.metrics()
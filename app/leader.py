@@ -0,0 +1,70 @@
+# app/leader.py 〔v8R7-LEADER〕
+# 排程 leader 選舉：多個 uvicorn worker 共用一個本機檔案鎖（fcntl.flock），
+# 拿到鎖的 worker 才跑排程（四報、watch_keeper、徽章/新聞刷新）；其餘 worker 只處理 webhook。
+# 鎖跟著程序走：leader 當掉或重啟時 OS 自動釋放，其他 worker 輪詢到後接手。
+from __future__ import annotations
+import os, time, threading
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:          # 非 POSIX（本機開發）：單程序，直接當 leader
+    fcntl = None  # type: ignore
+
+LOCK_PATH = os.environ.get("SENTINEL_LEADER_LOCK", "/tmp/sentinel-v8.leader.lock")
+POLL_SEC = float(os.environ.get("SENTINEL_LEADER_POLL", "5"))
+
+_fd: Optional[int] = None
+_since = 0
+_lock = threading.Lock()
+_watcher: Optional[threading.Thread] = None
+
+def try_acquire() -> bool:
+    """非阻塞取鎖；成功後把 pid 寫進鎖檔（僅供觀察）"""
+    global _fd, _since
+    with _lock:
+        if _fd is not None:
+            return True
+        if fcntl is None:
+            _fd, _since = -1, int(time.time())
+            return True
+        fd = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        _fd, _since = fd, int(time.time())
+        return True
+
+def is_leader() -> bool:
+    return _fd is not None
+
+def run_when_leader(on_elected: Callable[[], None]) -> bool:
+    """立刻嘗試當 leader；失敗則背景輪詢，接手時呼叫 on_elected。回傳目前是否為 leader。"""
+    global _watcher
+    if try_acquire():
+        on_elected()
+        return True
+    if _watcher is None:
+        def loop():
+            while not try_acquire():
+                time.sleep(POLL_SEC)
+            print(f"[LEADER] pid={os.getpid()} took over scheduler")
+            on_elected()
+        _watcher = threading.Thread(target=loop, name="leader-poll", daemon=True)
+        _watcher.start()
+    return False
+
+def holder_pid() -> Optional[int]:
+    try:
+        with open(LOCK_PATH, "r") as f:
+            return int(f.read().strip() or 0) or None
+    except Exception:
+        return None
+
+def status() -> Dict[str, Any]:
+    return {"pid": os.getpid(), "leader": is_leader(), "since": _since or None,
+            "holder_pid": holder_pid(), "lock": LOCK_PATH, "poll_sec": POLL_SEC}
@@ -0,0 +1,65 @@
+# app/lexicon.py 〔v8R7-LEX〕
+# 關鍵詞情緒比對引擎：詞庫中的純字面詞在建構時編譯成一支重疊前瞻（lookahead）regex，
+# 每則標題只掃一遍；含正規語法的 pattern（如 ETF.*(通過|批准)）則逐一 re.search，語意與舊迴圈一致。
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+_META = set(".^$*+?{}[]|()")
+
+def _literal(pattern: str) -> Optional[str]:
+    """若 pattern 其實是純字面字串（允許 \\- 這類跳脫），回傳小寫字面值；否則 None"""
+    if re.search(r"\\[A-Za-z0-9]", pattern):
+        return None
+    s = re.sub(r"\\(.)", r"\1", pattern)
+    if any(c in _META for c in s):
+        return None
+    return s.lower()
+
+class Lexicon:
+    """正/負兩組 pattern 的命中比對（具名群組 a<i>=正、b<i>=負）。
+
+    計分語意與逐一 re.search 相同：每個 pattern 命中即計 1 次（不重複計）。
+    - 字面詞：包成 (?=...) 前瞻，finditer 在每個位置都試一次（可重疊）；同一位置依長度由長到短試，
+      長詞命中時一併記入它所包含的短詞（approved ⊃ approve、sell-off ⊃ sell）
+    - 非字面 pattern：交替式會讓先出現的分支吃掉後面的詞，故逐一搜尋
+    """
+
+    def __init__(self, pos: Sequence[str] = (), neg: Sequence[str] = (), flags: int = re.I):
+        self.pos = list(pos)
+        self.neg = list(neg)
+        names = [f"a{i}" for i in range(len(self.pos))] + [f"b{i}" for i in range(len(self.neg))]
+        pats = self.pos + self.neg
+        lits = {n: _literal(p) for n, p in zip(names, pats)}
+        lit_names = sorted((n for n in names if lits[n]), key=lambda n: -len(lits[n]))
+        body = "|".join(f"(?P<{n}>{re.escape(lits[n])})" for n in lit_names)
+        self._re = re.compile(f"(?=(?:{body}))", flags) if body else None
+        self._others: List[Tuple[str, "re.Pattern[str]"]] = [
+            (n, re.compile(p, flags)) for n, p in zip(names, pats) if not lits[n]]
+        self._implied: Dict[str, List[str]] = {
+            n: [m for m in lit_names if m != n and lits[m] in lits[n]] for n in lit_names
+        }
+
+    def hits(self, text: str) -> Tuple[Set[int], Set[int]]:
+        """字面詞單次掃描 + 非字面 pattern 逐一搜尋；回傳 (命中的正詞索引, 命中的負詞索引)"""
+        pos: Set[int] = set(); neg: Set[int] = set()
+        if not text:
+            return pos, neg
+        names: Set[str] = set()
+        if self._re is not None:
+            for m in self._re.finditer(text):
+                n = m.lastgroup
+                if n and n not in names:
+                    names.add(n)
+                    names.update(self._implied.get(n, ()))
+        names.update(n for n, rx in self._others if rx.search(text))
+        for n in names:
+            (pos if n[0] == "a" else neg).add(int(n[1:]))
+        return pos, neg
+
+    def score(self, text: str) -> float:
+        p, n = self.hits(text)
+        return float(len(p) - len(n))
+
+    def score_many(self, texts: Sequence[str]) -> List[float]:
+        return [self.score(t) for t in texts]
@@ -1,17 +1,18 @@
 # =========================
 # app/main.py 〔覆蓋版・v8R7-HF｜限流快取保命〕
 # 變更重點：
-# - 對 trend_integrator.generate_side / generate_report 加「兩次快速重試 + 60s 快取 + 失敗回退」
+# - 對 trend_integrator.trend_result（結構化多空候選）走 SWR 快取（60s soft TTL、背景更新、失敗回退）
 # - 排程與 LINE 指令「今日強勢／今日弱勢」都走同一套保命流程
 # - 其餘維持 v8R7 行為（顯示價格、台/美股區塊、版本核對、手動重發四報）
 # ＊所有回覆帶【v8R7-HF】
 # =========================
 
 from __future__ import annotations
-import os, re, time, json, hashlib, inspect
+import os, re, time, json, asyncio
 from zoneinfo import ZoneInfo
 from typing import Dict, Any, Tuple, List, Optional
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from app.state_store import get_state, save_state, set_watch, cleanup_expired, list_watches
@@ -20,137 +21,30 @@ from app.services import watches as W
 from app import trend_integrator, news_scoring
 from app import us_stocks, us_news
 from app import badges_radar
+from app import swr
 from app import tw_stocks
+from app import news_refresher
+from app import upstream
+from app import jobs
+from app import deadline
+from app import sections
+from app import leader
+from app import quotes
+from app import tw_universe
+from app import us_breadth
 try:
     from app import tw_news
 except Exception:
     tw_news = None  # type: ignore
 
-# ===== save_state 相容層 =====
-import inspect as _ins
-try:
-    _SAVE_WANTS_ARG = len(_ins.signature(save_state).parameters) >= 1
-except Exception:
-    _SAVE_WANTS_ARG = False
-
-def _persist(st=None):
-    try:
-        if _SAVE_WANTS_ARG and st is not None:
-            save_state(st)  # type: ignore
-        else:
-            save_state()
-    except TypeError:
-        try: save_state()
-        except Exception as e: print("[STATE] save_state failed:", e)
-    except Exception as e:
-        print("[STATE] save_state failed:", e)
-
-# ===== 版本差異 fallback =====
-BASELINE_PATH = "/tmp/sentinel-v8.version-prev.json"
-SCAN_ROOT = "."
-
-def _iter_files(root: str):
-    skip_dirs = {".git", "__pycache__", ".venv", "venv", ".render"}
-    for dirpath, dirnames, filenames in os.walk(root):
-        dn = os.path.basename(dirpath)
-        if dn in skip_dirs or "/.venv/" in dirpath or "/venv/" in dirpath:
-            continue
-        for fn in filenames:
-            if fn.endswith((".py", ".json", ".txt", ".md", ".yaml", ".yml")) or "." in fn:
-                p = os.path.join(dirpath, fn)
-                try:
-                    size = os.path.getsize(p)
-                    if size > 262_144: continue
-                except Exception:
-                    continue
-                yield p
-
-import hashlib as _hl
-def _fingerprint(path: str) -> Tuple[int, int, str]:
-    try:
-        st = os.stat(path); size, mtime = int(st.st_size), int(st.st_mtime)
-        h = _hl.sha1()
-        with open(path, "rb") as f: h.update(f.read())
-        return size, mtime, h.hexdigest()[:8]
-    except Exception:
-        return 0, 0, ""
-
-def _snapshot(root: str) -> Dict[str, Any]:
-    items = {}
-    root = os.path.abspath(root)
-    for p in _iter_files(root):
-        rp = os.path.relpath(p, root)
-        size, mtime, sh = _fingerprint(p)
-        if sh: items[rp] = {"size": size, "mtime": mtime, "sha": sh}
-    return {"root": root, "ts": int(time.time()), "items": items}
-
-def _diff(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
-    A, B = a.get("items", {}), b.get("items", {})
-    add, delete, modify = [], [], []
-    for k in B:
-        if k not in A: add.append(k)
-        else:
-            if A[k].get("sha") != B[k].get("sha"): modify.append(k)
-    for k in A:
-        if k not in B: delete.append(k)
-    return {"add": sorted(add), "delete": sorted(delete), "modify": sorted(modify)}
-
-def _mk_summary(delta: Dict[str, Any], limit: int = 10) -> str:
-    a, d, m = len(delta["add"]), len(delta["delete"]), len(delta["modify"])
-    lines = [f"📦 版本差異：+{a} −{d} ✎{m}（顯示最多 {limit} 筆）"]
-    def cut(lst, mark):
-        for i, k in enumerate(lst[:limit], 1):
-            lines.append(f"{mark} {i}. {k}")
-    cut(delta["add"], "+"); cut(delta["modify"], "✎"); cut(delta["delete"], "−")
-    return "\n".join(lines)
-
-class _VersionDiffFallback:
-    @staticmethod
-    def checkpoint_now(root: str = SCAN_ROOT) -> Dict[str, Any]:
-        snap = _snapshot(root)
-        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
-            json.dump(snap, f, ensure_ascii=False)
-        return {"ok": True, "count": len(snap["items"])}
-
-    @staticmethod
-    def diff_now_vs_prev(root: str = SCAN_ROOT) -> Dict[str, Any]:
-        now = _snapshot(root)
-        try:
-            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
-                prev = json.load(f)
-        except Exception:
-            prev = {"items": {}}
-        delta = _diff(prev, now)
-        return {"delta": delta, "summary": _mk_summary(delta), "now_count": len(now["items"])}
-
-    @staticmethod
-    def get_version_badge() -> Tuple[bool, str]:
-        try:
-            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
-                prev = json.load(f)
-        except Exception:
-            prev = {"items": {}}
-        now = _snapshot(SCAN_ROOT)
-        d = _diff(prev, now)
-        n = len(d["add"]) + len(d["delete"]) + len(d["modify"])
-        return (n > 0, f"版本Δ({n})") if n > 0 else (False, "")
-
-try:
-    from app.services import version_diff as version_diff  # type: ignore
-    if version_diff is None: raise ImportError("version_diff None")
-except Exception:
-    version_diff = _VersionDiffFallback()  # type: ignore
-
-# ============ LINE ============
-from linebot import LineBotApi
-from linebot.models import TextSendMessage
+# ===== 版本差異 =====
+from app.services import version_diff
 
 TZ = ZoneInfo("Asia/Taipei")
 app = FastAPI(title="sentinel-v8")
 
 LINE_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN", "")
 LINE_PUSH_TO = os.getenv("LINE_PUSH_TO", "")
-line_bot_api = LineBotApi(LINE_ACCESS_TOKEN) if LINE_ACCESS_TOKEN else None
 
 # ===== Token 驗證（喚醒/觸發）=====
 WAKER_TOKEN = os.getenv("WAKER_TOKEN", "")
@@ -167,107 +61,82 @@ def ensure_prefs_defaults():
     prefs.setdefault("enable_tw", True)
     prefs.setdefault("show_price", True)
     st.setdefault("manual_push_ts", {})
-    st.setdefault("cache", {})  # ★ for trend cache
-    _persist(st)
+    st.pop("cache", None)  # 舊版趨勢快取已移到 swr（state_store blob）
+    save_state()
     return prefs
 
-# ========= 推播 =========
-def push_to_line(text: str):
+# ========= LINE（回覆/推播同一條路：Messaging API 走 upstream 共用連線池；排程執行緒用同步版，event loop 用 async 版）=========
+LINE_API = "https://api.line.me/v2/bot/message"
+
+def _line_headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {LINE_ACCESS_TOKEN}"}
+
+def _line_text(key: str, target: str, text: str) -> Dict[str, Any]:
+    return {key: target, "messages": [{"type": "text", "text": text}]}
+
+def push_to_line(text: str, to: str = ""):
     msg = f"【v8R7-HF】{text}"
-    if line_bot_api and LINE_PUSH_TO:
+    to = to or LINE_PUSH_TO
+    if LINE_ACCESS_TOKEN and to:
         try:
-            line_bot_api.push_message(LINE_PUSH_TO, TextSendMessage(msg))
+            upstream.post(f"{LINE_API}/push", json=_line_text("to", to, msg), timeout=10, headers=_line_headers())
             print("[PUSH][v8R7-HF] sent"); return
         except Exception as e:
             print(f"[PUSH][v8R7-HF] error:", e)
     print("[PUSH][v8R7-HF] console:", msg)
 
-# ========= 趨勢區塊：重試 + 快取 + 回退 =========
-def _cache_get(key: str) -> Optional[Dict[str, Any]]:
-    st = get_state(); c = st.get("cache", {})
-    v = c.get(key); 
-    return v if isinstance(v, dict) else None
-
-def _cache_put(key: str, text: str, ttl_sec: int):
-    st = get_state(); c = st.setdefault("cache", {})
-    c[key] = {"text": text, "ts": int(time.time()), "ttl": int(ttl_sec)}
-    _persist(st)
-
-def _cache_alive(rec: Dict[str, Any], now: int) -> bool:
-    ts, ttl = int(rec.get("ts", 0)), int(rec.get("ttl", 0))
-    return (now - ts) <= ttl
-
-def _safe_trend_side(single_label: str, scheme: str, want_strong: bool, topn: int = 3, ttl: int = 60) -> str:
-    """
-    產生「今日強勢/弱勢」訊息，帶兩次快速重試與 60s 快取。
-    """
-    key = f"trend_side::{single_label}::{scheme}::{topn}"
-    now = int(time.time())
+# ========= 趨勢區塊：Stale-While-Revalidate =========
+# 有快取就立刻回（過 soft TTL 時背景更新），完全沒快取才同步等上游；快取獨立存放，不寫主狀態。
+_TREND_SWR = swr.SWRCache()
+TREND_HARD_TTL = 1800   # 超過 30 分鐘的快取不再直接回，先同步重抓；重抓失敗才回退
 
-    # 1) 先試即時（最多兩次）
-    last_err = None
-    for i in range(2):
-        try:
-            msg = trend_integrator.generate_side(single=single_label, scheme=scheme, want_strong=want_strong, topn=topn)
-            _cache_put(key, msg, ttl)
-            return msg
-        except Exception as e:
-            last_err = e
-            time.sleep(0.8)  # 小退避
+def _swr_text(text: str, age: int, state: str) -> str:
+    if state == swr.STALE:
+        return f"⏳ 使用最近快取（{age}s 前，背景更新中）\n{text}"
+    if state == swr.FALLBACK:
+        return f"⚠️ 資料源限流，回退舊快取（{age}s 前，已過期）\n{text}"
+    return text
 
-    # 2) 即時失敗 → 快取回退
-    rec = _cache_get(key)
-    if rec and _cache_alive(rec, now):
-        age = now - int(rec.get("ts", 0))
-        return f"⚠️ 資料源限流，使用最近快取（{age}s 前）\n{rec.get('text','')}"
+def _trend_key(topn: int) -> str:
+    # 結構化結果與配色無關：強勢/弱勢/報表共用同一筆快取，渲染時才套配色
+    return f"trend::v2::{topn}"
 
-    # 3) 再回退：舊快取（過期也用）
-    if rec:
-        age = now - int(rec.get("ts", 0))
-        return f"⚠️ 資料源限流，回退舊快取（{age}s 前，已過期）\n{rec.get('text','')}"
+def _trend_data(topn: int = 3, ttl: int = 60) -> Tuple[Dict[str, Any], int, str]:
+    return _TREND_SWR.get(_trend_key(topn), lambda: trend_integrator.trend_result(topn=topn),
+                          soft_ttl=ttl, hard_ttl=TREND_HARD_TTL)
 
-    # 4) 無任何可用 → 明確錯誤
-    raise last_err or RuntimeError("trend side unavailable")
+async def _atrend_data(topn: int = 3, ttl: int = 60) -> Tuple[Dict[str, Any], int, str]:
+    return await _TREND_SWR.aget(_trend_key(topn), lambda: trend_integrator.atrend_result(topn=topn),
+                                 soft_ttl=ttl, hard_ttl=TREND_HARD_TTL)
 
 def _safe_trend_report(scheme: str, topn: int = 3, ttl: int = 60) -> str:
-    key = f"trend_report::{scheme}::{topn}"
-    now = int(time.time())
-    last_err = None
-    for i in range(2):
-        try:
-            msg = trend_integrator.generate_report(scheme=scheme, topn=topn)
-            _cache_put(key, msg, ttl)
-            return msg
-        except Exception as e:
-            last_err = e
-            time.sleep(0.8)
-    rec = _cache_get(key)
-    if rec and _cache_alive(rec, now):
-        age = now - int(rec.get("ts", 0))
-        return f"⚠️ 資料源限流，使用最近快取（{age}s 前）\n{rec.get('text','')}"
-    if rec:
-        age = now - int(rec.get("ts", 0))
-        return f"⚠️ 資料源限流，回退舊快取（{age}s 前，已過期）\n{rec.get('text','')}"
-    return "⚠️ 資料源限流，稍後再試（目前無可用快取）"
+    try:
+        data, age, state = _trend_data(topn, ttl)
+    except Exception:
+        return "⚠️ 資料源限流，稍後再試（目前無可用快取）"
+    return _swr_text(trend_integrator.render_report(data, scheme), age, state)
 
 # ========= 啟動 =========
 @app.on_event("startup")
 def on_startup():
     print("[BOOT][v8R7-HF] starting…")
-    _ = get_state(); _persist()
+    _ = get_state(); save_state()
     ensure_prefs_defaults()
     try:
-        badges_radar.refresh_badges()
-        print("[BOOT][v8R7-HF] badges refreshed")
-    except Exception as e:
-        print("[BOOT][v8R7-HF] badges init err:", e)
-    try:
-        if not os.path.exists(BASELINE_PATH):
+        if not os.path.exists(version_diff.BASELINE_PATH):
             version_diff.checkpoint_now(".")
             print("[BOOT][v8R7-HF] version baseline created")
     except Exception as e:
         print("[BOOT][v8R7-HF] version baseline err:", e)
 
+@app.on_event("startup")
+async def start_jobs():
+    jobs.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await upstream.aclose()
+
 # ========= 管理/診斷 =========
 @app.get("/")
 def root():
@@ -278,13 +147,21 @@ def env_lite():
     p = get_state().get("prefs", {})
     return {"tag": "v8R7-HF", "has_line_token": bool(LINE_ACCESS_TOKEN), "has_push_target": bool(LINE_PUSH_TO), "prefs": p}
 
+def _warm():
+    try: badges_radar.refresh_badges()
+    except Exception: pass
+    news_refresher.refresh_once()
+
 @app.get("/admin/warm")
 def admin_warm(token: str = ""):
     _chk_token(token)
     _ = get_state()
-    try: badges_radar.refresh_badges()
-    except Exception: pass
-    return {"ok": True, "tag": "v8R7-HF", "warmed": True, "ts": int(time.time())}
+    queued = jobs.submit(jobs.WARM, "warm", _warm)  # 最低優先序，不搶 LINE 指令的資源
+    return {"ok": True, "tag": "v8R7-HF", "warmed": queued, "queued": queued, "ts": int(time.time())}
+
+@app.get("/admin/jobs")
+def admin_jobs():
+    return {**jobs.metrics(), "pending": jobs.QUEUE.pending()}
 
 @app.post("/admin/trigger-report")
 @app.get("/admin/trigger-report")
@@ -292,10 +169,12 @@ def trigger_report(phase: str, token: str = ""):
     _chk_token(token)
     if phase not in ("morning","noon","evening","night"):
         raise HTTPException(400, "bad phase")
-    msg = compose_report(phase)
-    push_to_line(f"🪄 手動觸發 {phase}報\n{msg}")
-    st = get_state(); st.setdefault("manual_push_ts", {})[phase] = int(time.time()); _persist(st)
-    return {"ok": True, "pushed": True, "phase": phase}
+    def job():
+        msg = compose_report(phase)
+        push_to_line(f"🪄 手動觸發 {phase}報\n{msg}")
+        st = get_state(); st.setdefault("manual_push_ts", {})[phase] = int(time.time()); save_state()
+    queued = jobs.submit(jobs.REPORT, f"trigger:{phase}", job)
+    return {"ok": queued, "queued": queued, "phase": phase}
 
 @app.post("/admin/version-snapshot")
 def admin_version_snapshot():
@@ -319,32 +198,36 @@ def admin_version_badge():
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
-# ========= 幣價（只用於「今日強/弱勢」顯示美化；失敗即忽略）=========
-_CG = {
-    "BTC":"bitcoin","ETH":"ethereum","SOL":"solana","BNB":"binancecoin",
-    "AVAX":"avalanche-2","LINK":"chainlink","ADA":"cardano","XRP":"ripple",
-    "DOGE":"dogecoin","TON":"the-open-network","DOT":"polkadot","TRX":"tron",
-    "MATIC":"matic-network","BCH":"bitcoin-cash","LTC":"litecoin"
-}
-import requests
-def _get_prices_usd(symbols: List[str]) -> Dict[str, float]:
-    ids = [ _CG[s] for s in symbols if s in _CG ]
-    if not ids: return {}
-    try:
-        r = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price",
-            params={"ids": ",".join(ids), "vs_currencies": "usd"},
-            timeout=6,
-        )
-        r.raise_for_status()
-        data = r.json()
-        out = {}; inv = {v:k for k,v in _CG.items()}
-        for cg_id, obj in data.items():
-            sym = inv.get(cg_id)
-            if sym and "usd" in obj: out[sym] = float(obj["usd"])
-        return out
-    except Exception:
-        return {}
+# ========= LINE（async 版：webhook 與背景指令用，不卡 event loop）=========
+async def _aline_send(kind: str, body: Dict[str, Any]):
+    await upstream.apost(f"{LINE_API}/{kind}", json=body, timeout=10, headers=_line_headers())
+
+async def _areply(reply_token: str, text: str):
+    await _aline_send("reply", _line_text("replyToken", reply_token, text))
+
+async def apush_to_line(text: str, to: str = ""):
+    msg = f"【v8R7-HF】{text}"
+    to = to or LINE_PUSH_TO
+    if LINE_ACCESS_TOKEN and to:
+        try:
+            await _aline_send("push", _line_text("to", to, msg))
+            print("[PUSH][v8R7-HF] sent"); return
+        except Exception as e:
+            print(f"[PUSH][v8R7-HF] error:", e)
+    print("[PUSH][v8R7-HF] console:", msg)
+
+# webhook 內的狀態讀寫（SQLite/檔案）一律丟 threadpool，不卡 event loop
+def _prefs() -> Dict[str, Any]:
+    return dict(get_state().get("prefs", {}))
+
+def _set_pref(key: str, val: Any) -> Dict[str, Any]:
+    st = get_state(); st.setdefault("prefs", {})[key] = val; save_state()
+    return dict(st["prefs"])
+
+def _source_id(ev: Dict[str, Any]) -> str:
+    # 背景工作完成後推回發話的聊天室（群組 > 房間 > 個人），取不到就推預設對象
+    src = ev.get("source", {}) or {}
+    return src.get("groupId") or src.get("roomId") or src.get("userId") or ""
 
 # ========= LINE Webhook =========
 @app.post("/line/webhook")
@@ -352,175 +235,211 @@ async def line_webhook(request: Request):
     payload = await request.json()
     print("[WH][v8R7-HF] inbound:", json.dumps(payload, ensure_ascii=False)[:400])
     events = payload.get("events", [])
-    out = []
-
-    for ev in events:
-        raw = (ev.get("message", {}) or {}).get("text", "") or ""
-        reply_token = ev.get("replyToken")
-        t = re.sub(r"\s+", " ", raw.replace("\u3000", " ")).strip()
-        print(f"[WH][v8R7-HF] text='{t}' reply_token={'Y' if reply_token else 'N'}")
-
-        def reply(msg: str):
-            tagged = f"【v8R7-HF】{msg}"
-            out.append(tagged)
-            if line_bot_api and reply_token:
-                try:
-                    line_bot_api.reply_message(reply_token, TextSendMessage(tagged))
-                    print("[WH][v8R7-HF] replied")
-                except Exception as e:
-                    print("[WH][v8R7-HF] reply error:", e)
-
-        # 模組開關
-        m_toggle = re.match(r"^(美股|台股|虛擬貨幣)\s*(開啟|關閉)$", t)
-        if m_toggle:
-            mod, act = m_toggle.groups()
-            key = {"美股":"enable_us","台股":"enable_tw","虛擬貨幣":"enable_crypto"}[mod]
-            val = (act == "開啟")
-            st = get_state(); st.setdefault("prefs", {})[key] = val; _persist(st)
-            prefs = st["prefs"]
-            reply(f"{mod} 已{act}。目前：美股={'開' if prefs.get('enable_us') else '關'}｜台股={'開' if prefs.get('enable_tw') else '關'}｜幣圈={'開' if prefs.get('enable_crypto') else '關'}")
-            continue
-
-        # 顯示價格
-        m_price = re.match(r"^顯示價格\s*(開啟|關閉)$", t)
-        if m_price:
-            on = (m_price.group(1) == "開啟")
-            st = get_state(); st.setdefault("prefs", {})["show_price"] = on; _persist(st)
-            reply(f"顯示價格已{'開啟' if on else '關閉'}。"); continue
-
-        if t in ("模組狀態", "狀態", "status"):
-            prefs = get_state().get("prefs", {})
-            reply(f"模組狀態：美股={'開' if prefs.get('enable_us', True) else '關'}｜台股={'開' if prefs.get('enable_tw', True) else '關'}｜幣圈={'開' if prefs.get('enable_crypto', True) else '關'}｜顯示價格={'開' if prefs.get('show_price', True) else '關'}")
-            continue
-
-        # 版本核對/差異
-        if t in ("版本核對","版本差異","版本差异","version diff","version-diff","ver diff"):
+    # 各事件並行處理（上游皆為 await）；回傳依事件順序彙整
+    results = await asyncio.gather(*(_handle_event_bounded(ev) for ev in events))
+    return {"messages": [m for msgs in results for m in msgs]}
+
+async def _handle_event_bounded(ev: Dict[str, Any]) -> List[str]:
+    # 每個事件各自一份預算（gather 會為每個 task 複製 context）
+    with deadline.scope(deadline.WEBHOOK_BUDGET_SEC):
+        return await _handle_event(ev)
+
+async def _handle_event(ev: Dict[str, Any]) -> List[str]:
+    out: List[str] = []
+    raw = (ev.get("message", {}) or {}).get("text", "") or ""
+    reply_token = ev.get("replyToken")
+    t = re.sub(r"\s+", " ", raw.replace("\u3000", " ")).strip()
+    print(f"[WH][v8R7-HF] text='{t}' reply_token={'Y' if reply_token else 'N'}")
+
+    async def reply(msg: str):
+        tagged = f"【v8R7-HF】{msg}"
+        out.append(tagged)
+        if LINE_ACCESS_TOKEN and reply_token:
             try:
-                diff = version_diff.diff_now_vs_prev(".")
-                reply(diff.get("summary") or "版本比對完成（無摘要）")
+                await _areply(reply_token, tagged)
+                print("[WH][v8R7-HF] replied")
             except Exception as e:
-                reply(f"版本比對失敗：{e}")
-            continue
-
-        # 配色
-        if t.startswith("顏色"):
-            scheme = resolve_scheme(t)
-            reply(set_color_scheme(scheme) if scheme else "請說明要切換到「台股」或「美股」配色。")
-            continue
-
-        # 手動重發四報
-        if t in ("早報","午報","晚報","夜報"):
-            phase_map = {"早報":"morning","午報":"noon","晚報":"evening","夜報":"night"}
-            ph = phase_map[t]
-            msg = compose_report(ph)
-            push_to_line(f"🪄 手動重發 {t}\n{msg}")
-            reply(f"{t}已重發（若訊息較長，請看最新推送）")
-            continue
-
-        # 新聞 <幣>
-        m_news = re.match(r"^\s*新聞\s+([A-Za-z0-9_\-\.]+)\s*$", t)
-        if m_news:
-            sym = m_news.group(1).upper()
-            heads = news_scoring.recent_headlines(sym, k=5)
-            if not heads: reply(f"{sym} 近 24 小時無新聞或暫時無法取得。")
-            else:
-                lines = [f"🗞️ {sym} 近 24 小時重點新聞（中文）"]
-                for i, h in enumerate(heads, 1):
-                    lines.append(f"{i}. {h['title_zh']} 〔{h['timeago']}〕")
-                reply("\n".join(lines))
-            continue
-
-        # 美股詳細
-        if t == "美股":
-            prefs = get_state().get("prefs", {})
-            if not prefs.get("enable_us", True):
-                reply("美股模組目前關閉。可用：『美股 開啟』"); continue
-            block = us_stocks.format_us_full(show_price=prefs.get("show_price", True))
-            nblk = us_news.format_us_news_block(k_each=2, max_topics=6)
-            reply(f"{block}\n\n{nblk}"); continue
-
-        # 台股詳細
-        if t == "台股":
-            prefs = get_state().get("prefs", {})
-            if not prefs.get("enable_tw", True):
-                reply("台股模組目前關閉。可用：『台股 開啟』"); continue
-            reply(tw_stocks.format_tw_full(show_price=prefs.get("show_price", True))); continue
-
-        # 監控延長/停止
-        sym = W.parse_plus(t)
-        if sym: reply(W.extend(sym, hours=1)); continue
-        sym = W.parse_minus(t)
-        if sym: reply(W.stop(sym)); continue
-
-        # 總覽
-        if t in ("總覽","監控","監控列表","監控清單"):
-            reply(W.summarize()); continue
-
-        # 今日強勢/弱勢（走保命流程 + 可附價）
-        if t in ("今日強勢", "今日弱勢"):
-            prefs = get_state().get("prefs", {})
-            if not prefs.get("enable_crypto", True):
-                reply("虛擬貨幣模組目前關閉。可用：『虛擬貨幣 開啟』"); continue
-            scheme = current_scheme(); want_strong = (t == "今日強勢")
+                print("[WH][v8R7-HF] reply error:", e)
+
+    # 耗時指令：先秒回「處理中」，實際工作進背景佇列（interactive 優先），完成後推回原聊天室
+    to = _source_id(ev)
+    async def _ack(label: str, fn):
+        async def bounded():
+            # 背景工作不受 webhook 預算限制，另開報表等級的預算
+            with deadline.scope(deadline.REPORT_BUDGET_SEC):
+                await fn()
+        if jobs.submit(jobs.INTERACTIVE, f"cmd:{label}", bounded):
+            await reply(f"⏳ {label} 處理中，完成後推送")
+        else:
+            await reply("⚠️ 目前排隊工作過多，請稍後再試")
+
+    # 模組開關
+    m_toggle = re.match(r"^(美股|台股|虛擬貨幣)\s*(開啟|關閉)$", t)
+    if m_toggle:
+        mod, act = m_toggle.groups()
+        key = {"美股":"enable_us","台股":"enable_tw","虛擬貨幣":"enable_crypto"}[mod]
+        val = (act == "開啟")
+        prefs = await run_in_threadpool(_set_pref, key, val)
+        await reply(f"{mod} 已{act}。目前：美股={'開' if prefs.get('enable_us') else '關'}｜台股={'開' if prefs.get('enable_tw') else '關'}｜幣圈={'開' if prefs.get('enable_crypto') else '關'}")
+        return out
+
+    # 顯示價格
+    m_price = re.match(r"^顯示價格\s*(開啟|關閉)$", t)
+    if m_price:
+        on = (m_price.group(1) == "開啟")
+        await run_in_threadpool(_set_pref, "show_price", on)
+        await reply(f"顯示價格已{'開啟' if on else '關閉'}。"); return out
+
+    if t in ("模組狀態", "狀態", "status"):
+        prefs = await run_in_threadpool(_prefs)
+        await reply(f"模組狀態：美股={'開' if prefs.get('enable_us', True) else '關'}｜台股={'開' if prefs.get('enable_tw', True) else '關'}｜幣圈={'開' if prefs.get('enable_crypto', True) else '關'}｜顯示價格={'開' if prefs.get('show_price', True) else '關'}")
+        return out
+
+    # 版本核對/差異（掃檔較慢 → 背景工作，完成後推送）
+    if t in ("版本核對","版本差異","版本差异","version diff","version-diff","ver diff"):
+        async def job_diff():
             try:
-                msg = _safe_trend_side(single_label=t, scheme=scheme, want_strong=want_strong, topn=3, ttl=60)
-                # 若開啟顯示價格 → 嘗試附價（抓不到就略過）
-                if prefs.get("show_price", True):
-                    syms: List[str] = []
-                    for line in msg.splitlines():
-                        m = re.search(r"\b([A-Z]{2,10})\b", line)
-                        if m:
-                            s = m.group(1)
-                            if s not in ("S","N","T") and s.isalpha(): syms.append(s)
-                    syms = sorted(set(syms))
-                    prices = _get_prices_usd(syms) if syms else {}
-                    if prices:
-                        new_lines = []
-                        for line in msg.splitlines():
-                            m = re.search(r"\b([A-Z]{2,10})\b", line)
-                            if m:
-                                s = m.group(1); p = prices.get(s)
-                                if p: line = f"{line}（${p:,.0f}）"
-                            new_lines.append(line)
-                        msg = "\n".join(new_lines)
-                # 附帶新聞（保持原有行為）
-                syms2: List[str] = []
-                for line in msg.splitlines():
-                    m = re.search(r"\b([A-Z]{2,10})\b", line)
-                    if m:
-                        s = m.group(1)
-                        if s not in ("S","N","T") and s.isalpha(): syms2.append(s)
-                hmap = news_scoring.batch_recent_headlines(syms2, k=2) if syms2 else {}
-                if hmap:
-                    msg += "\n\n🗞️ 中文新聞精選"
-                    for s in syms2:
-                        heads = hmap.get(s) or []
-                        if heads:
-                            msg += f"\n• {s}"
-                            for h in heads:
-                                msg += f"\n  - {h['title_zh']} 〔{h['timeago']}〕"
+                diff = await run_in_threadpool(version_diff.diff_now_vs_prev, ".")
+                await apush_to_line(diff.get("summary") or "版本比對完成（無摘要）", to=to)
             except Exception as e:
-                msg = f"{t} 生成失敗：{e}\n（已啟用限流快取保命；稍後再試）"
-            reply(msg); continue
+                await apush_to_line(f"版本比對失敗：{e}", to=to)
+        await _ack(t, job_diff); return out
 
-        # 幣 做多/做空
-        m = re.match(r"^\s*([A-Za-z0-9_\-\.]+)\s*(做多|做空)\s*$", t)
-        if m:
-            sym, action = m.group(1).upper(), m.group(2)
-            set_watch(sym, int(time.time()) + 3600)
-            reply(f"{sym} 設定為{action}，並已監控 1 小時。"); continue
+    # 配色
+    if t.startswith("顏色"):
+        scheme = resolve_scheme(t)
+        await reply(await run_in_threadpool(set_color_scheme, scheme) if scheme else "請說明要切換到「台股」或「美股」配色。")
+        return out
 
-        # 預設回覆
-        reply("指令：早報｜午報｜晚報｜夜報｜台股｜美股｜今日強勢｜今日弱勢｜新聞 <幣>｜顯示價格 開啟/關閉｜顏色 台股/美股｜總覽｜版本核對｜版本差異｜模組狀態｜（美股/台股/虛擬貨幣）開啟/關閉")
+    # 手動重發四報（背景工作：compose_report 在 threadpool 跑完後推播）
+    if t in ("早報","午報","晚報","夜報"):
+        phase_map = {"早報":"morning","午報":"noon","晚報":"evening","夜報":"night"}
+        ph = phase_map[t]
+        async def job_reissue():
+            msg = await run_in_threadpool(_safe_compose, ph)
+            await apush_to_line(f"🪄 手動重發 {t}\n{msg}")
+        if jobs.submit(jobs.INTERACTIVE, f"reissue:{ph}", job_reissue):
+            await reply(f"⏳ {t}重發中，完成後推送")
+        else:
+            await reply("⚠️ 目前排隊工作過多，請稍後再試")
+        return out
 
-    return {"messages": out}
+    # 新聞 <幣>
+    m_news = re.match(r"^\s*新聞\s+([A-Za-z0-9_\-\.]+)\s*$", t)
+    if m_news:
+        sym = m_news.group(1).upper()
+        pk = await run_in_threadpool(news_scoring.peek_news, sym, 5)  # 先讀背景預算；不在預算清單的才即時抓（async）
+        heads = pk["headlines"] if pk else await news_scoring.arecent_headlines(sym, k=5)
+        if not heads: await reply(f"{sym} 近 24 小時無新聞或暫時無法取得。")
+        else:
+            upd = f"，{news_scoring._timeago(pk['ts'])}更新" if pk else ""
+            lines = [f"🗞️ {sym} 近 24 小時重點新聞（中文{upd}）"]
+            for i, h in enumerate(heads, 1):
+                lines.append(f"{i}. {h['title_zh']} 〔{h['timeago']}〕")
+            await reply("\n".join(lines))
+        return out
+
+    # 美股詳細
+    if t == "美股":
+        prefs = await run_in_threadpool(_prefs)
+        if not prefs.get("enable_us", True):
+            await reply("美股模組目前關閉。可用：『美股 開啟』"); return out
+        async def job_us():
+            try:
+                block, nblk = await asyncio.gather(
+                    us_stocks.aformat_us_full(show_price=prefs.get("show_price", True)),
+                    us_news.aformat_us_news_block(k_each=2, max_topics=6),
+                )
+                msg = f"{block}\n\n{nblk}"
+            except Exception as e:
+                msg = f"美股區塊生成失敗：{e}"
+            await apush_to_line(msg, to=to)
+        await _ack(t, job_us); return out
+
+    # 台股全市場熱圖（上市+上櫃；優先讀共用掃描結果，沒有才掃，約 9 個批次請求）
+    if re.match(r"^台股\s*熱圖$", t):
+        prefs = await run_in_threadpool(_prefs)
+        if not prefs.get("enable_tw", True):
+            await reply("台股模組目前關閉。可用：『台股 開啟』"); return out
+        async def job_heatmap():
+            try:
+                # 先用排程（盤中每 10 分鐘）已發布的結果；沒有或過期才自己掃
+                res = await asyncio.to_thread(lambda: tw_universe.latest() or tw_universe.scan())
+                scheme = await run_in_threadpool(current_scheme)
+                msg = tw_universe.format_heatmap(res, scheme=scheme, show_price=prefs.get("show_price", True))
+            except Exception as e:
+                msg = f"台股熱圖生成失敗：{e}"
+            await apush_to_line(msg, to=to)
+        await _ack("台股熱圖", job_heatmap); return out
+
+    # 台股詳細
+    if t == "台股":
+        prefs = await run_in_threadpool(_prefs)
+        if not prefs.get("enable_tw", True):
+            await reply("台股模組目前關閉。可用：『台股 開啟』"); return out
+        async def job_tw():
+            try:
+                msg = await tw_stocks.aformat_tw_full(show_price=prefs.get("show_price", True))
+            except Exception as e:
+                msg = f"台股區塊生成失敗：{e}"
+            await apush_to_line(msg, to=to)
+        await _ack(t, job_tw); return out
+
+    # 監控延長/停止
+    sym = W.parse_plus(t)
+    if sym: await reply(await run_in_threadpool(W.extend, sym, 1)); return out
+    sym = W.parse_minus(t)
+    if sym: await reply(await run_in_threadpool(W.stop, sym)); return out
+
+    # 總覽
+    if t in ("總覽","監控","監控列表","監控清單"):
+        await reply(await run_in_threadpool(W.summarize)); return out
+
+    # 今日強勢/弱勢（走 SWR 保命流程 + 可附價）
+    if t in ("今日強勢", "今日弱勢"):
+        prefs = await run_in_threadpool(_prefs)
+        if not prefs.get("enable_crypto", True):
+            await reply("虛擬貨幣模組目前關閉。可用：『虛擬貨幣 開啟』"); return out
+        scheme = await run_in_threadpool(current_scheme); want_strong = (t == "今日強勢")
+        try:
+            # 結構化結果已含價格與新聞標題參照：直接依資料附價/附新聞，不再解析文字或重打上游
+            data, age, state = await _atrend_data(topn=3, ttl=60)
+            msg = _swr_text(trend_integrator.render_side(data, scheme, want_strong=want_strong,
+                                                         show_price=prefs.get("show_price", True),
+                                                         with_news=True), age, state)
+        except Exception as e:
+            msg = f"{t} 生成失敗：{e}\n（已啟用限流快取保命；稍後再試）"
+        await reply(msg); return out
+
+    # 幣 做多/做空
+    m = re.match(r"^\s*([A-Za-z0-9_\-\.]+)\s*(做多|做空)\s*$", t)
+    if m:
+        sym, action = m.group(1).upper(), m.group(2)
+        await run_in_threadpool(set_watch, sym, int(time.time()) + 3600)
+        await reply(f"{sym} 設定為{action}，並已監控 1 小時。"); return out
+
+    # 預設回覆
+    await reply("指令：早報｜午報｜晚報｜夜報｜台股｜台股 熱圖｜美股｜今日強勢｜今日弱勢｜新聞 <幣>｜顯示價格 開啟/關閉｜顏色 台股/美股｜總覽｜版本核對｜版本差異｜模組狀態｜（美股/台股/虛擬貨幣）開啟/關閉")
+    return out
 
 # ========= 報表（四時段；幣圈走保命流程）=========
+# 推播前 PRERENDER_LEAD_MIN 分鐘先預先渲染，推播時只重建過期段落
+PRERENDER_LEAD_MIN = int(os.getenv("SENTINEL_PRERENDER_LEAD_MIN", "5"))
+# 各段預先渲染結果可沿用的秒數：報價短、新聞長（美股新聞另看背景新聞是否有更新）；
+# 都至少涵蓋預渲染提前量（+1 分鐘餘裕）。報價段另有 changed 檢查：盤中超過報價 TTL 就重建，
+# 只有收盤後（價格不再變動）才真的沿用預渲染結果
+_REUSE_MIN_SEC = PRERENDER_LEAD_MIN * 60 + 60
+SECTION_MAX_AGE = {"tw": max(120, _REUSE_MIN_SEC), "tw_news": max(900, _REUSE_MIN_SEC),
+                   "us": max(120, _REUSE_MIN_SEC), "us_news": max(900, _REUSE_MIN_SEC),
+                   "crypto": 0, "badges": 0}
+_LAST_SECTIONS: Dict[str, Tuple[str, Dict[str, Any]]] = {}   # phase -> (scheme, {key: Result})
+
 def compose_report(phase: str) -> str:
-    prefs = ensure_prefs_defaults()
-    scheme = current_scheme()
-    show_price = prefs.get("show_price", True)
+    # 整份報表共用一個時間預算：各段上游呼叫的 timeout 縮到剩餘預算，最壞延遲有上限
+    with deadline.scope(deadline.REPORT_BUDGET_SEC):
+        return _compose_report(phase)
 
+def _report_badges() -> List[str]:
     badges = []
     try: badges = badges_radar.get_badges()
     except Exception: badges = []
@@ -528,43 +447,66 @@ def compose_report(phase: str) -> str:
         has_delta, badge_txt = version_diff.get_version_badge()
         if has_delta and badge_txt not in badges: badges.append(badge_txt)
     except Exception: pass
-    badge_str = (" ｜ " + " ".join(f"[{b}]" for b in badges)) if badges else ""
+    return badges
 
-    parts = [f"【{phase}報】配色：{scheme}{badge_str}", f"監控：{W.summarize()}", ""]
+def _quotes_changed(market: str):
+    # 盤中報價段落超過報價 TTL 即視為資料已變（推播時重建；quotes 會合併請求並走快取）
+    return lambda ts: quotes.session_open(market) and time.time() - ts > quotes.TTL_OPEN_SEC
 
-    # 台股
+def _report_sections(phase: str, prefs: Dict[str, Any], scheme: str) -> List[sections.Section]:
+    """依時段/模組開關列出本次報表要跑的段落（彼此獨立，並行建構）"""
+    show_price = prefs.get("show_price", True)
+    def S(key: str, build, **kw) -> sections.Section:
+        return sections.Section(key, build, max_age=SECTION_MAX_AGE.get(key, 0), **kw)
+    out = [S("badges", _report_badges, late=[])]
     if prefs.get("enable_tw", True) and phase in ("morning","noon","evening"):
-        try:
-            parts += [tw_stocks.format_tw_block(phase=phase, show_price=show_price), ""]
-        except Exception as e:
-            parts += [f"台股區塊生成失敗：{e}", ""]
+        out.append(S("tw", lambda: tw_stocks.format_tw_block(phase=phase, show_price=show_price),
+                     fail="台股區塊生成失敗", late="⏳ 台股區塊逾時，下次報表補上",
+                     changed=_quotes_changed("TW")))
         if phase in ("morning","noon") and tw_news:
-            try:
-                parts += [tw_news.format_tw_news_block(k=3), ""]
-            except Exception as e:
-                parts += [f"台股新聞取得失敗：{e}", ""]
-
-    # 美股
-    if prefs.get("enable_us", True):
+            out.append(S("tw_news", lambda: tw_news.format_tw_news_block(k=3),
+                         fail="台股新聞取得失敗", late="⏳ 台股新聞逾時，下次報表補上"))
+    if prefs.get("enable_us", True) and phase in ("morning","night"):
+        out.append(S("us", lambda: us_stocks.format_us_block(phase=phase, show_price=show_price),
+                     fail="美股區塊生成失敗", late="⏳ 美股區塊逾時，下次報表補上",
+                     changed=_quotes_changed("US")))
         if phase == "night":
-            try:
-                us_block = us_stocks.format_us_block(phase="night", show_price=show_price)
-                us_news_block = us_news.format_us_news_block(k_each=2, max_topics=6)
-                parts += [f"{us_block}\n\n{us_news_block}", ""]
-            except Exception as e:
-                parts += [f"美股區塊生成失敗：{e}", ""]
-        elif phase == "morning":
-            try:
-                parts += [us_stocks.format_us_block(phase="morning", show_price=show_price), ""]
-            except Exception as e:
-                parts += [f"美股區塊生成失敗：{e}", ""]
-
-    # 幣圈（走保命）
+            out.append(S("us_news", lambda: us_news.format_us_news_block(k_each=2, max_topics=6),
+                         fail="美股新聞取得失敗", late="⏳ 美股新聞逾時，下次報表補上",
+                         changed=news_refresher.changed_since))
     if prefs.get("enable_crypto", True):
-        try:
-            parts.append(_safe_trend_report(scheme=scheme, topn=3, ttl=60))
-        except Exception as e:
-            parts.append(f"主升浪清單生成失敗：{e}\n（已啟用限流快取保命；稍後再試）")
+        out.append(S("crypto", lambda: _safe_trend_report(scheme=scheme, topn=3, ttl=60),
+                     fail="主升浪清單生成失敗", late="⏳ 主升浪清單逾時（已啟用限流快取保命；稍後再試）"))
+    return out
+
+def _compose_report(phase: str) -> str:
+    prefs = ensure_prefs_defaults()
+    scheme = current_scheme()
+
+    # 沿用同時段上一輪（預先渲染）仍新鮮的段落，只重建過期/有變動者
+    last = _LAST_SECTIONS.get(phase)
+    prev = last[1] if last and last[0] == scheme else None
+    plan = _report_sections(phase, prefs, scheme)
+    # 需要重建的台股/美股段落：報價先合併成一批送出，兩段再各自從同一份快取取用
+    now = time.time()
+    rebuild = {s.key for s in plan if not sections.reusable(s, (prev or {}).get(s.key), now)}
+    quotes.prefetch((tw_stocks.TW_SYMBOLS if "tw" in rebuild else []) +
+                    (us_stocks.US_SYMBOLS if "us" in rebuild else []))
+    res = sections.run(plan, prev=prev)
+    _LAST_SECTIONS[phase] = (scheme, res)
+
+    badges = res["badges"].value if res["badges"].status == sections.OK else []
+    badge_str = (" ｜ " + " ".join(f"[{b}]" for b in badges)) if badges else ""
+    parts = [f"【{phase}報】配色：{scheme}{badge_str}", f"監控：{W.summarize()}", ""]
+
+    # 固定順序：台股 → 台股新聞 → 美股 → 美股新聞 → 幣圈
+    for key in ("tw", "tw_news", "us", "us_news"):
+        if key in res:
+            parts += [res[key].value, ""]
+    if "crypto" in res:
+        crypto = res["crypto"]
+        parts.append(crypto.value if crypto.status != sections.ERROR
+                     else f"{crypto.value}\n（已啟用限流快取保命；稍後再試）")
     else:
         parts.append("（虛擬貨幣模組已關閉）")
 
@@ -576,17 +518,37 @@ def _safe_compose(phase: str) -> str:
     try: return compose_report(phase)
     except Exception as e: return f"【{phase}報】生成失敗：{e}"
 
-@sched.scheduled_job("cron", hour=9, minute=30)
-def phase_morning(): push_to_line(_safe_compose("morning"))
+# 四報推播時刻（預先渲染提前量見 PRERENDER_LEAD_MIN）
+PHASE_SLOTS = {"morning": (9, 30), "noon": (12, 30), "evening": (18, 0), "night": (22, 30)}
+
+def _push_phase(phase: str):
+    # 排程報表走 report 類佇列：讓位給互動指令，但優先於 warm
+    jobs.submit(jobs.REPORT, f"phase:{phase}", lambda: push_to_line(_safe_compose(phase)))
+
+def _prerender(phase: str):
+    t0 = time.time()
+    _safe_compose(phase)
+    print(f"[PRERENDER] {phase} ready in {int((time.time() - t0) * 1000)}ms")
 
-@sched.scheduled_job("cron", hour=12, minute=30)
-def phase_noon():    push_to_line(_safe_compose("noon"))
+def _prerender_phase(phase: str):
+    jobs.submit(jobs.REPORT, f"prerender:{phase}", lambda: _prerender(phase))
 
-@sched.scheduled_job("cron", hour=18, minute=0)
-def phase_evening(): push_to_line(_safe_compose("evening"))
+@sched.scheduled_job("cron", hour=PHASE_SLOTS["morning"][0], minute=PHASE_SLOTS["morning"][1])
+def phase_morning(): _push_phase("morning")
 
-@sched.scheduled_job("cron", hour=22, minute=30)
-def phase_night():   push_to_line(_safe_compose("night"))
+@sched.scheduled_job("cron", hour=PHASE_SLOTS["noon"][0], minute=PHASE_SLOTS["noon"][1])
+def phase_noon():    _push_phase("noon")
+
+@sched.scheduled_job("cron", hour=PHASE_SLOTS["evening"][0], minute=PHASE_SLOTS["evening"][1])
+def phase_evening(): _push_phase("evening")
+
+@sched.scheduled_job("cron", hour=PHASE_SLOTS["night"][0], minute=PHASE_SLOTS["night"][1])
+def phase_night():   _push_phase("night")
+
+if PRERENDER_LEAD_MIN > 0:
+    for _ph, (_h, _m) in PHASE_SLOTS.items():
+        _ph_h, _ph_m = divmod((_h * 60 + _m - PRERENDER_LEAD_MIN) % 1440, 60)
+        sched.add_job(_prerender_phase, "cron", hour=_ph_h, minute=_ph_m, args=[_ph], id=f"prerender_{_ph}")
 
 # 每 10 分鐘刷新徽章
 @sched.scheduled_job("cron", minute="*/10", second=5)
@@ -594,6 +556,22 @@ def badges_refresher():
     try: badges_radar.refresh_badges()
     except Exception: pass
 
+# 台股盤中每 10 分鐘：全市場掃描（warm 類；供台股區塊的廣度行與「台股 熱圖」快取）
+@sched.scheduled_job("cron", day_of_week="mon-fri", hour="9-13", minute="*/10", second=40)
+def tw_scan_job():
+    jobs.submit(jobs.WARM, "tw-scan", tw_universe.scan)
+
+# 每 10 分鐘：S&P 500 廣度彙整（美股盤中才重掃；休市時結果過期才補一次）
+@sched.scheduled_job("cron", minute="*/10", second=50)
+def us_breadth_job():
+    if quotes.session_open("US") or us_breadth.latest() is None:
+        jobs.submit(jobs.WARM, "us-breadth", us_breadth.scan)
+
+# 每 5 分鐘：背景預算新聞分數/標題（build_table 與 LINE 指令只讀結果）
+@sched.scheduled_job("cron", minute=f"*/{news_refresher.REFRESH_EVERY_MIN}", second=20)
+def news_refresh_job():
+    news_refresher.refresh_once()
+
 # 每分鐘：到期提醒 + 清理
 @sched.scheduled_job("cron", second=10)
 def watch_keeper():
@@ -606,17 +584,66 @@ def watch_keeper():
             try: push_to_line(f"⏰ {sym} 監控將於 {remain//60} 分後到期（{time.strftime('%H:%M', time.localtime(until))}）")
             except Exception: pass
             v["last_alert"] = now
+            save_state()
     cleanup_expired(now)
 
+def _leader_duties():
+    # 只有 leader worker 跑排程與背景刷新；其他 worker 透過共用的 SQLite 狀態/新聞快取讀結果
+    try:
+        badges_radar.refresh_badges()
+        print("[BOOT][v8R7-HF] badges refreshed")
+    except Exception as e:
+        print("[BOOT][v8R7-HF] badges init err:", e)
+    news_refresher.refresh_async()  # 背景預算新聞，不阻塞啟動
+    if not sched.running: sched.start()
+    print(f"[BOOT][v8R7-HF] scheduler leader pid={os.getpid()}")
+
 @app.on_event("startup")
 def start_sched():
-    if not sched.running: sched.start()
+    if not leader.run_when_leader(_leader_duties):
+        print(f"[BOOT][v8R7-HF] follower pid={os.getpid()} (leader={leader.holder_pid()})")
+
+@app.get("/admin/leader")
+def admin_leader():
+    return {**leader.status(), "sched_running": sched.running}
 
 @app.get("/admin/news-score")
 def admin_news_score(symbol: str = "BTC"):
     s = news_scoring.get_news_score(symbol.upper())
     return {"symbol": symbol.upper(), "news_score": s}
 
+@app.get("/admin/market-snapshot")
+def admin_market_snapshot():
+    return trend_integrator.snapshot_status()
+
+@app.get("/admin/trend-cache")
+def admin_trend_cache():
+    return _TREND_SWR.status()
+
+@app.get("/admin/news-status")
+def admin_news_status():
+    return news_refresher.status()
+
+@app.get("/admin/quotes")
+def admin_quotes():
+    return quotes.status()
+
+@app.get("/admin/tw-scan")
+def admin_tw_scan():
+    return tw_universe.status()
+
+@app.get("/admin/us-breadth")
+def admin_us_breadth():
+    return us_breadth.status()
+
+@app.get("/admin/upstream")
+def admin_upstream():
+    return upstream.stats()
+
+@app.get("/admin/breakers")
+def admin_breakers():
+    return upstream.breakers()
+
 @app.get("/admin/health")
 def admin_health():
     return {"ok": True, "tag": "v8R7-HF", "ts": int(time.time())}
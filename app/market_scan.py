@@ -0,0 +1,124 @@
+# app/market_scan.py 〔v8R7-MSCAN〕
+# 全市場掃描共用骨架（台股 tw_universe／美股 us_breadth）：
+# - CachedList：代號清單存本機 JSON 檔，過期才重抓；重抓失敗沿用舊檔
+# - MarketScan：清單 → 統一報價服務大 chunk 並行抓 → 彙整 → 寫入共用 SQLite（state_store blob），
+#   各 worker 以 latest() 只讀結果（max_age 依該市場是否盤中）
+# - sector_stats：各產業家數/平均的 NumPy bincount 彙整
+from __future__ import annotations
+import json, time, threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app import quotes, state_store
+
+Items = List[Dict[str, str]]          # [{symbol, name, sector}]
+
+class CachedList:
+    def __init__(self, path: str, max_age: int, download: Callable[[], Items], tag: str):
+        self.path = path
+        self.max_age = max_age
+        self.download = download
+        self.tag = tag
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None   # {"ts": int, "items": Items}
+
+    def items(self, refresh: bool = False) -> Items:
+        """本機檔優先；過期或 refresh 時重抓，失敗沿用舊檔"""
+        with self._lock:
+            if self._data is None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._data = json.load(f)
+                except Exception:
+                    self._data = {"ts": 0, "items": []}
+            if refresh or time.time() - self._data.get("ts", 0) > self.max_age:
+                try:
+                    items = self.download()
+                    if items:
+                        self._data = {"ts": int(time.time()), "items": items}
+                        state_store.atomic_write_json(self.path, self._data)
+                        print(f"[{self.tag}] symbol list refreshed: {len(items)} symbols")
+                except Exception as e:
+                    print(f"[{self.tag}] symbol list refresh failed:", e)
+            return self._data["items"]
+
+    def status(self) -> Dict[str, Any]:
+        d = self._data
+        return {"symbols": len(d["items"]) if d else None, "list_ts": d.get("ts") if d else None, "path": self.path}
+
+def column(items: Items, rows: List[Dict[str, Any]], key: str) -> np.ndarray:
+    """依清單順序取出報價欄位（缺值為 NaN）"""
+    got = {r["symbol"]: r.get(key) for r in rows}
+    return np.array([np.nan if got.get(it["symbol"]) is None else got[it["symbol"]] for it in items], dtype=float)
+
+def sector_stats(items: Items, pct: np.ndarray, empty_msg: str) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """回傳 (產業名, 有報價遮罩, 有效漲跌幅, 其產業索引, 各產業家數, 各產業平均)；全無報價時拋出 RuntimeError"""
+    names = sorted({it["sector"] for it in items})
+    pos = {n: i for i, n in enumerate(names)}
+    sec_idx = np.array([pos[it["sector"]] for it in items], dtype=int)
+    ok = ~np.isnan(pct)
+    p, s = pct[ok], sec_idx[ok]
+    if p.size == 0:
+        raise RuntimeError(empty_msg)
+    n = np.bincount(s, minlength=len(names))
+    avg = np.bincount(s, weights=p, minlength=len(names)) / np.maximum(n, 1)
+    return names, ok, p, s, n, avg
+
+def sector_rows(names: List[str], n: np.ndarray, avg: np.ndarray, **extra: np.ndarray) -> List[Dict[str, Any]]:
+    """產業列（依平均由高到低；同分依名稱），extra 為各產業的附加整數欄位"""
+    return [{"sector": names[i], "avg": round(float(avg[i]), 2), "n": int(n[i]),
+             **{k: int(v[i]) for k, v in extra.items()}}
+            for i in np.argsort(-avg, kind="mergesort") if n[i] > 0]
+
+class MarketScan:
+    def __init__(self, tag: str, market: str, symbols: CachedList, key: str,
+                 summarize: Callable[[Items, List[Dict[str, Any]]], Dict[str, Any]],
+                 chunk_size: int = 200, max_age_open: int = 900, max_age_closed: int = 18 * 3600,
+                 no_list_msg: str = "代號清單取得失敗"):
+        self.tag = tag
+        self.market = market
+        self.symbols = symbols
+        self.key = key
+        self.summarize = summarize
+        self.chunk_size = chunk_size
+        self.max_age_open = max_age_open
+        self.max_age_closed = max_age_closed
+        self.no_list_msg = no_list_msg
+        self._latest: Optional[Dict[str, Any]] = None   # 本程序最後一次掃描（共用存放讀不到時的退路）
+
+    def scan(self) -> Dict[str, Any]:
+        """抓全部報價並彙整；清單取不到或全無報價時拋出 RuntimeError（不覆蓋上一次的好結果）"""
+        items = self.symbols.items()
+        if not items:
+            raise RuntimeError(self.no_list_msg)
+        t0 = time.time()
+        rows = quotes.get_quotes([it["symbol"] for it in items], chunk_size=self.chunk_size)
+        res = self.summarize(items, rows)
+        res["ts"] = int(time.time())
+        res["ms"] = int((time.time() - t0) * 1000)
+        self._latest = res
+        try:
+            state_store.put_blob(self.key, res)
+        except Exception as e:
+            print(f"[{self.tag}] save latest failed:", e)
+        print(f"[{self.tag}] scanned {res['quoted']}/{res['total']} in {res['ms']}ms")
+        return res
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        # 讀共用存放（leader 掃描、其他 worker 也讀得到）；讀不到退回本程序的結果
+        try:
+            return state_store.get_blob(self.key) or self._latest
+        except Exception as e:
+            print(f"[{self.tag}] load latest failed:", e)
+            return self._latest
+
+    def latest(self, max_age: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """最近一次彙整結果（不抓）；max_age 預設依該市場是否盤中"""
+        if max_age is None:
+            max_age = self.max_age_open if quotes.session_open(self.market) else self.max_age_closed
+        res = self.load()
+        return res if res is not None and time.time() - res["ts"] <= max_age else None
+
+    def status(self) -> Dict[str, Any]:
+        res = self.load()
+        return {**self.symbols.status(),
+                "last_scan": {k: v for k, v in res.items() if isinstance(v, (int, float)) or v is None} if res else None}
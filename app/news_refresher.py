@@ -0,0 +1,46 @@
+# app/news_refresher.py 〔v8R7-NEWSBG〕
+# 背景新聞預算：排程定期刷新所有幣種（SYMBOL_MAP）與美股主題（US_SYMBOLS_NEWS）的
+# 新聞分數與標題；前台（build_table、LINE 指令）只讀預算結果，不再同步等 RSS/翻譯。
+from __future__ import annotations
+import time, threading
+from typing import Any, Dict, List
+from app import news_scoring, trend_integrator, us_news
+
+REFRESH_EVERY_MIN = 5          # 排程週期（分鐘）
+REFRESH_MAX_AGE_SEC = 240      # 超過此秒數就重算；小於 news_scoring.CACHE_TTL_SEC，確保讀到的永遠在 TTL 內
+
+_lock = threading.Lock()
+_status: Dict[str, Any] = {"ts": 0, "refreshed": 0, "took_ms": 0, "running": False, "error": "", "changed_ts": 0}
+
+def all_symbols() -> List[str]:
+    return list(dict.fromkeys(list(trend_integrator.SYMBOL_MAP) + list(us_news.US_SYMBOLS_NEWS)))
+
+def refresh_once() -> Dict[str, Any]:
+    """刷新一輪；若上一輪還在跑就直接略過（不疊加）"""
+    if not _lock.acquire(blocking=False):
+        return {**_status, "skipped": True}
+    t0 = time.time()
+    _status["running"] = True
+    try:
+        n = news_scoring.refresh_news(all_symbols(), max_age=REFRESH_MAX_AGE_SEC)
+        _status.update({"refreshed": n, "error": ""})
+        if n:
+            _status["changed_ts"] = int(time.time())
+    except Exception as e:
+        _status["error"] = str(e)
+        print("[NEWSBG] refresh err:", e)
+    finally:
+        _status.update({"ts": int(time.time()), "took_ms": int((time.time() - t0) * 1000), "running": False})
+        _lock.release()
+    return dict(_status)
+
+def refresh_async() -> None:
+    threading.Thread(target=refresh_once, name="news-refresh", daemon=True).start()
+
+def changed_since(ts: float) -> bool:
+    """背景新聞自 ts 之後是否有重算（報表預先渲染用來判斷新聞段落要不要重建）"""
+    return _status["changed_ts"] > ts
+
+def status() -> Dict[str, Any]:
+    now = int(time.time())
+    return {**_status, "age": (now - _status["ts"]) if _status["ts"] else None, "symbols": len(all_symbols())}
@@ -1,13 +1,20 @@
 from __future__ import annotations
-import re, time, json, os, html
-from urllib.parse import quote_plus
-from typing import Dict, List, Tuple
+import time, json, os, html, threading, sqlite3, atexit, asyncio
+from urllib.parse import quote_plus, urlparse
+from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
 import xml.etree.ElementTree as ET
-import urllib.request
+from app import translator, upstream, deadline
+from app.lexicon import Lexicon
 
-CACHE_PATH = os.environ.get("SENTINEL_NEWS_CACHE", "/tmp/sentinel-v8-news.json")
+CACHE_PATH = os.environ.get("SENTINEL_NEWS_CACHE", "/tmp/sentinel-v8-news.sqlite")
 CACHE_TTL_SEC = 600          # 10 分鐘
+EMPTY_TTL_SEC = 120          # 抓不到任何新聞的鍵，較快重試
+FLUSH_DELAY_SEC = 2.0        # 寫回去抖：同一波更新只落盤一次
+SYNC_EVERY_SEC = 5.0         # 多 worker：檢查其他程序寫入的間隔
 WINDOW_SEC    = 24 * 3600    # 24 小時
+FETCH_WORKERS  = int(os.environ.get("SENTINEL_NEWS_WORKERS", "8"))   # RSS 並行抓取上限
+PER_HOST_LIMIT = int(os.environ.get("SENTINEL_NEWS_PER_HOST", "4"))  # 同一主機同時連線上限
 
 BULLY = [
     r"surge", r"rally", r"spike", r"breakout", r"record high", r"bull", r"buy", r"rebound",
@@ -18,6 +25,8 @@ BEARY = [
     r"拋售", r"下跌", r"跳水", r"利空", r"看空", r"暴跌", r"清算", r"崩", r"下挫",
 ]
 
+_SENTIMENT = Lexicon(pos=BULLY, neg=BEARY)  # 匯入時編譯一次，單次掃描計分
+
 KEYWORDS = {
     "BTC": ["bitcoin", "btc", "比特幣"],
     "ETH": ["ethereum", "eth", "以太幣", "以太坊"],
@@ -39,30 +48,177 @@ KEYWORDS = {
 def _now() -> int:
     return int(time.time())
 
-def _load_cache() -> Dict:
-    if os.path.exists(CACHE_PATH):
+class NewsCache:
+    """程序內新聞快取：每個程序只載入一次、每鍵獨立 TTL；
+    寫入先進記憶體並標記髒鍵，去抖後只把變動的鍵以精簡 JSON upsert 到 SQLite。
+    多 worker 時只有 leader 在背景刷新：其他程序以 data_version 偵測到寫入後重讀（最多每 SYNC_EVERY_SEC 一次）。"""
+
+    def __init__(self, path: str, flush_delay: float = FLUSH_DELAY_SEC):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Dict]] = None
+        self._dirty: set = set()
+        self._timer: Optional[threading.Timer] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._dv = -1
+        self._synced = 0.0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                c = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                c.execute("CREATE TABLE IF NOT EXISTS news (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+                c.commit()
+                self._conn = c
+            except Exception as e:
+                print("[NEWS] cache open failed:", e)
+        return self._conn
+
+    def _loaded(self) -> Dict[str, Dict]:
+        if self._data is None:
+            data: Dict[str, Dict] = {}
+            c = self._db()
+            if c is not None:
+                try:
+                    self._dv = c.execute("PRAGMA data_version").fetchone()[0]
+                    self._synced = time.time()
+                    for k, v in c.execute("SELECT k, v FROM news"):
+                        try: data[k] = json.loads(v)
+                        except Exception: pass
+                except Exception as e:
+                    print("[NEWS] cache load failed:", e)
+            self._data = data
+        return self._data
+
+    def _sync(self) -> None:
+        now = time.time()
+        if self._data is None or now - self._synced < SYNC_EVERY_SEC:
+            return
+        self._synced = now
+        c = self._db()
+        if c is None:
+            return
         try:
-            with open(CACHE_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {}
+            dv = c.execute("PRAGMA data_version").fetchone()[0]
+            if dv == self._dv:
+                return
+            self._dv = dv
+            for k, v in c.execute("SELECT k, v FROM news"):
+                if k in self._dirty:
+                    continue
+                try: ent = json.loads(v)
+                except Exception: continue
+                cur = self._data.get(k)
+                if cur is None or int(ent.get("ts", 0)) > int(cur.get("ts", 0)):
+                    self._data[k] = ent
+        except Exception as e:
+            print("[NEWS] cache sync failed:", e)
 
-def _save_cache(data: Dict) -> None:
-    try:
-        with open(CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    def peek(self, key: str) -> Optional[Dict]:
+        """不論新舊都回傳（供背景/降級讀取）"""
+        with self._lock:
+            data = self._loaded()
+            self._sync()
+            return data.get(key)
+
+    def get(self, key: str, now_ts: int) -> Optional[Dict]:
+        """只回傳仍在該鍵 TTL 內的項目"""
+        ent = self.peek(key)
+        if ent and (now_ts - int(ent.get("ts", 0)) < int(ent.get("ttl", CACHE_TTL_SEC))):
+            return ent
+        return None
+
+    def put(self, key: str, ent: Dict, ttl: int = CACHE_TTL_SEC) -> None:
+        with self._lock:
+            ent["ttl"] = int(ttl)
+            self._loaded()[key] = ent
+            self._dirty.add(key)
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> int:
+        with self._lock:
+            self._timer = None
+            if not self._dirty or self._data is None:
+                return 0
+            rows = [(k, json.dumps(self._data[k], ensure_ascii=False, separators=(",", ":")))
+                    for k in self._dirty if k in self._data]
+            self._dirty.clear()
+            c = self._db()
+            if c is None:
+                return 0
+            try:
+                c.executemany("INSERT OR REPLACE INTO news (k, v) VALUES (?, ?)", rows)
+                c.commit()
+            except Exception as e:
+                print("[NEWS] cache flush failed:", e)
+                return 0
+            return len(rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"keys": len(self._loaded()), "dirty": len(self._dirty), "path": self.path}
+
+_CACHE = NewsCache(CACHE_PATH)
+atexit.register(_CACHE.flush)
 
 def _google_news_rss(q: str, hl="en-US", gl="US", ceid="US:en") -> str:
     base = "https://news.google.com/rss/search?q="
     return f"{base}{quote_plus(q)}&hl={hl}&gl={gl}&ceid={ceid}"
 
 def _fetch_url(url: str, timeout: int = 10) -> bytes:
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return resp.read()
+    return upstream.get(url, timeout=timeout).content
+
+_HOST_SEMS: Dict[str, threading.BoundedSemaphore] = {}
+_HOST_SEMS_LOCK = threading.Lock()
+
+def _host_sem(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _HOST_SEMS_LOCK:
+        sem = _HOST_SEMS.get(host)
+        if sem is None:
+            sem = _HOST_SEMS[host] = threading.BoundedSemaphore(max(1, PER_HOST_LIMIT))
+    return sem
+
+def _fetch_rows(url: str) -> List[Tuple[str, str, int]]:
+    with _host_sem(url):
+        try:
+            return _parse_rss(_fetch_url(url))
+        except Exception:
+            return []
+
+def _fetch_all(urls: List[str]) -> List[List[Tuple[str, str, int]]]:
+    """並行抓取多個 RSS；回傳順序與 urls 一致，合併結果與序列抓取相同（分數可重現）"""
+    if not urls:
+        return []
+    uniq = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(uniq)))) as ex:
+        got = dict(zip(uniq, ex.map(deadline.bind(_fetch_rows), uniq)))
+    return [got[u] for u in urls]
+
+_AHOST_SEMS: Dict[str, asyncio.Semaphore] = {}
+
+async def _afetch_rows(url: str, timeout: float = 10) -> List[Tuple[str, str, int]]:
+    host = urlparse(url).netloc
+    sem = _AHOST_SEMS.get(host)
+    if sem is None:
+        sem = _AHOST_SEMS[host] = asyncio.Semaphore(max(1, PER_HOST_LIMIT))
+    async with sem:
+        try:
+            r = await upstream.aget(url, timeout=timeout)
+            return _parse_rss(r.content)
+        except Exception:
+            return []
+
+async def _afetch_all(urls: List[str]) -> List[List[Tuple[str, str, int]]]:
+    """async 版 _fetch_all：同主機並行上限相同，回傳順序與 urls 一致"""
+    uniq = list(dict.fromkeys(urls))
+    rows = await asyncio.gather(*(_afetch_rows(u) for u in uniq))
+    got = dict(zip(uniq, rows))
+    return [got[u] for u in urls]
 
 def _parse_rss(xml_bytes: bytes) -> List[Tuple[str, str, int]]:
     out = []
@@ -88,24 +244,14 @@ def _parse_pubdate(s: str) -> int:
         return _now()
 
 def _translate_to_zh(text: str) -> str:
-    try:
-        q = quote_plus(text)
-        url = f"https://translate.googleapis.com/translate_a/single?client=gtx&sl=auto&tl=zh-TW&dt=t&q={q}"
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            data = json.load(resp)
-        return "".join([seg[0] for seg in data[0] if seg and seg[0]])
-    except Exception:
-        return text
+    # 翻譯走 translator（含持久化翻譯記憶，只有沒翻過的標題才打 API）
+    return translator.translate_to_zh(text)
+
+def _translate_many(texts: List[str]) -> List[str]:
+    return translator.translate_many(texts)
 
 def _score_text(title: str) -> float:
-    t = title.lower()
-    score = 0.0
-    for p in BULLY:
-        if re.search(p, t, re.I): score += 1.0
-    for p in BEARY:
-        if re.search(p, t, re.I): score -= 1.0
-    return score
+    return _SENTIMENT.score(title)
 
 def _time_weight(pub_ts: int, now_ts: int) -> float:
     dt = now_ts - pub_ts
@@ -132,35 +278,62 @@ def _search_queries(symbol: str) -> List[str]:
     return qs
 
 # ---------- 核心：計分 + 標題彙整（中文） ---------- #
-def _score_and_collect(symbol: str, now_ts: int) -> tuple[int, list]:
-    """回傳 (0~100 分, items[dict])；items 含 zh_title/link/pub_ts/weight/raw_score"""
-    cache = _load_cache()
-    ent = cache.get(symbol)
-    if ent and (now_ts - int(ent.get("ts", 0)) < CACHE_TTL_SEC):
+def _fresh(symbol: str, now_ts: int, max_age: Optional[int] = None) -> Optional[Dict]:
+    # max_age 未指定時依該鍵 TTL；背景刷新則以較短的 max_age 提前更新
+    if max_age is None:
+        return _CACHE.get(symbol, now_ts)
+    ent = _CACHE.peek(symbol)
+    return ent if ent and (now_ts - int(ent.get("ts", 0)) < max_age) else None
+
+def _prefetch(symbols: List[str], now_ts: int, max_age: Optional[int] = None) -> Dict[str, List[List[Tuple[str, str, int]]]]:
+    """一次並行抓齊多個幣種（僅快取過期者）的所有 RSS；回傳 {symbol: [rows per query]}"""
+    stale = [s for s in dict.fromkeys(x.upper() for x in symbols) if _fresh(s, now_ts, max_age) is None]
+    plan = [(s, _search_queries(s)) for s in stale]
+    feeds = _fetch_all([u for _, qs in plan for u in qs])
+    out, i = {}, 0
+    for s, qs in plan:
+        out[s] = feeds[i:i + len(qs)]
+        i += len(qs)
+    return out
+
+def _score_and_collect(symbol: str, now_ts: int, feeds: Optional[List[List[Tuple[str, str, int]]]] = None,
+                       max_age: Optional[int] = None) -> tuple[int, list]:
+    """回傳 (0~100 分, items[dict])；items 含 zh_title/link/pub_ts/weight/raw_score
+    feeds 若已由 _prefetch 抓好則直接使用，否則在此並行抓取該幣種所有查詢。"""
+    ent = _fresh(symbol, now_ts, max_age)
+    if ent:
         return int(ent.get("score", 0)), ent.get("items", [])
 
+    if feeds is None:
+        feeds = _fetch_all(_search_queries(symbol))
+    picked = _pick(feeds, now_ts)
+    # 整批翻譯（繁中略過、查翻譯記憶、其餘打包成少數請求）
+    return _finish(symbol, now_ts, picked, _translate_many([p[0] for p in picked]))
+
+def _pick(feeds: List[List[Tuple[str, str, int]]], now_ts: int) -> List[Tuple[str, str, int, float]]:
+    # 去重 + 只留 24h 內（附時間權重）
     seen = set()
-    total = 0.0
-    items: List[Dict] = []
-    for url in _search_queries(symbol):
-        try:
-            raw = _fetch_url(url)
-            rows = _parse_rss(raw)
-        except Exception:
-            rows = []
+    picked: List[Tuple[str, str, int, float]] = []
+    for rows in feeds:
         for title, link, pub_ts in rows:
             key = (title, link)
             if key in seen: continue
             seen.add(key)
             w = _time_weight(pub_ts, now_ts)
             if w <= 0: continue
-            zh_title = _translate_to_zh(title)
-            s = _score_text(zh_title)
-            total += s * w
-            items.append({
-                "zh_title": zh_title, "link": link, "pub_ts": int(pub_ts),
-                "weight": round(w, 3), "raw_score": s
-            })
+            picked.append((title, link, pub_ts, w))
+    return picked
+
+def _finish(symbol: str, now_ts: int, picked: List[Tuple[str, str, int, float]], zh_titles: List[str]) -> tuple[int, list]:
+    scores = _SENTIMENT.score_many(zh_titles)
+    total = 0.0
+    items: List[Dict] = []
+    for (title, link, pub_ts, w), zh_title, s in zip(picked, zh_titles, scores):
+        total += s * w
+        items.append({
+            "zh_title": zh_title, "link": link, "pub_ts": int(pub_ts),
+            "weight": round(w, 3), "raw_score": s
+        })
 
     # 將 raw (-K..K) 映射到 0..100
     K = 10.0
@@ -169,34 +342,108 @@ def _score_and_collect(symbol: str, now_ts: int) -> tuple[int, list]:
 
     # 以權重 * |raw_score| 排序，挑相對重要的中文標題
     items.sort(key=lambda r: (abs(r.get("raw_score", 0)) * r.get("weight", 0)), reverse=True)
-    cache[symbol] = {"ts": now_ts, "score": norm, "items": items[:20]}  # 留 20 則供查詢
-    _save_cache(cache)
+    _CACHE.put(symbol, {"ts": now_ts, "score": norm, "items": items[:20]},  # 留 20 則供查詢
+               ttl=CACHE_TTL_SEC if items else EMPTY_TTL_SEC)
     return norm, items[:20]
 
-def get_news_score(symbol: str) -> int:
+def get_news_score(symbol: str, _feeds=None) -> int:
     try:
-        score, _ = _score_and_collect(symbol.upper(), _now())
+        score, _ = _score_and_collect(symbol.upper(), _now(), _feeds)
         return score
     except Exception:
         return 0
 
-def recent_headlines(symbol: str, k: int = 3) -> List[Dict]:
+def _headlines(items: List[Dict], k: int, now_ts: int | None = None) -> List[Dict]:
+    out = []
+    for it in items[:max(0, k)]:
+        out.append({
+            "title_zh": it.get("zh_title", ""),
+            "link": it.get("link", ""),
+            "timeago": _timeago(int(it.get("pub_ts", 0)), now_ts)
+        })
+    return out
+
+def recent_headlines(symbol: str, k: int = 3, _feeds=None) -> List[Dict]:
     """回傳 [{title_zh, link, timeago}] * k"""
     try:
-        _, items = _score_and_collect(symbol.upper(), _now())
-        out = []
-        for it in items[:max(0, k)]:
-            out.append({
-                "title_zh": it.get("zh_title", ""),
-                "link": it.get("link", ""),
-                "timeago": _timeago(int(it.get("pub_ts", 0)))
-            })
-        return out
+        _, items = _score_and_collect(symbol.upper(), _now(), _feeds)
+        return _headlines(items, k)
     except Exception:
         return []
 
 def batch_news_score(symbols: List[str]) -> Dict[str, int]:
-    return {s.upper(): get_news_score(s) for s in symbols}
+    # 先並行抓齊所有過期幣種的 RSS，再依輸入順序逐一計分
+    try: feeds = _prefetch(symbols, _now())
+    except Exception: feeds = {}
+    return {s.upper(): get_news_score(s, _feeds=feeds.get(s.upper())) for s in symbols}
 
 def batch_recent_headlines(symbols: List[str], k: int = 3) -> Dict[str, List[Dict]]:
-    return {s.upper(): recent_headlines(s, k=k) for s in symbols}
+    try: feeds = _prefetch(symbols, _now())
+    except Exception: feeds = {}
+    return {s.upper(): recent_headlines(s, k=k, _feeds=feeds.get(s.upper())) for s in symbols}
+
+# ---------- async 版（webhook 用） ---------- #
+async def _ascore_and_collect(symbol: str, now_ts: int, feeds: Optional[List[List[Tuple[str, str, int]]]] = None) -> tuple[int, list]:
+    ent = _fresh(symbol, now_ts)
+    if ent:
+        return int(ent.get("score", 0)), ent.get("items", [])
+    if feeds is None:
+        feeds = await _afetch_all(_search_queries(symbol))
+    picked = _pick(feeds, now_ts)
+    zh_titles = await translator.atranslate_many([p[0] for p in picked])
+    return _finish(symbol, now_ts, picked, zh_titles)
+
+async def arecent_headlines(symbol: str, k: int = 3) -> List[Dict]:
+    try:
+        _, items = await _ascore_and_collect(symbol.upper(), _now())
+        return _headlines(items, k)
+    except Exception:
+        return []
+
+async def abatch_recent_headlines(symbols: List[str], k: int = 3) -> Dict[str, List[Dict]]:
+    now = _now()
+    stale = [s for s in dict.fromkeys(x.upper() for x in symbols) if _fresh(s, now) is None]
+    plan = [(s, _search_queries(s)) for s in stale]
+    flat = await _afetch_all([u for _, qs in plan for u in qs])
+    feeds, i = {}, 0
+    for s, qs in plan:
+        feeds[s] = flat[i:i + len(qs)]; i += len(qs)
+    async def one(sym: str) -> List[Dict]:
+        try:
+            _, items = await _ascore_and_collect(sym, now, feeds.get(sym))
+            return _headlines(items, k)
+        except Exception:
+            return []
+    heads = await asyncio.gather(*(one(s.upper()) for s in symbols))
+    return {s.upper(): h for s, h in zip(symbols, heads)}
+
+# ---------- 背景預算：刷新 + 非阻塞讀取 ---------- #
+def refresh_news(symbols: List[str], max_age: int) -> int:
+    """刷新「已超過 max_age 秒」的鍵（並行抓取 + 批次翻譯）；回傳實際刷新的鍵數。供背景排程使用。"""
+    now = _now()
+    stale = [s for s in dict.fromkeys(x.upper() for x in symbols) if _fresh(s, now, max_age) is None]
+    if not stale:
+        return 0
+    feeds = _prefetch(stale, now, max_age=max_age)
+    for s in stale:
+        try: _score_and_collect(s, now, feeds.get(s), max_age=max_age)
+        except Exception as e: print(f"[NEWS] refresh {s} failed:", e)
+    return len(stale)
+
+def peek_news(symbol: str, k: int = 3, now_ts: int | None = None) -> Optional[Dict]:
+    """非阻塞：只讀已預算的結果 → {score, headlines, ts, age}；尚未預算過回 None"""
+    ent = _CACHE.peek(symbol.upper())
+    if not ent:
+        return None
+    now = int(now_ts or _now())
+    ts = int(ent.get("ts", 0))
+    return {
+        "score": int(ent.get("score", 0)),
+        "headlines": _headlines(ent.get("items", []), k, now),
+        "ts": ts,
+        "age": max(0, now - ts),
+    }
+
+def peek_many(symbols: List[str], k: int = 3) -> Dict[str, Optional[Dict]]:
+    now = _now()
+    return {s.upper(): peek_news(s, k=k, now_ts=now) for s in symbols}
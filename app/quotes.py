@@ -0,0 +1,160 @@
+# app/quotes.py 〔v8R7-QUOTE〕
+# 統一報價服務（Yahoo quote）：台股/美股共用一份快取。
+# - 所有要抓的代號（跨市場）合併後切塊並行請求；同一代號已在抓的就等那一次，不重複打
+# - 快取 TTL 依交易時段：盤中短（SENTINEL_QUOTE_TTL_OPEN）、收盤後長（SENTINEL_QUOTE_TTL_CLOSED）
+# - 抓取失敗時回退到舊報價（寧可舊，不要空）；徽章等衍生計算用 peek() 只讀快取
+from __future__ import annotations
+import os, time, threading
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+from urllib.parse import unquote
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from app import upstream, deadline
+
+YAHOO_QUOTE = "https://query1.finance.yahoo.com/v7/finance/quote"
+CHUNK_SIZE = 40                  # 單次請求代號數
+FETCH_WORKERS = 4
+TTL_OPEN_SEC = int(os.environ.get("SENTINEL_QUOTE_TTL_OPEN", "60"))
+TTL_CLOSED_SEC = int(os.environ.get("SENTINEL_QUOTE_TTL_CLOSED", "1800"))
+WAIT_SEC = 15.0                  # 沒有 deadline scope 時，等待抓取的上限
+
+# 交易時段（不含國定假日；假日只是多抓幾次，不影響正確性）
+SESSIONS = {
+    "TW": (ZoneInfo("Asia/Taipei"), dtime(9, 0), dtime(13, 30)),
+    "US": (ZoneInfo("America/New_York"), dtime(9, 30), dtime(16, 0)),
+}
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, Dict]] = {}        # 代號 -> (抓取時間, 報價)
+_inflight: Dict[str, Future] = {}
+_batch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="quote-batch")
+_chunk_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="quote-chunk")
+_stats = {"requests": 0, "symbols_fetched": 0, "hits": 0, "joined": 0, "stale_served": 0}
+
+def market_of(symbol: str) -> str:
+    s = unquote(symbol).upper()
+    return "TW" if s.endswith((".TW", ".TWO")) or s == "^TWII" else "US"
+
+def session_open(market: str, now: Optional[float] = None) -> bool:
+    tz, start, end = SESSIONS[market]
+    t = datetime.fromtimestamp(now if now is not None else time.time(), tz)
+    return t.weekday() < 5 and start <= t.time() <= end
+
+def ttl_for(symbol: str, now: Optional[float] = None) -> int:
+    return TTL_OPEN_SEC if session_open(market_of(symbol), now) else TTL_CLOSED_SEC
+
+def _fresh(symbol: str, now: float) -> bool:
+    ent = _cache.get(symbol)
+    return ent is not None and now - ent[0] <= ttl_for(symbol, now)
+
+def _parse(payload: dict) -> Dict[str, Dict]:
+    out = {}
+    for d in payload.get("quoteResponse", {}).get("result", []):
+        sym = d.get("symbol", "")
+        out[sym] = {
+            "symbol": sym,
+            "name": d.get("shortName") or sym,
+            "price": d.get("regularMarketPrice"),
+            "pct": d.get("regularMarketChangePercent"),
+            "cap": d.get("marketCap"),
+        }
+    return out
+
+def _fetch_chunk(chunk: List[str]) -> Dict[str, Dict]:
+    # Yahoo 以原始代號查詢（%5ETWII → ^TWII）；回傳時換回呼叫端用的代號
+    wire = {unquote(s): s for s in chunk}
+    r = upstream.get(YAHOO_QUOTE, params={"symbols": ",".join(wire)}, timeout=10)
+    got = _parse(r.json())
+    return {wire[w]: {**q, "symbol": wire[w]} for w, q in got.items() if w in wire}
+
+def _fetch(symbols: List[str], chunk_size: int = CHUNK_SIZE) -> Dict[str, Dict]:
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    futs = [_chunk_pool.submit(deadline.bind(_fetch_chunk), c) for c in chunks]
+    out: Dict[str, Dict] = {}
+    errors = []
+    for f in futs:
+        try:
+            out.update(f.result())
+        except Exception as e:
+            errors.append(e)
+    now = time.time()
+    with _lock:
+        _stats["requests"] += len(chunks)
+        _stats["symbols_fetched"] += len(out)
+        for s, q in out.items():
+            _cache[s] = (now, q)
+    if errors and not out:
+        raise errors[0]
+    return out
+
+def _start(symbols: List[str], chunk_size: int = CHUNK_SIZE) -> Future:
+    """呼叫端須持有 _lock；為這批代號開一次抓取並登記 in-flight"""
+    fut = _batch_pool.submit(deadline.bind(_fetch), symbols, chunk_size)
+    for s in symbols:
+        _inflight[s] = fut
+
+    def done(f: Future, syms=tuple(symbols)):
+        with _lock:
+            for s in syms:
+                if _inflight.get(s) is f:
+                    _inflight.pop(s, None)
+    fut.add_done_callback(done)
+    return fut
+
+def _plan(symbols: List[str], chunk_size: int = CHUNK_SIZE) -> List[Future]:
+    now = time.time()
+    with _lock:
+        waits, missing = set(), []
+        for s in dict.fromkeys(symbols):
+            if _fresh(s, now):
+                _stats["hits"] += 1
+            elif s in _inflight:
+                _stats["joined"] += 1
+                waits.add(_inflight[s])
+            else:
+                missing.append(s)
+        if missing:
+            waits.add(_start(missing, chunk_size))
+    return list(waits)
+
+def prefetch(symbols: List[str]) -> None:
+    """非阻塞：先把過期/缺少的代號合併成一批開抓（例如報表一開始把台股+美股一起送出）"""
+    _plan(symbols)
+
+def get_quotes(symbols: List[str], chunk_size: int = CHUNK_SIZE) -> List[Dict]:
+    """依輸入順序回傳報價列；過期者會（合併）重抓，抓不到就回退舊值，完全沒有的略過。
+    全市場掃描等大批請求可放大 chunk_size，減少請求數"""
+    futs = _plan(symbols, chunk_size)
+    if futs:
+        left = deadline.remaining()
+        wait(futs, timeout=WAIT_SEC if left is None else left)
+    now = time.time()
+    out = []
+    with _lock:
+        for s in symbols:
+            ent = _cache.get(s)
+            if ent is None:
+                continue
+            if not _fresh(s, now):
+                _stats["stale_served"] += 1
+            out.append(dict(ent[1]))
+    if not out and symbols and futs:
+        for f in futs:
+            if f.done() and f.exception() is not None:
+                raise f.exception()
+    return out
+
+def peek(symbols: List[str], max_age: Optional[int] = None) -> List[Dict]:
+    """只讀快取（不抓）；max_age 為 None 時不論新舊"""
+    now = time.time()
+    with _lock:
+        return [dict(e[1]) for s in symbols for e in [_cache.get(s)]
+                if e is not None and (max_age is None or now - e[0] <= max_age)]
+
+def status() -> Dict:
+    now = time.time()
+    with _lock:
+        return {**_stats, "cached": len(_cache), "inflight": len(_inflight),
+                "sessions": {m: session_open(m, now) for m in SESSIONS},
+                "ttl": {"open": TTL_OPEN_SEC, "closed": TTL_CLOSED_SEC}}
@@ -0,0 +1,74 @@
+# app/rank_engine.py 〔v8R7-RANK〕
+# 向量化排名引擎：以欄位（NumPy 陣列）一次算完量能百分位、強度/新聞/總分與相位，
+# 並用 argpartition 部分選取前 N 名多/空；幣種宇宙放大到 500~1000 檔仍是毫秒級。
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+W_STRONG = 0.6
+W_NEWS = 0.4
+
+def pct_rank(values) -> np.ndarray:
+    """0~1 百分位；同值取平均名次（ties 共享同一百分位）。n<=1 時回 0.5。"""
+    v = np.asarray(values, dtype=float)
+    n = v.size
+    if n == 0:
+        return np.empty(0)
+    if n == 1:
+        return np.full(1, 0.5)
+    order = np.argsort(v, kind="mergesort")
+    sv = v[order]
+    starts = np.r_[True, sv[1:] != sv[:-1]]
+    grp = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.r_[first[1:], n] - 1
+    ranks = np.empty(n)
+    ranks[order] = ((first + last) / 2.0)[grp]
+    return ranks / (n - 1)
+
+def phases(pct24) -> np.ndarray:
+    p = np.asarray(pct24, dtype=float)
+    return np.select([p >= 5, p >= 1, p >= -3], ["🔥", "⚡", "💤"], default="🌙")
+
+def score(pct24, volume, news) -> Dict[str, np.ndarray]:
+    """一次向量化計算所有列；分數已四捨五入到 0.1（與顯示一致，排序也以此為準）"""
+    pct = np.asarray(pct24, dtype=float)
+    vr = pct_rank(volume)
+    strong = np.maximum(pct, 0.0) * vr * 100.0
+    news_s = np.asarray(news, dtype=float)
+    total = W_STRONG * strong + W_NEWS * news_s
+    return {
+        "volume_rel": vr,
+        "score_strong": np.round(strong, 1),
+        "score_total": np.round(total, 1),
+        "phase": phases(pct),
+    }
+
+def rank_desc(values) -> np.ndarray:
+    """由高到低的完整排序索引；同分保留原始順序（穩定）"""
+    v = np.asarray(values, dtype=float)
+    return np.argsort(-v, kind="mergesort")
+
+def top_n(values, n: int, mask: Optional[np.ndarray] = None, largest: bool = True) -> np.ndarray:
+    """部分選取前 n 名（argpartition，O(N)），再只對選中的 n 筆排序；同分依原始索引"""
+    v = np.asarray(values, dtype=float)
+    idx = np.flatnonzero(mask) if mask is not None else np.arange(v.size)
+    if n <= 0 or idx.size == 0:
+        return np.empty(0, dtype=int)
+    key = -v[idx] if largest else v[idx]
+    if n < idx.size:
+        part = np.argpartition(key, n - 1)
+        # 第 n 名可能與其後同分：把同分者一併納入，再依原始索引決勝
+        cut = key[part[n - 1]]
+        sel = idx[key <= cut]
+        key = -v[sel] if largest else v[sel]
+    else:
+        sel = idx
+    return sel[np.lexsort((sel, key))][:n]
+
+def pick_long_short(pct24, total, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """多：pct24 ≥ 0 中總分最高 n 檔；空：pct24 < 0 中總分最低 n 檔"""
+    pct = np.asarray(pct24, dtype=float)
+    longs = top_n(total, n, mask=pct >= 0, largest=True)
+    shorts = top_n(total, n, mask=pct < 0, largest=False)
+    return longs, shorts
@@ -0,0 +1,74 @@
+# app/sections.py 〔v8R7-SEC〕
+# 報表分段並行：各段（台股/台股新聞/美股/美股新聞/徽章/幣圈）彼此獨立，同時開跑；
+# 每段有自己的 timeout（也受外層 deadline 限制），準時完成的依固定順序輸出，逾時者以占位文字代替。
+# 整份報表耗時 ≈ 最慢的一段，而不是各段相加。
+# 可傳入上一輪（預先渲染）的結果：未過 max_age 且資料未變動的段落直接沿用，只重建過期者。
+from __future__ import annotations
+import os, time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+from app import deadline
+
+SECTION_TIMEOUT_SEC = float(os.environ.get("SENTINEL_SECTION_TIMEOUT", "12"))
+
+OK, ERROR, LATE = "ok", "error", "late"
+
+@dataclass
+class Section:
+    key: str
+    build: Callable[[], Any]
+    timeout: float = SECTION_TIMEOUT_SEC
+    fail: str = ""            # 失敗訊息前綴，例如「台股區塊生成失敗」
+    late: str = ""            # 逾時占位文字
+    max_age: float = 0        # 上一輪結果可沿用的秒數（0 = 每次重建）
+    changed: Optional[Callable[[float], bool]] = None   # 資料自該時間點後是否有更新
+
+@dataclass
+class Result:
+    key: str
+    value: Any
+    status: str
+    ms: int
+    ts: float = 0.0           # 建構完成時間（epoch）
+
+def _build(sec: Section) -> Any:
+    with deadline.scope(sec.timeout):
+        return sec.build()
+
+def reusable(sec: Section, prev: Optional[Result], now: float) -> bool:
+    if prev is None or prev.status != OK or sec.max_age <= 0 or now - prev.ts > sec.max_age:
+        return False
+    try:
+        return not (sec.changed and sec.changed(prev.ts))
+    except Exception:
+        return False
+
+def run(sections: List[Section], prev: Optional[Dict[str, Result]] = None) -> Dict[str, Result]:
+    """並行建構各段（可沿用 prev 中仍新鮮的段落）；回傳 {key: Result}，順序與輸入一致"""
+    if not sections:
+        return {}
+    now = time.time()
+    prev = prev or {}
+    keep = {s.key: prev[s.key] for s in sections if reusable(s, prev.get(s.key), now)}
+    todo = [s for s in sections if s.key not in keep]
+    t0 = time.monotonic()
+    built: Dict[str, Result] = {}
+    if todo:
+        ex = ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="section")
+        futs = [ex.submit(deadline.bind(_build), s) for s in todo]
+        try:
+            for sec, fut in zip(todo, futs):
+                left = max(0.0, t0 + sec.timeout - time.monotonic())
+                try:
+                    value, status = fut.result(timeout=left), OK
+                except FutureTimeout:
+                    value, status = sec.late or f"⏳ {sec.key} 逾時未完成（下次報表補上）", LATE
+                except Exception as e:
+                    value, status = f"{sec.fail or sec.key + ' 生成失敗'}：{e}", ERROR
+                built[sec.key] = Result(sec.key, value, status, int((time.monotonic() - t0) * 1000), time.time())
+        finally:
+            ex.shutdown(wait=False)     # 逾時的段落在背景自行結束，不拖住報表
+    out = {s.key: keep.get(s.key) or built[s.key] for s in sections}
+    print("[SECTIONS]", " ".join(f"{k}=reused" if k in keep else f"{k}={r.status}/{r.ms}ms" for k, r in out.items()))
+    return out
@@ -0,0 +1,153 @@
+# app/services/version_diff.py 〔v8R7-VDIFF〕
+# 版本核對：持久化的檔案指紋索引（size / mtime_ns / inode 未變就沿用舊 sha，不重讀檔）。
+# - 掃描只做 os.walk + stat；真正讀檔雜湊的只有變動過的檔案
+# - 與 baseline 的差異與徽章結果快取起來：樹沒有變動（無檔案 stat 改變、baseline 未更新）就直接回傳
+# - 徽章另有短 TTL，TTL 內連 walk 都省掉（compose_report / 「版本核對」不再每次全掃）
+# 介面與 main._VersionDiffFallback 相同：checkpoint_now / diff_now_vs_prev / get_version_badge
+from __future__ import annotations
+import os, json, time, hashlib, threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.state_store import atomic_write_json
+
+BASELINE_PATH = os.environ.get("SENTINEL_VERSION_BASELINE", "/tmp/sentinel-v8.version-prev.json")
+INDEX_PATH = os.environ.get("SENTINEL_VERSION_INDEX", "/tmp/sentinel-v8.version-index.json")
+SCAN_ROOT = "."
+MAX_FILE_BYTES = 262_144
+BADGE_TTL_SEC = int(os.environ.get("SENTINEL_VERSION_BADGE_TTL", "60"))
+SKIP_DIRS = {".git", "__pycache__", ".venv", "venv", ".render"}
+
+_lock = threading.RLock()
+_index: Optional[Dict[str, Any]] = None           # {"root": str, "files": {rel: {size, mtime_ns, ino, sha}}}
+_cached: Dict[str, Any] = {"sig": None, "delta": None, "count": 0, "ts": 0}
+
+def _skipped(rel: str) -> bool:
+    parts = rel.replace("\\", "/").split("/")
+    return any(p in SKIP_DIRS for p in parts[:-1])
+
+def _walk(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for fn in filenames:
+            if "." not in fn:
+                continue
+            p = os.path.join(dirpath, fn)
+            try:
+                st = os.stat(p)
+            except Exception:
+                continue
+            if st.st_size > MAX_FILE_BYTES:
+                continue
+            yield os.path.relpath(p, root), st
+
+def _sha(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()[:8]
+
+def _load_index(root: str) -> Dict[str, Any]:
+    global _index
+    if _index is None or _index.get("root") != root:
+        try:
+            with open(INDEX_PATH, "r", encoding="utf-8") as f:
+                idx = json.load(f)
+            if idx.get("root") != root:
+                raise ValueError("root changed")
+        except Exception:
+            idx = {"root": root, "files": {}}
+        _index = idx
+    return _index
+
+def scan(root: str = SCAN_ROOT) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """回傳 (目前檔案指紋 {rel: {size, mtime_ns, ino, sha}}, 本次重新雜湊/增刪的檔案數)"""
+    root = os.path.abspath(root)
+    with _lock:
+        idx = _load_index(root)
+        old = idx["files"]
+        files: Dict[str, Dict[str, Any]] = {}
+        changed = 0
+        for rel, st in _walk(root):
+            ent = old.get(rel)
+            if ent and ent["size"] == st.st_size and ent["mtime_ns"] == st.st_mtime_ns and ent["ino"] == st.st_ino:
+                files[rel] = ent
+                continue
+            try:
+                sha = _sha(os.path.join(root, rel))
+            except Exception:
+                continue
+            files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "ino": st.st_ino, "sha": sha}
+            changed += 1
+        changed += sum(1 for k in old if k not in files)
+        if changed:
+            idx["files"] = files
+            try:
+                atomic_write_json(INDEX_PATH, idx)
+            except Exception as e:
+                print("[VDIFF] index save failed:", e)
+        return files, changed
+
+def _baseline() -> Dict[str, Any]:
+    try:
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            prev = json.load(f)
+    except Exception:
+        prev = {"items": {}}
+    # 舊版 baseline 可能含被略過目錄（如 .git/objects）下的檔案：比對前濾掉，避免假差異
+    prev["items"] = {k: v for k, v in (prev.get("items") or {}).items() if not _skipped(k)}
+    return prev
+
+def _baseline_sig() -> Tuple[int, int]:
+    try:
+        st = os.stat(BASELINE_PATH)
+        return st.st_mtime_ns, st.st_size
+    except Exception:
+        return 0, 0
+
+def _diff(prev_items: Dict[str, Any], files: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    add = [k for k in files if k not in prev_items]
+    delete = [k for k in prev_items if k not in files]
+    modify = [k for k in files if k in prev_items and prev_items[k].get("sha") != files[k]["sha"]]
+    return {"add": sorted(add), "delete": sorted(delete), "modify": sorted(modify)}
+
+def _mk_summary(delta: Dict[str, Any], limit: int = 10) -> str:
+    a, d, m = len(delta["add"]), len(delta["delete"]), len(delta["modify"])
+    lines = [f"📦 版本差異：+{a} −{d} ✎{m}（顯示最多 {limit} 筆）"]
+    def cut(lst, mark):
+        for i, k in enumerate(lst[:limit], 1):
+            lines.append(f"{mark} {i}. {k}")
+    cut(delta["add"], "+"); cut(delta["modify"], "✎"); cut(delta["delete"], "−")
+    return "\n".join(lines)
+
+def _current_delta(root: str, max_age: int = 0) -> Tuple[Dict[str, Any], int]:
+    """目前與 baseline 的差異；樹與 baseline 都沒變時沿用快取，max_age 內連掃描都略過"""
+    root = os.path.abspath(root)
+    with _lock:
+        now = time.time()
+        if max_age and _cached["delta"] is not None and now - _cached["ts"] < max_age \
+                and _cached["sig"] and _cached["sig"][0] == root and _cached["sig"][1] == _baseline_sig():
+            return _cached["delta"], _cached["count"]
+        files, changed = scan(root)
+        sig = (root, _baseline_sig())
+        if changed or _cached["delta"] is None or _cached["sig"] != sig:
+            _cached["delta"] = _diff(_baseline()["items"], files)
+        _cached.update({"sig": sig, "count": len(files), "ts": now})
+        return _cached["delta"], _cached["count"]
+
+# ---------- 對外介面（與 main 的 fallback 相同） ---------- #
+def checkpoint_now(root: str = SCAN_ROOT) -> Dict[str, Any]:
+    with _lock:
+        files, _ = scan(root)
+        items = {k: {"size": v["size"], "mtime": v["mtime_ns"] // 1_000_000_000, "sha": v["sha"]} for k, v in files.items()}
+        snap = {"root": os.path.abspath(root), "ts": int(time.time()), "items": items}
+        atomic_write_json(BASELINE_PATH, snap)
+        _cached["delta"] = None
+        return {"ok": True, "count": len(items)}
+
+def diff_now_vs_prev(root: str = SCAN_ROOT) -> Dict[str, Any]:
+    delta, count = _current_delta(root)
+    return {"delta": delta, "summary": _mk_summary(delta), "now_count": count}
+
+def get_version_badge() -> Tuple[bool, str]:
+    delta, _ = _current_delta(SCAN_ROOT, max_age=BADGE_TTL_SEC)
+    n = len(delta["add"]) + len(delta["delete"]) + len(delta["modify"])
+    return (n > 0, f"版本Δ({n})") if n > 0 else (False, "")
@@ -0,0 +1,71 @@
+# app/singleflight.py 〔v8R7-SF〕
+# Single-flight：同一 key 同時只跑一次上游呼叫，其餘並行呼叫者等待並共用同一結果（或同一例外）。
+# SingleFlight 給執行緒用；AsyncSingleFlight 給 event loop 內的 await 用。
+from __future__ import annotations
+import asyncio, threading
+from typing import Any, Awaitable, Callable, Dict, List
+
+class _Call:
+    __slots__ = ("event", "value", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.stats["shared"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> List[str]:
+        with self._lock:
+            return list(self._calls)
+
+class AsyncSingleFlight:
+    """async 版：同一 key 並行的 await 共用同一個 Task"""
+
+    def __init__(self):
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["calls"] += 1
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None)
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> List[str]:
+        return [k for k, t in self._tasks.items() if not t.done()]
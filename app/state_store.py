@@ -1,31 +1,65 @@
+# app/state_store.py 〔v8R7-STATE〕
+# 狀態儲存：SQLite（WAL）逐鍵存放，取代整份 JSON 重寫。
+# - 列 = (ns, k, v)：prefs 與 watches 每個子鍵一列，其餘頂層鍵放 ns="meta"
+# - get_state() 回傳記憶體中的 dict（API 不變）；save_state() 只 upsert/刪除與上次落盤不同的鍵
+# - 多程序：以 PRAGMA data_version 偵測他人寫入，只合併被別人改過的鍵；
+#   同一鍵本地也有未存的修改時保留本地值（下次 save 寫回，後寫者勝）
+# - 首次啟動若 DB 為空且舊 JSON（SENTINEL_STATE）存在，會自動匯入
+# - 另有 blob 表：跨程序共用的衍生結果（如全市場掃描彙整），不進 get_state()
 from __future__ import annotations
-import json, os, tempfile, shutil, time
-from typing import Any, Dict
+import json, os, sqlite3, tempfile, threading, time
+from typing import Any, Dict, Optional, Tuple
 
-STATE_PATH = os.environ.get("SENTINEL_STATE", "/tmp/sentinel-v8.json")
+STATE_PATH = os.environ.get("SENTINEL_STATE", "/tmp/sentinel-v8.json")          # 舊版 JSON（僅供匯入）
+DB_PATH = os.environ.get("SENTINEL_STATE_DB", "/tmp/sentinel-v8-state.sqlite")
 DEFAULT_STATE: Dict[str, Any] = {
     "prefs": { "color_scheme": "tw" },   # tw=多紅空綠, us=多綠空紅
     "watches": {},                       # "BTC": {"until": 0, "last_alert": 0}
 }
+_NESTED = ("prefs", "watches")           # 這兩個頂層鍵逐子鍵存
 
-def _atomic_write(path: str, data: Dict[str, Any]) -> None:
-    d = os.path.dirname(path)
-    if d and not os.path.exists(d):
-        os.makedirs(d, exist_ok=True)
-    fd, tmp_path = tempfile.mkstemp(prefix="sentinel_", suffix=".json", dir=d if d else ".")
+Key = Tuple[str, str]
+
+_lock = threading.RLock()
+_conn: Optional[sqlite3.Connection] = None
+_state_cache: Dict[str, Any] | None = None
+_persisted: Dict[Key, str] = {}          # 上次落盤（或自 DB 讀入）時各列的 JSON
+_data_version = -1
+_blobs: Dict[str, Tuple[int, Any]] = {}   # blob 讀取快取：鍵 -> (讀取時的 data_version, 值)
+
+def _dump(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """精簡 JSON 寫到同目錄暫存檔再 os.replace：讀者不會看到寫一半的檔案（各模組的本機 JSON 檔共用）"""
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix="sentinel_", suffix=".json", dir=d)
     try:
         with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
-        shutil.move(tmp_path, path)
-    finally:
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
-            pass
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except Exception:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(DB_PATH)
+        if d and not os.path.exists(d):
+            os.makedirs(d, exist_ok=True)
+        c = sqlite3.connect(DB_PATH, timeout=10, check_same_thread=False, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, k TEXT NOT NULL, v TEXT NOT NULL, PRIMARY KEY (ns, k))")
+        c.execute("CREATE TABLE IF NOT EXISTS blob (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+        _conn = c
+        _import_legacy_json(c)
+    return _conn
 
 def _merge_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
-    out = DEFAULT_STATE.copy()
+    out = {k: v for k, v in data.items() if k not in _NESTED}
     out["prefs"] = {**DEFAULT_STATE["prefs"], **(data.get("prefs") or {})}
     out["watches"] = data.get("watches") or {}
     # 修補 last_alert 欄位
@@ -36,29 +70,112 @@ def _merge_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
             v.setdefault("last_alert", 0)
     return out
 
-def load_state() -> Dict[str, Any]:
-    if not os.path.exists(STATE_PATH):
-        return DEFAULT_STATE.copy()
+def _rows(state: Dict[str, Any]) -> Dict[Key, str]:
+    rows: Dict[Key, str] = {}
+    for top, val in state.items():
+        if top in _NESTED and isinstance(val, dict):
+            for k, v in val.items():
+                rows[(top, str(k))] = _dump(v)
+        else:
+            rows[("meta", top)] = _dump(val)
+    return rows
+
+def _write(upserts: Dict[Key, str], deletes) -> None:
+    if not upserts and not deletes:
+        return
+    c = _db()
+    c.execute("BEGIN IMMEDIATE")
     try:
-        with open(STATE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return _merge_defaults(data)
+        if upserts:
+            c.executemany("INSERT INTO kv (ns, k, v) VALUES (?, ?, ?) ON CONFLICT(ns, k) DO UPDATE SET v = excluded.v",
+                          [(ns, k, v) for (ns, k), v in upserts.items()])
+        if deletes:
+            c.executemany("DELETE FROM kv WHERE ns = ? AND k = ?", list(deletes))
+        c.execute("COMMIT")
     except Exception:
-        return DEFAULT_STATE.copy()
+        c.execute("ROLLBACK")
+        raise
 
-_state_cache: Dict[str, Any] | None = None
+def _import_legacy_json(c: sqlite3.Connection) -> None:
+    if c.execute("SELECT 1 FROM kv LIMIT 1").fetchone() or not os.path.exists(STATE_PATH):
+        return
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            data = _merge_defaults(json.load(f))
+        _write(_rows(data), ())
+        print(f"[STATE] imported legacy JSON state from {STATE_PATH}")
+    except Exception as e:
+        print("[STATE] legacy import failed:", e)
 
-def get_state() -> Dict[str, Any]:
-    global _state_cache
-    if _state_cache is None:
-        _state_cache = load_state()
-    return _state_cache
-
-def save_state() -> None:
-    global _state_cache
-    if _state_cache is None:
+def _read_all() -> Dict[Key, str]:
+    return {(ns, k): v for ns, k, v in _db().execute("SELECT ns, k, v FROM kv")}
+
+def _set_in(state: Dict[str, Any], key: Key, raw: Optional[str]) -> None:
+    ns, k = key
+    if ns == "meta":
+        if raw is None: state.pop(k, None)
+        else: state[k] = json.loads(raw)
+    else:
+        if raw is None: state.setdefault(ns, {}).pop(k, None)
+        else: state.setdefault(ns, {})[k] = json.loads(raw)
+
+def _refresh() -> None:
+    """他程序有寫入（data_version 變了）才重讀；只套用 DB 與上次所見不同、且本地沒有未存修改的鍵"""
+    global _data_version
+    dv = _db().execute("PRAGMA data_version").fetchone()[0]
+    if dv == _data_version:
         return
-    _atomic_write(STATE_PATH, _state_cache)
+    _data_version = dv
+    rows = _read_all()
+    local = _rows(_state_cache)
+    def dirty(key: Key) -> bool:        # 本地有尚未 save 的修改（含新增/刪除）
+        return local.get(key) != _persisted.get(key)
+    for key, raw in rows.items():
+        if _persisted.get(key) != raw:
+            # 衝突（兩邊都改了同一鍵）時保留本地值：只更新「上次所見」，下次 save 會把本地值寫回
+            if not dirty(key):
+                _set_in(_state_cache, key, raw)
+            _persisted[key] = raw
+    for key in [k for k in _persisted if k not in rows]:
+        if not dirty(key):
+            _set_in(_state_cache, key, None)
+        _persisted.pop(key, None)
+
+def load_state() -> Dict[str, Any]:
+    with _lock:
+        state: Dict[str, Any] = {}
+        for key, raw in _read_all().items():
+            _set_in(state, key, raw)
+        return _merge_defaults(state)
+
+def get_state() -> Dict[str, Any]:
+    global _state_cache, _data_version
+    with _lock:
+        if _state_cache is None:
+            _data_version = _db().execute("PRAGMA data_version").fetchone()[0]
+            rows = _read_all()
+            _state_cache = {}
+            for key, raw in rows.items():
+                _set_in(_state_cache, key, raw)
+            _state_cache = _merge_defaults(_state_cache)
+            _persisted.clear()
+            _persisted.update(rows)
+        else:
+            _refresh()
+        return _state_cache
+
+def save_state(state: Dict[str, Any] | None = None) -> None:
+    """把記憶體狀態中有變動的鍵寫回（逐鍵 upsert/刪除）；state 參數僅為相容舊呼叫，須為 get_state() 的同一物件"""
+    with _lock:
+        if _state_cache is None:
+            return
+        rows = _rows(_state_cache)
+        upserts = {k: v for k, v in rows.items() if _persisted.get(k) != v}
+        deletes = [k for k in _persisted if k not in rows]
+        _write(upserts, deletes)
+        _persisted.update(upserts)
+        for k in deletes:
+            _persisted.pop(k, None)
 
 # －－ prefs －－
 def set_pref(key: str, value: Any) -> None:
@@ -100,3 +217,30 @@ def cleanup_expired(now_ts: int | None = None) -> bool:
     if changed:
         save_state()
     return changed
+
+# －－ blobs（跨程序共用的衍生結果；leader 寫、各 worker 讀）－－
+def put_blob(key: str, value: Any) -> None:
+    raw = _dump(value)
+    with _lock:
+        c = _db()
+        c.execute("INSERT INTO blob (k, v) VALUES (?, ?) ON CONFLICT(k) DO UPDATE SET v = excluded.v", (key, raw))
+        _blobs[key] = (c.execute("PRAGMA data_version").fetchone()[0], json.loads(raw))
+
+def get_blob(key: str) -> Any:
+    """DB 沒有他人寫入（data_version 未變）時直接回傳上次讀到的值；不存在回 None"""
+    with _lock:
+        c = _db()
+        dv = c.execute("PRAGMA data_version").fetchone()[0]
+        hit = _blobs.get(key)
+        if hit is not None and hit[0] == dv:
+            return hit[1]
+        row = c.execute("SELECT v FROM blob WHERE k = ?", (key,)).fetchone()
+        val = json.loads(row[0]) if row else None
+        _blobs[key] = (dv, val)
+        return val
+
+def get_blobs(prefix: str) -> Dict[str, Any]:
+    """列出某前綴下的所有 blob（狀態頁用）"""
+    with _lock:
+        rows = _db().execute("SELECT k, v FROM blob WHERE k >= ? AND k < ?", (prefix, prefix + "\uffff")).fetchall()
+    return {k: json.loads(v) for k, v in rows}
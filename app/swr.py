@@ -0,0 +1,144 @@
+# app/swr.py 〔v8R7-SWR〕
+# Stale-While-Revalidate 快取：
+# - 未過 soft TTL：直接回傳
+# - 過了 soft TTL、未過 hard TTL：立刻回傳舊值，背景更新（同 key 只會有一個更新在跑）
+# - 沒有可用值：才同步等待上游（並行呼叫者共用同一次抓取）；抓失敗但有過期舊值時回退舊值
+# 資料存放於 state_store 的 blob 表（鍵前綴 swr::）：多個 worker 共用同一份，誰更新了別人都讀得到，
+# 也不會互相以整份舊檔覆蓋；不寫進主狀態。async 版的讀寫移到 thread，不卡 event loop。
+from __future__ import annotations
+import time, asyncio, threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.singleflight import SingleFlight, AsyncSingleFlight
+from app import deadline, state_store
+
+BLOB_PREFIX = "swr::"
+
+FRESH, STALE, FALLBACK = "fresh", "stale", "fallback"
+
+class SWRCache:
+    def __init__(self, prefix: str = BLOB_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._mem: Dict[str, Dict[str, Any]] = {}   # 共用存放讀寫失敗時的本程序退路
+        self._refreshing: set = set()
+        self._flight = SingleFlight()
+        self._aflight = AsyncSingleFlight()
+        self._bg_tasks: set = set()   # 保留背景 task 參照，避免被 GC
+
+    # ---- 持久化（共用 SQLite blob；逐鍵寫入，不整份重寫） ---- #
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            rec = state_store.get_blob(self.prefix + key)
+        except Exception as e:
+            print("[SWR] load failed:", e)
+            rec = None
+        if not isinstance(rec, dict):
+            with self._lock:
+                rec = self._mem.get(key)
+        return dict(rec) if isinstance(rec, dict) else None
+
+    def _store(self, key: str, value: Any) -> None:
+        rec = {"value": value, "ts": int(time.time())}
+        with self._lock:
+            self._mem[key] = rec
+        try:
+            state_store.put_blob(self.prefix + key, rec)
+        except Exception as e:
+            print("[SWR] persist failed:", e)
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        value = loader()
+        self._store(key, value)
+        return value
+
+    def _revalidate(self, key: str, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._flight.do(key, lambda: self._load(key, loader))
+            except Exception as e:
+                print(f"[SWR] revalidate {key} failed:", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"swr-{key}", daemon=True).start()
+
+    def get(self, key: str, loader: Callable[[], Any], soft_ttl: int, hard_ttl: Optional[int] = None) -> Tuple[Any, int, str]:
+        """回傳 (值, 資料年齡秒, 狀態 fresh/stale/fallback)；完全無值且上游失敗時拋出上游例外"""
+        now = int(time.time())
+        rec = self.peek(key)
+        age = (now - int(rec.get("ts", 0))) if rec else 0
+        if rec and age <= soft_ttl:
+            return rec["value"], age, FRESH
+        if rec and (hard_ttl is None or age <= hard_ttl):
+            self._revalidate(key, loader)
+            return rec["value"], age, STALE
+        try:
+            return self._flight.do(key, lambda: self._load(key, loader)), 0, FRESH
+        except Exception:
+            if rec:
+                return rec["value"], age, FALLBACK
+            raise
+
+    # ---- async 版（webhook 用；背景更新改成 event loop 內的 task） ---- #
+    async def _aload(self, key: str, aloader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await aloader()
+        await asyncio.to_thread(self._store, key, value)
+        return value
+
+    def _arevalidate(self, key: str, aloader: Callable[[], Awaitable[Any]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def run():
+            try:
+                with deadline.detached():     # 背景更新不受觸發請求的預算限制
+                    await self._aflight.do(key, lambda: self._aload(key, aloader))
+            except Exception as e:
+                print(f"[SWR] revalidate {key} failed:", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        task = asyncio.ensure_future(run())
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+
+    async def aget(self, key: str, aloader: Callable[[], Awaitable[Any]], soft_ttl: int,
+                   hard_ttl: Optional[int] = None) -> Tuple[Any, int, str]:
+        now = int(time.time())
+        rec = await asyncio.to_thread(self.peek, key)
+        age = (now - int(rec.get("ts", 0))) if rec else 0
+        if rec and age <= soft_ttl:
+            return rec["value"], age, FRESH
+        if rec and (hard_ttl is None or age <= hard_ttl):
+            self._arevalidate(key, aloader)
+            return rec["value"], age, STALE
+        try:
+            return await self._aflight.do(key, lambda: self._aload(key, aloader)), 0, FRESH
+        except Exception:
+            if rec:
+                return rec["value"], age, FALLBACK
+            raise
+
+    def status(self) -> Dict[str, Any]:
+        now = int(time.time())
+        try:
+            data = {k[len(self.prefix):]: v for k, v in state_store.get_blobs(self.prefix).items()}
+        except Exception:
+            with self._lock:
+                data = dict(self._mem)
+        with self._lock:
+            refreshing = sorted(self._refreshing)
+        return {
+            "keys": {k: now - int(v.get("ts", 0)) for k, v in data.items()},
+            "refreshing": refreshing,
+            "store": f"{state_store.DB_PATH} (blob {self.prefix}*)",
+        }
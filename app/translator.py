@@ -0,0 +1,206 @@
+# app/translator.py 〔v8R7-TRANS〕
+# 標題翻譯：Google translate（gtx，免金鑰）＋ 持久化翻譯記憶（SQLite，LRU/年齡淘汰）
+# 只有沒翻過的標題才會真的打翻譯 API；重啟後記憶仍在。
+# 批次：多則標題以換行打包成一次請求再拆回；已是繁中的標題直接略過。
+from __future__ import annotations
+import os, re, time, sqlite3, hashlib, threading, unicodedata, asyncio
+from typing import Dict, List, Optional, Tuple
+from app import upstream, deadline
+
+MEMO_PATH = os.environ.get("SENTINEL_TRANSLATE_MEMO", "/tmp/sentinel-v8-translate.sqlite")
+MEMO_MAX_ROWS = int(os.environ.get("SENTINEL_TRANSLATE_MAX", "20000"))  # 超過即淘汰最久未用者
+MEMO_MAX_AGE_SEC = 14 * 24 * 3600   # 兩週沒再出現的標題直接淘汰
+TOUCH_EVERY_SEC = 3600              # 命中時最多每小時更新一次使用時間，避免每次讀都寫
+EVICT_EVERY_PUTS = 200
+TARGET_LANG = "zh-TW"
+GTX_URL = f"https://translate.googleapis.com/translate_a/single?client=gtx&sl=auto&tl={TARGET_LANG}&dt=t"
+BATCH_MAX_CHARS = 4000   # 單次請求原文字數上限（POST，不受 URL 長度限制）
+BATCH_MAX_ITEMS = 50     # 單次請求標題數上限
+TRANSLATE_MIN_SEC = 1.0  # 請求預算剩不到這麼多就不翻（保留原文）
+
+_CJK_RE  = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_KANA_RE = re.compile(r"[\u3040-\u30ff]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+# 常見「僅簡體」字；出現即視為非繁中，仍送翻譯轉成繁體
+_SIMP_ONLY = set("这们国说对时会发经币价涨进为与关开来过还么实现业产东车问门见长专应给电学书从动区让认议记许论该证识语请读转边达运连选钱铁银顾领额风飞马龙华击资务场报际导将总级数热结线网亿万监")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_puts = 0
+
+# ---------- 翻譯記憶 ---------- #
+def _memo() -> Optional[sqlite3.Connection]:
+    global _conn
+    if _conn is None:
+        try:
+            c = sqlite3.connect(MEMO_PATH, timeout=5, check_same_thread=False)
+            c.execute("CREATE TABLE IF NOT EXISTS memo (k TEXT PRIMARY KEY, zh TEXT NOT NULL, created INTEGER, used INTEGER)")
+            c.execute("CREATE INDEX IF NOT EXISTS memo_used ON memo(used)")
+            c.commit()
+            _conn = c
+        except Exception as e:
+            print("[TRANS] memo open failed:", e)
+            return None
+    return _conn
+
+def memo_key(text: str) -> str:
+    # 正規化：全半形統一、空白收斂、大小寫不敏感
+    t = unicodedata.normalize("NFKC", text or "")
+    t = re.sub(r"\s+", " ", t).strip().lower()
+    return hashlib.sha1(f"{TARGET_LANG}|{t}".encode("utf-8")).hexdigest()
+
+def memo_get(text: str) -> Optional[str]:
+    k, now = memo_key(text), int(time.time())
+    with _lock:
+        c = _memo()
+        if c is None: return None
+        try:
+            row = c.execute("SELECT zh, used FROM memo WHERE k=?", (k,)).fetchone()
+            if not row: return None
+            zh, used = row
+            if now - int(used or 0) >= TOUCH_EVERY_SEC:
+                c.execute("UPDATE memo SET used=? WHERE k=?", (now, k)); c.commit()
+            return zh
+        except Exception:
+            return None
+
+def memo_put(text: str, zh: str) -> None:
+    global _puts
+    k, now = memo_key(text), int(time.time())
+    with _lock:
+        c = _memo()
+        if c is None: return
+        try:
+            c.execute("INSERT OR REPLACE INTO memo (k, zh, created, used) VALUES (?,?,?,?)", (k, zh, now, now))
+            _puts += 1
+            if _puts % EVICT_EVERY_PUTS == 0:
+                _evict(c, now)
+            c.commit()
+        except Exception as e:
+            print("[TRANS] memo put failed:", e)
+
+def _evict(c: sqlite3.Connection, now: int) -> None:
+    c.execute("DELETE FROM memo WHERE used < ?", (now - MEMO_MAX_AGE_SEC,))
+    c.execute(
+        "DELETE FROM memo WHERE k IN (SELECT k FROM memo ORDER BY used DESC LIMIT -1 OFFSET ?)",
+        (max(0, MEMO_MAX_ROWS),),
+    )
+
+def memo_stats() -> dict:
+    with _lock:
+        c = _memo()
+        if c is None: return {"ok": False}
+        n = c.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
+    return {"ok": True, "rows": int(n), "max_rows": MEMO_MAX_ROWS, "path": MEMO_PATH}
+
+# ---------- 翻譯 ---------- #
+def is_traditional_zh(text: str) -> bool:
+    """粗判：以中文為主（中文字 ≥ 拉丁字母）、無日文假名、無常見僅簡體字"""
+    cjk = _CJK_RE.findall(text or "")
+    if not cjk or _KANA_RE.search(text):
+        return False
+    if len(cjk) < len(_LATIN_RE.findall(text)):
+        return False
+    return not any(ch in _SIMP_ONLY for ch in cjk)
+
+def _gtx_translate(text: str, timeout: int = 5) -> str:
+    # POST 表單送出，批次打包的長文字也不會超過 URL 長度
+    data = upstream.post(GTX_URL, data={"q": text}, timeout=timeout).json()
+    return "".join([seg[0] for seg in data[0] if seg and seg[0]])
+
+def _chunks(keys: List[str], texts: Dict[str, str]) -> List[List[str]]:
+    # 依字數/則數上限把待翻項目切成最少的請求
+    out, cur, size = [], [], 0
+    for k in keys:
+        n = len(texts[k]) + 1
+        if cur and (size + n > BATCH_MAX_CHARS or len(cur) >= BATCH_MAX_ITEMS):
+            out.append(cur); cur, size = [], 0
+        cur.append(k); size += n
+    if cur: out.append(cur)
+    return out
+
+def _translate_chunk(chunk: List[str]) -> List[Optional[str]]:
+    """一次請求翻多則（換行分隔）；拆回行數不符就退回逐則翻譯。失敗的項目回 None。"""
+    if not deadline.allows(TRANSLATE_MIN_SEC):
+        return [None] * len(chunk)        # 預算不足：翻譯屬選配，直接用原文
+    if len(chunk) > 1:
+        try:
+            lines = _split_lines(_gtx_translate("\n".join(chunk), timeout=8), len(chunk))
+            if lines: return lines
+        except Exception:
+            pass
+    out: List[Optional[str]] = []
+    for t in chunk:
+        try: out.append(_gtx_translate(t) or None)
+        except Exception: out.append(None)
+    return out
+
+def _split_lines(joined: str, n: int) -> Optional[List[str]]:
+    lines = joined.strip("\n").split("\n")
+    if len(lines) == n and all(x.strip() for x in lines):
+        return [x.strip() for x in lines]
+    return None
+
+def _plan(texts: List[str]) -> Tuple[List[Optional[str]], Dict[str, str], Dict[str, List[int]]]:
+    """繁中直接略過 → 查翻譯記憶 → 其餘去重；回傳 (已知結果, 待翻 {key: 原文}, {key: 輸入位置})"""
+    out: List[Optional[str]] = [None] * len(texts)
+    pending: Dict[str, str] = {}
+    slots: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if not text or is_traditional_zh(text):
+            out[i] = text; continue
+        hit = memo_get(text)
+        if hit is not None:
+            out[i] = hit; continue
+        k = memo_key(text)
+        pending.setdefault(k, re.sub(r"\s+", " ", text).strip())
+        slots.setdefault(k, []).append(i)
+    return out, pending, slots
+
+def _apply(texts: List[str], out: List[Optional[str]], pending: Dict[str, str], slots: Dict[str, List[int]],
+           keys: List[str], res: List[Optional[str]]) -> None:
+    for k, zh in zip(keys, res):
+        if zh:
+            memo_put(pending[k], zh)
+        for i in slots[k]:
+            out[i] = zh or texts[i]
+
+def translate_many(texts: List[str]) -> List[str]:
+    """批次翻譯：繁中直接略過 → 查翻譯記憶 → 其餘去重後打包成最少請求；順序與輸入一致。
+    失敗者回傳原文且不寫入記憶（下次再試）。"""
+    out, pending, slots = _plan(texts)
+    for chunk_keys in _chunks(list(pending), pending):
+        res = _translate_chunk([pending[k] for k in chunk_keys])
+        _apply(texts, out, pending, slots, chunk_keys, res)
+    return [texts[i] if v is None else v for i, v in enumerate(out)]
+
+def translate_to_zh(text: str) -> str:
+    return translate_many([text])[0]
+
+# ---------- async 版（webhook 用；共用 upstream 的 httpx 連線池） ---------- #
+async def _agtx_translate(text: str, timeout: float = 5) -> str:
+    r = await upstream.apost(GTX_URL, data={"q": text}, timeout=timeout)
+    data = r.json()
+    return "".join([seg[0] for seg in data[0] if seg and seg[0]])
+
+async def _atranslate_chunk(chunk: List[str]) -> List[Optional[str]]:
+    if not deadline.allows(TRANSLATE_MIN_SEC):
+        return [None] * len(chunk)
+    if len(chunk) > 1:
+        try:
+            lines = _split_lines(await _agtx_translate("\n".join(chunk), timeout=8), len(chunk))
+            if lines: return lines
+        except Exception:
+            pass
+    async def one(t: str) -> Optional[str]:
+        try: return (await _agtx_translate(t)) or None
+        except Exception: return None
+    return list(await asyncio.gather(*(one(t) for t in chunk)))
+
+async def atranslate_many(texts: List[str]) -> List[str]:
+    out, pending, slots = _plan(texts)
+    chunks = _chunks(list(pending), pending)
+    results = await asyncio.gather(*(_atranslate_chunk([pending[k] for k in c]) for c in chunks))
+    for chunk_keys, res in zip(chunks, results):
+        _apply(texts, out, pending, slots, chunk_keys, res)
+    return [texts[i] if v is None else v for i, v in enumerate(out)]
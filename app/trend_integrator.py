@@ -1,9 +1,20 @@
 from __future__ import annotations
-import requests, time
-from typing import List, Dict, Tuple
-from app import news_scoring
+import os, math, time, threading, asyncio
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+import numpy as np
+from app import news_scoring, rank_engine
+from app import upstream, deadline
+from app.singleflight import SingleFlight, AsyncSingleFlight
 
 COINGECKO = "https://api.coingecko.com/api/v3/coins/markets"
+# 排名宇宙：市值前 N 名（0 = 只看下方 SYMBOL_MAP 固定清單）
+UNIVERSE_N = int(os.environ.get("SENTINEL_UNIVERSE_N", "250"))
+PAGE_SIZE = 250            # CoinGecko 單頁上限
+PAGE_WORKERS = 4           # 分頁並行抓取上限（免費額度有限，別開太大）
+SNAPSHOT_TTL_SEC = int(os.environ.get("SENTINEL_SNAPSHOT_TTL", "60"))  # 共用快照有效秒數
+NEWS_NEUTRAL = 50          # 沒有新聞分數的幣視為中性（與「查無新聞」的正規化結果相同）
 # 常見幣對應（可自行擴充）
 SYMBOL_MAP = {
     "BTC": "bitcoin",
@@ -33,24 +44,147 @@ def fetch_markets(vs_currency: str = "usd", limit: int = 20) -> List[Dict]:
         "price_change_percentage": "24h",
         "locale": "en",
     }
-    r = requests.get(COINGECKO, params=params, timeout=10)
-    r.raise_for_status()
+    return upstream.get(COINGECKO, params=params, timeout=10).json()
+
+# ---------- 欄位式市場快照 ---------- #
+@dataclass
+class MarketSnapshot:
+    """精簡欄位式快照：每個欄位一支 NumPy 陣列（依市值排序），不建立逐幣 dict"""
+    ts: int
+    ids: np.ndarray
+    symbols: np.ndarray
+    price: np.ndarray
+    pct24: np.ndarray
+    volume: np.ndarray
+    mcap: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+def snapshot_from_markets(data: List[Dict], ts: Optional[int] = None) -> MarketSnapshot:
+    def col(key: str) -> np.ndarray:
+        return np.fromiter((float(x.get(key) or 0) for x in data), dtype=float, count=len(data))
+    ids = [str(x.get("id", "")) for x in data]
+    syms = [_symbol_of(x) for x in data]
+    return MarketSnapshot(
+        ts=int(ts or time.time()),
+        ids=np.array(ids, dtype=object),
+        symbols=np.array(syms, dtype=object),
+        price=col("current_price"),
+        pct24=col("price_change_percentage_24h"),
+        volume=col("total_volume"),
+        mcap=col("market_cap"),
+    )
+
+def _page_params(page: int, per_page: int, vs_currency: str) -> Dict[str, Any]:
+    return {
+        "vs_currency": vs_currency,
+        "order": "market_cap_desc",
+        "per_page": per_page,
+        "page": page,
+        "price_change_percentage": "24h",
+        "locale": "en",
+    }
+
+def _fetch_page(page: int, per_page: int, vs_currency: str) -> List[Dict]:
+    return upstream.get(COINGECKO, params=_page_params(page, per_page, vs_currency), timeout=10).json()
+
+async def _afetch_page(page: int, per_page: int, vs_currency: str) -> List[Dict]:
+    r = await upstream.aget(COINGECKO, params=_page_params(page, per_page, vs_currency), timeout=10)
     return r.json()
 
-def infer_symbol(coin_id: str) -> str:
-    for sym, cid in SYMBOL_MAP.items():
-        if cid == coin_id:
-            return sym
-    return coin_id.upper()
-
-def phase_from_pct(pct24: float) -> str:
-    if pct24 >= 5:
-        return "🔥"
-    if 1 <= pct24 < 5:
-        return "⚡"
-    if -3 <= pct24 < 1:
-        return "💤"
-    return "🌙"
+def fetch_universe(n: int = UNIVERSE_N, vs_currency: str = "usd") -> MarketSnapshot:
+    """市值前 n 名：分頁並行抓取後依頁序合併（結果與逐頁抓取相同）；n<=0 時退回固定清單"""
+    if n <= 0:
+        return snapshot_from_markets(fetch_markets(vs_currency))
+    per_page = min(PAGE_SIZE, n)
+    pages = list(range(1, math.ceil(n / per_page) + 1))
+    with ThreadPoolExecutor(max_workers=max(1, min(PAGE_WORKERS, len(pages)))) as ex:
+        chunks = list(ex.map(deadline.bind(lambda p: _fetch_page(p, per_page, vs_currency)), pages))
+    data = [x for chunk in chunks for x in chunk][:n]
+    return snapshot_from_markets(data)
+
+async def afetch_universe(n: int = UNIVERSE_N, vs_currency: str = "usd") -> MarketSnapshot:
+    """async 版 fetch_universe：各頁以 asyncio.gather 並行，依頁序合併"""
+    if n <= 0:
+        return await asyncio.to_thread(fetch_universe, n, vs_currency)
+    per_page = min(PAGE_SIZE, n)
+    pages = list(range(1, math.ceil(n / per_page) + 1))
+    sem = asyncio.Semaphore(PAGE_WORKERS)
+    async def one(p: int) -> List[Dict]:
+        async with sem:
+            return await _afetch_page(p, per_page, vs_currency)
+    chunks = await asyncio.gather(*(one(p) for p in pages))
+    data = [x for chunk in chunks for x in chunk][:n]
+    return snapshot_from_markets(data)
+
+# ---------- 共用快照服務（TTL + single-flight） ---------- #
+_snap: Optional[MarketSnapshot] = None
+_snap_flight = SingleFlight()
+_snap_stats = {"hits": 0, "fetches": 0, "errors": 0}
+_snap_lock = threading.Lock()
+
+def _load_snapshot() -> MarketSnapshot:
+    global _snap
+    try:
+        snap = fetch_universe()
+    except Exception:
+        with _snap_lock: _snap_stats["errors"] += 1
+        raise
+    with _snap_lock:
+        _snap = snap
+        _snap_stats["fetches"] += 1
+    return snap
+
+def get_snapshot(max_age: int = SNAPSHOT_TTL_SEC) -> MarketSnapshot:
+    """回傳 max_age 秒內的共用快照；過期時同時進來的呼叫者共用同一次上游抓取"""
+    snap = _snap
+    if snap is not None and (time.time() - snap.ts) < max_age:
+        with _snap_lock: _snap_stats["hits"] += 1
+        return snap
+    return _snap_flight.do("markets", _load_snapshot)
+
+_snap_aflight = AsyncSingleFlight()
+
+async def _aload_snapshot() -> MarketSnapshot:
+    global _snap
+    try:
+        snap = await afetch_universe()
+    except Exception:
+        with _snap_lock: _snap_stats["errors"] += 1
+        raise
+    with _snap_lock:
+        _snap = snap
+        _snap_stats["fetches"] += 1
+    return snap
+
+async def aget_snapshot(max_age: int = SNAPSHOT_TTL_SEC) -> MarketSnapshot:
+    """async 版 get_snapshot：共用同一份快照；過期時同一 event loop 內的呼叫者共用同一次抓取"""
+    snap = _snap
+    if snap is not None and (time.time() - snap.ts) < max_age:
+        with _snap_lock: _snap_stats["hits"] += 1
+        return snap
+    return await _snap_aflight.do("markets", _aload_snapshot)
+
+def snapshot_status() -> Dict[str, Any]:
+    snap = _snap
+    return {
+        "ttl": SNAPSHOT_TTL_SEC,
+        "size": len(snap) if snap is not None else 0,
+        "age": int(time.time() - snap.ts) if snap is not None else None,
+        **_snap_stats,
+        "shared": _snap_flight.stats["shared"] + _snap_aflight.stats["shared"],
+        "in_flight": _snap_flight.in_flight() + _snap_aflight.in_flight(),
+    }
+
+def _symbol_of(x: Dict) -> str:
+    # 固定清單內的幣用 SYMBOL_MAP 名稱；其餘用 CoinGecko 的 symbol 欄位
+    cid = str(x.get("id", ""))
+    if cid in _ID_TO_SYM:
+        return _ID_TO_SYM[cid]
+    return str(x.get("symbol") or cid).upper()
+
+_ID_TO_SYM = {cid: sym for sym, cid in SYMBOL_MAP.items()}
 
 def volume_arrow(rel: float) -> str:
     # rel ∈ [0,1]：用粗略分級顯示量能趨勢
@@ -60,69 +194,61 @@ def volume_arrow(rel: float) -> str:
         return "量→"
     return "量↓"
 
-def rank_normalize(values: List[float]) -> Dict[str, float]:
-    # 回傳每個 key 的 0~1 百分位；這個版本會在上游先組 (key,value) 列表
-    if not values:
-        return {}
-    v_sorted = sorted(values)
-    idx = {v: i for i, v in enumerate(v_sorted)}
-    n = len(values) - 1 if len(values) > 1 else 1
-    return {v: idx[v] / n for v in values}
-
-def build_table(scheme: str = "tw") -> Tuple[List[Dict], Dict[str, int]]:
-    data = fetch_markets()
-    # 量能正規化用
-    vols = [float(x.get("total_volume") or 0) for x in data]
-    # 我們需要每一列的 volume 百分位
-    sorted_vols = sorted(vols)
-    def vol_rank(v):
-        if len(sorted_vols) <= 1:
-            return 0.5
-        # 簡單百分位
-        pos = 0
-        for i, sv in enumerate(sorted_vols):
-            if v >= sv:
-                pos = i
-        return pos / (len(sorted_vols)-1)
-
-    # 批次新聞分數（目前 0）
-    syms = [infer_symbol(x["id"]) for x in data]
-    news = news_scoring.batch_news_score(syms)
-
-    rows = []
-    for x in data:
-        sym = infer_symbol(x["id"])
-        price = float(x.get("current_price") or 0)
-        pct24 = float(x.get("price_change_percentage_24h") or 0)
-        vol = float(x.get("total_volume") or 0)
-        vr = vol_rank(vol)  # 0~1
-        strong = max(0.0, pct24) * vr * 100.0
-        news_s = int(news.get(sym, 0))
-        total = 0.6 * strong + 0.4 * news_s
-        phase = phase_from_pct(pct24)
-        rows.append({
-            "symbol": sym,
-            "price": price,
-            "pct24": pct24,
-            "volume_rel": vr,
-            "phase": phase,
-            "score_strong": round(strong, 1),
-            "score_news": news_s,
-            "score_total": round(total, 1),
-        })
-
-    # 依「總分」由高到低
-    rows.sort(key=lambda r: r["score_total"], reverse=True)
-    return rows, news
-
-def choose_top(rows: List[Dict], topn: int = 3) -> Tuple[List[Dict], List[Dict]]:
-    # 多：總分高且 pct24 >= 0
-    longs = [r for r in rows if r["pct24"] >= 0]
-    shorts = [r for r in rows if r["pct24"] < 0]
-    longs = longs[:topn]
-    # 空：從尾端挑選跌得多的（用 score_total 但需 pct24<0）
-    shorts = sorted(shorts, key=lambda r: r["score_total"])[:topn]  # 分數越低越靠前
-    return longs, shorts
+@dataclass
+class RankedTable:
+    """build_table 的結果：欄位式分數 + 依總分排序的索引；只在需要時才組出單列 dict"""
+    snap: MarketSnapshot
+    cols: Dict[str, np.ndarray]
+    news: np.ndarray
+    news_age: List[Optional[int]]
+    order: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=int))
+
+    def __len__(self) -> int:
+        return len(self.snap)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        s, c = self.snap, self.cols
+        return {
+            "symbol": str(s.symbols[i]),
+            "price": float(s.price[i]),
+            "pct24": float(s.pct24[i]),
+            "volume_rel": float(c["volume_rel"][i]),
+            "phase": str(c["phase"][i]),
+            "score_strong": float(c["score_strong"][i]),
+            "score_news": int(self.news[i]),
+            "news_age": self.news_age[i],
+            "score_total": float(c["score_total"][i]),
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # 相容舊用法：依「總分」由高到低逐列產出
+        return (self.row(int(i)) for i in self.order)
+
+def build_table(scheme: str = "tw", snap: Optional[MarketSnapshot] = None) -> Tuple[RankedTable, Dict[str, int]]:
+    snap = snap if snap is not None else get_snapshot()
+    syms = [str(x) for x in snap.symbols]
+
+    # 新聞分數：只讀背景預算結果（news_refresher），不在此同步抓 RSS；每個值附帶資料年齡
+    peeks = news_scoring.peek_many(syms, k=0)
+    news = {s: (p["score"] if p else NEWS_NEUTRAL) for s, p in peeks.items()}
+    news_col = np.array([news.get(s, NEWS_NEUTRAL) for s in syms], dtype=float)
+    news_age = [peeks[s]["age"] if peeks.get(s) else None for s in syms]
+
+    # 向量化一次算完：量能百分位（ties 取平均名次）、強度/總分、相位
+    cols = rank_engine.score(snap.pct24, snap.volume, news_col)
+    table = RankedTable(snap=snap, cols=cols, news=news_col, news_age=news_age,
+                        order=rank_engine.rank_desc(cols["score_total"]))
+    return table, news
+
+def choose_top(rows, topn: int = 3) -> Tuple[List[Dict], List[Dict]]:
+    # 多：總分高且 pct24 >= 0；空：pct24 < 0 中總分越低越靠前（部分選取，不全排序）
+    if isinstance(rows, RankedTable):
+        li, si = rank_engine.pick_long_short(rows.snap.pct24, rows.cols["score_total"], topn)
+        return [rows.row(int(i)) for i in li], [rows.row(int(i)) for i in si]
+    pct = np.array([r["pct24"] for r in rows], dtype=float)
+    total = np.array([r["score_total"] for r in rows], dtype=float)
+    li, si = rank_engine.pick_long_short(pct, total, topn)
+    return [rows[i] for i in li], [rows[i] for i in si]
 
 def paint_action(scheme: str, action: str) -> str:
     # action: "多" or "空"
@@ -156,28 +282,56 @@ def format_rows(rows: List[Dict], scheme: str, action: str) -> List[str]:
         out.append(f"{tag} {sym} {phase} {arrow(pct)} {pct:+.2f}% ／ {vol_tag} ／ S:{s_str} N:{s_news} T:{s_total}")
     return out
 
-def generate_report(scheme: str = "tw", topn: int = 3) -> str:
-    rows, _ = build_table(scheme)
-    longs, shorts = choose_top(rows, topn=topn)
-    longs_fmt = format_rows(longs, scheme, "多")
-    shorts_fmt = format_rows(shorts, scheme, "空")
-    msg = []
-    msg.append("🚀 今日強勢（做多候選）")
-    msg.extend([f"{i+1}. {line}" for i, line in enumerate(longs_fmt)])
-    msg.append("")
-    msg.append("🧊 今日弱勢（做空候選）")
-    msg.extend([f"{i+1}. {line}" for i, line in enumerate(shorts_fmt)])
-    return "\n".join(msg)
-
-def generate_side(single: str, scheme: str = "tw", want_strong: bool = True, topn: int = 3) -> str:
-    rows, _ = build_table(scheme)
-    longs, shorts = choose_top(rows, topn=topn)
-    if want_strong:
-        lines = format_rows(longs, scheme, "多")
-        title = "🚀 今日強勢（做多候選）"
-    else:
-        lines = format_rows(shorts, scheme, "空")
-        title = "🧊 今日弱勢（做空候選）"
-    msg = [title]
+# ---------- 結構化結果：rows（代號/價格/分數/新聞標題參照）；文字由 render_* 另外產生 ---------- #
+HEADLINES_K = 2
+STRONG_TITLE = "🚀 今日強勢（做多候選）"
+WEAK_TITLE = "🧊 今日弱勢（做空候選）"
+
+def _attach_headlines(rows: List[Dict], k: int = HEADLINES_K) -> List[Dict]:
+    # 只讀背景預算的新聞（不打上游）；每列附上前 k 則中文標題
+    peeks = news_scoring.peek_many([r["symbol"] for r in rows], k=k) if rows and k > 0 else {}
+    for r in rows:
+        p = peeks.get(r["symbol"].upper())
+        r["headlines"] = [{"title_zh": h["title_zh"], "timeago": h["timeago"]} for h in (p["headlines"] if p else [])]
+    return rows
+
+def trend_result(topn: int = 3, snap: Optional[MarketSnapshot] = None) -> Dict[str, Any]:
+    """多空候選的結構化結果（可 JSON 序列化，SWR 直接快取）：{ts, longs: [row], shorts: [row]}"""
+    snap = snap if snap is not None else get_snapshot()
+    table, _ = build_table(snap=snap)
+    longs, shorts = choose_top(table, topn=topn)
+    return {"ts": int(snap.ts), "longs": _attach_headlines(longs), "shorts": _attach_headlines(shorts)}
+
+async def atrend_result(topn: int = 3) -> Dict[str, Any]:
+    return trend_result(topn=topn, snap=await aget_snapshot())
+
+def fmt_price(p: float) -> str:
+    if p >= 100:
+        return f"${p:,.0f}"
+    if p >= 1:
+        return f"${p:,.2f}"
+    return f"${p:.4g}"
+
+def render_side(res: Dict[str, Any], scheme: str = "tw", want_strong: bool = True,
+                show_price: bool = False, with_news: bool = False) -> str:
+    rows = res["longs"] if want_strong else res["shorts"]
+    lines = format_rows(rows, scheme, "多" if want_strong else "空")
+    if show_price:
+        lines = [f"{line}（{fmt_price(r['price'])}）" if r.get("price") else line for line, r in zip(lines, rows)]
+    msg = [STRONG_TITLE if want_strong else WEAK_TITLE]
     msg.extend([f"{i+1}. {line}" for i, line in enumerate(lines)])
-    return "\n".join(msg)
+    text = "\n".join(msg)
+    if with_news and any(r.get("headlines") for r in rows):
+        text += "\n\n🗞️ 中文新聞精選"
+        for r in rows:
+            if r.get("headlines"):
+                text += f"\n• {r['symbol']}"
+                for h in r["headlines"]:
+                    text += f"\n  - {h['title_zh']} 〔{h['timeago']}〕"
+    return text
+
+def render_report(res: Dict[str, Any], scheme: str = "tw") -> str:
+    return render_side(res, scheme, want_strong=True) + "\n\n" + render_side(res, scheme, want_strong=False)
+
+def generate_report(scheme: str = "tw", topn: int = 3, snap: Optional[MarketSnapshot] = None) -> str:
+    return render_report(trend_result(topn=topn, snap=snap), scheme)
@@ -1,10 +1,11 @@
 # app/tw_news.py 〔v8R7-TWNEWS〕
 # 台股新聞（中文）：抓取 Google News RSS（近 24 小時），無金鑰
 from __future__ import annotations
-import requests, time, html
+import time, html
 import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
+from app import upstream
 
 RSS_URL = "https://news.google.com/rss/search"
 
@@ -18,9 +19,7 @@ def _fetch_rss(q: str, when: str = "24h", hl: str = "zh-TW", gl: str = "TW") ->
         "gl": gl,
         "ceid": "TW:zh-Hant",
     }
-    r = requests.get(RSS_URL, params=params, timeout=10)
-    r.raise_for_status()
-    return r.text
+    return upstream.get(RSS_URL, params=params, timeout=10).text
 
 def _timeago(dt: datetime) -> str:
     now = datetime.now(timezone.utc)
@@ -2,7 +2,8 @@
 # 台股雷達：Yahoo Quote API（免金鑰）→ 三行分組 & 詳細清單；支援 show_price
 
 from __future__ import annotations
-import requests, math
+import math, asyncio
+from app import quotes, tw_universe
 
 # 追蹤清單（台股前十大權值股 + 加權指數）
 TW_SYMBOLS = [
@@ -19,20 +20,15 @@ DISPLAY = {
     "2303.TW": "聯電",
 }
 
+def _named(rows: list[dict]) -> list[dict]:
+    return [{**r, "name": DISPLAY.get(r["symbol"], r["name"])} for r in rows]
+
 def _yahoo_quote(symbols: list[str]) -> list[dict]:
-    url = "https://query1.finance.yahoo.com/v7/finance/quote"
-    q = ",".join(symbols)
-    r = requests.get(url, params={"symbols": q}, timeout=10)
-    r.raise_for_status()
-    data = r.json().get("quoteResponse", {}).get("result", [])
-    out = []
-    for d in data:
-        sym = d.get("symbol", "")
-        name = DISPLAY.get(sym, d.get("shortName") or sym)
-        price = d.get("regularMarketPrice")
-        pct = d.get("regularMarketChangePercent")
-        out.append({"symbol": sym, "name": name, "price": price, "pct": pct})
-    return out
+    # 走統一報價服務（跨市場合併請求 + 依交易時段的 TTL 快取）
+    return _named(quotes.get_quotes(symbols))
+
+async def _ayahoo_quote(symbols: list[str]) -> list[dict]:
+    return _named(await asyncio.to_thread(quotes.get_quotes, symbols))
 
 def _fmt_pct(pct):
     if pct is None or (isinstance(pct, float) and math.isnan(pct)):
@@ -55,15 +51,18 @@ def _group_three_lines(rows: list[dict], show_price: bool) -> str:
     def join(lst): return "｜".join(cell(r) for r in lst if r.get("pct") is not None)
     return "\n".join([s for s in [join(line1), join(line2), join(line3)] if s])
 
-def format_tw_block(phase: str = "intraday", show_price: bool = True) -> str:
-    rows = _yahoo_quote(TW_SYMBOLS)
+def format_tw_block(phase: str = "intraday", show_price: bool = True, rows: list[dict] | None = None) -> str:
+    rows = rows if rows is not None else _yahoo_quote(TW_SYMBOLS)
     idx = next((r for r in rows if r["symbol"] == "%5ETWII"), None)
     idx_line = f'台股雷達｜{(idx and idx["name"]) or "加權"} {_fmt_pct(idx and idx.get("pct"))}'
     tri = _group_three_lines(rows, show_price=show_price)
-    return f"{idx_line}\n{tri}" if tri else idx_line
+    out = f"{idx_line}\n{tri}" if tri else idx_line
+    # 全市場廣度：只讀最近一次掃描（排程盤中定時掃），不在報表裡觸發掃描
+    scan = tw_universe.latest()
+    return f"{out}\n{tw_universe.breadth_line(scan)}" if scan else out
 
-def format_tw_full(show_price: bool = True) -> str:
-    rows = _yahoo_quote(TW_SYMBOLS)
+def format_tw_full(show_price: bool = True, rows: list[dict] | None = None) -> str:
+    rows = rows if rows is not None else _yahoo_quote(TW_SYMBOLS)
     lines = ["📈 台股觀察清單"]
     for r in rows:
         if r["symbol"] == "%5ETWII":
@@ -76,4 +75,7 @@ def format_tw_full(show_price: bool = True) -> str:
                 lines.append(f"{r['name']} {pct}")
     return "\n".join(lines)
 
+async def aformat_tw_full(show_price: bool = True) -> str:
+    return format_tw_full(show_price=show_price, rows=await _ayahoo_quote(TW_SYMBOLS))
+
 # （若未來要做「加入台股/移除台股/清單」可在此擴充，目前由 main 處理固定清單）
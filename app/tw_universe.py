@@ -0,0 +1,112 @@
+# app/tw_universe.py 〔v8R7-TWU〕
+# 台股全市場掃描：上市（TWSE）+ 上櫃（TPEx）約 1,800 檔。
+# - 代號清單存本機檔（SENTINEL_TW_UNIVERSE），每週自官方 OpenAPI 更新一次；更新失敗沿用舊檔
+# - 報價走統一報價服務（大 chunk 並行抓，與報表共用快取）
+# - 漲跌家數、各產業平均、強弱前幾名一次用 NumPy 向量化算完；最新結果寫入共用 SQLite，各 worker 都讀得到（骨架見 market_scan）
+from __future__ import annotations
+import os
+from typing import Any, Dict, List
+import numpy as np
+from app import upstream, rank_engine
+from app.market_scan import CachedList, MarketScan, column, sector_stats, sector_rows
+
+UNIVERSE_PATH = os.environ.get("SENTINEL_TW_UNIVERSE", "/tmp/sentinel-v8-tw-universe.json")
+UNIVERSE_MAX_AGE_SEC = int(os.environ.get("SENTINEL_TW_UNIVERSE_MAX_AGE", str(7 * 86400)))
+TWSE_LISTED = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
+TPEX_OTC = "https://www.tpex.org.tw/openapi/v1/mopsfin_t187ap03_O"
+SCAN_CHUNK_SIZE = 200            # 約 9 個請求掃完全市場
+TOP_K = 5
+LATEST_MAX_AGE_OPEN = 900        # 盤中：掃描結果 15 分鐘內才算數
+LATEST_MAX_AGE_CLOSED = 18 * 3600
+LATEST_KEY = "tw_scan"
+
+# 證交所產業別代碼
+SECTORS = {
+    "01": "水泥", "02": "食品", "03": "塑膠", "04": "紡織", "05": "電機機械",
+    "06": "電器電纜", "08": "玻璃陶瓷", "09": "造紙", "10": "鋼鐵", "11": "橡膠",
+    "12": "汽車", "14": "建材營造", "15": "航運", "16": "觀光餐旅", "17": "金融保險",
+    "18": "貿易百貨", "19": "綜合", "20": "其他", "21": "化學", "22": "生技醫療",
+    "23": "油電燃氣", "24": "半導體", "25": "電腦週邊", "26": "光電", "27": "通信網路",
+    "28": "電子零組件", "29": "電子通路", "30": "資訊服務", "31": "其他電子", "32": "文化創意",
+    "33": "農業科技", "34": "電子商務", "35": "綠能環保", "36": "數位雲端", "37": "運動休閒",
+    "38": "居家生活",
+}
+
+def _pick(row: Dict[str, Any], *keys: str) -> str:
+    for k in keys:
+        v = row.get(k)
+        if v not in (None, ""):
+            return str(v).strip()
+    return ""
+
+def _parse(rows: List[Dict[str, Any]], suffix: str) -> List[Dict[str, str]]:
+    out = []
+    for r in rows or []:
+        code = _pick(r, "公司代號", "SecuritiesCompanyCode")
+        if not (code.isdigit() and len(code) == 4):      # 只收普通股
+            continue
+        sec = _pick(r, "產業別", "SecuritiesIndustryCode").zfill(2)
+        out.append({"symbol": f"{code}{suffix}",
+                    "name": _pick(r, "公司簡稱", "CompanyAbbreviation") or code,
+                    "sector": SECTORS.get(sec, "其他")})
+    return out
+
+def _download() -> List[Dict[str, str]]:
+    items = _parse(upstream.get(TWSE_LISTED, timeout=15).json(), ".TW")
+    try:
+        items += _parse(upstream.get(TPEX_OTC, timeout=15).json(), ".TWO")
+    except Exception as e:
+        print("[TWU] TPEx list failed:", e)
+    return items
+
+def _summarize(items: List[Dict[str, str]], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    pct = column(items, rows, "pct")
+    price = {r["symbol"]: r.get("price") for r in rows}
+    names, ok, p, s, n, avg = sector_stats(items, pct, "台股報價全數取得失敗")
+    ups = np.bincount(s, weights=(p > 0), minlength=len(names))
+    downs = np.bincount(s, weights=(p < 0), minlength=len(names))
+    def pick(idx): return [{"symbol": items[i]["symbol"], "name": items[i]["name"],
+                            "pct": float(pct[i]), "price": price.get(items[i]["symbol"])} for i in idx]
+    return {
+        "total": len(items), "quoted": int(p.size),
+        "up": int((p > 0).sum()), "down": int((p < 0).sum()), "flat": int((p == 0).sum()),
+        "sectors": sector_rows(names, n, avg, up=ups, down=downs),
+        "gainers": pick(rank_engine.top_n(pct, TOP_K, mask=ok, largest=True)),
+        "losers": pick(rank_engine.top_n(pct, TOP_K, mask=ok, largest=False)),
+    }
+
+_UNIVERSE = CachedList(UNIVERSE_PATH, UNIVERSE_MAX_AGE_SEC, _download, "TWU")
+_SCAN = MarketScan("TWU", "TW", _UNIVERSE, LATEST_KEY, _summarize, chunk_size=SCAN_CHUNK_SIZE,
+                   max_age_open=LATEST_MAX_AGE_OPEN, max_age_closed=LATEST_MAX_AGE_CLOSED,
+                   no_list_msg="台股代號清單取得失敗")
+universe = _UNIVERSE.items
+scan = _SCAN.scan
+latest = _SCAN.latest
+status = _SCAN.status
+
+def breadth_line(res: Dict[str, Any]) -> str:
+    top = res["sectors"][0] if res["sectors"] else None
+    line = f"廣度：漲 {res['up']}／跌 {res['down']}／平 {res['flat']}"
+    return f"{line}｜最強 {top['sector']} {top['avg']:+.1f}%" if top else line
+
+def _heat(avg: float, scheme: str) -> str:
+    up, up2, down, down2 = ("🟥", "🔴", "🟩", "🟢") if scheme == "tw" else ("🟩", "🟢", "🟥", "🔴")
+    if avg >= 1.5: return up
+    if avg >= 0.3: return up2
+    if avg <= -1.5: return down
+    if avg <= -0.3: return down2
+    return "⬜"
+
+def format_heatmap(res: Dict[str, Any], scheme: str = "tw", show_price: bool = True) -> str:
+    lines = [f"🗺️ 台股熱圖（{res['quoted']}/{res['total']} 檔）", breadth_line(res), ""]
+    for s in res["sectors"]:
+        lines.append(f"{_heat(s['avg'], scheme)} {s['sector']} {s['avg']:+.1f}%（{s['up']}↑/{s['down']}↓）")
+    def cell(r):
+        base = f"{r['name']} {r['pct']:+.1f}%"
+        return f"{base}（{r['price']:g}）" if show_price and r.get("price") is not None else base
+    if res["gainers"]:
+        lines += ["", "強勢：" + "｜".join(cell(r) for r in res["gainers"])]
+    if res["losers"]:
+        lines.append("弱勢：" + "｜".join(cell(r) for r in res["losers"]))
+    return "\n".join(lines)
+
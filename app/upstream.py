@@ -0,0 +1,346 @@
+# app/upstream.py 〔v8R7-UP〕
+# 上游 HTTP 客戶端：全程序共用一個 httpx.Client（排程/執行緒）與一個 httpx.AsyncClient（webhook），
+# 皆為 keep-alive 連線池，免每次重做 TCP+TLS 握手。
+# 每個上游主機各有一個 token bucket（同步與 async 共用同一桶），主動把請求攤平在免費額度內，
+# 不再靠「限流」退路事後補救；等待時間記錄在 stats() 供 /admin/upstream 觀察。
+# 每個主機另有斷路器（closed → open → half-open 試探）與短期失敗快取：上游掛掉時呼叫端立刻拋
+# CircuitOpen 落入既有退路，不再每段報表各自等滿 timeout；狀態見 /admin/breakers。
+# 若呼叫端開了 deadline scope，timeout 會縮到剩餘預算，排隊等 token 超過預算則直接放棄。
+from __future__ import annotations
+import os, time, atexit, asyncio, threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from app import deadline
+
+UA = {"User-Agent": "Mozilla/5.0"}
+DEFAULT_TIMEOUT = 10.0
+LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+# 每主機速率（每秒補充 token 數, 桶容量）；可用環境變數覆寫，如 SENTINEL_RATE_COINGECKO="0.5,5"
+RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "api.coingecko.com": (0.4, 5),            # 免費層約 30 次/分，留點餘裕
+    "query1.finance.yahoo.com": (2.0, 6),
+    "news.google.com": (5.0, 10),
+    "translate.googleapis.com": (5.0, 10),
+}
+for _e, _h in (("SENTINEL_RATE_COINGECKO", "api.coingecko.com"),
+               ("SENTINEL_RATE_YAHOO", "query1.finance.yahoo.com"),
+               ("SENTINEL_RATE_GNEWS", "news.google.com"),
+               ("SENTINEL_RATE_GTX", "translate.googleapis.com")):
+    try:
+        if os.environ.get(_e):
+            _r, _b = os.environ[_e].split(",")
+            RATE_LIMITS[_h] = (float(_r), float(_b))
+    except Exception:
+        pass
+
+MAX_WAIT_SEC = float(os.environ.get("SENTINEL_RATE_MAX_WAIT", "20"))   # 需排隊超過此秒數直接拒絕
+
+# 斷路器：連續失敗 BREAKER_FAILS 次即 open；BREAKER_OPEN_SEC 後 half-open 只放一個試探請求
+BREAKER_FAILS = int(os.environ.get("SENTINEL_BREAKER_FAILS", "3"))
+BREAKER_OPEN_SEC = float(os.environ.get("SENTINEL_BREAKER_OPEN_SEC", "30"))
+NEG_TTL_SEC = float(os.environ.get("SENTINEL_NEG_TTL", "15"))      # 同一 GET 失敗後短期直接回失敗
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+class RateLimited(RuntimeError):
+    pass
+
+class CircuitOpen(RuntimeError):
+    pass
+
+class Breaker:
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.fails = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self.short_circuited = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= BREAKER_OPEN_SEC:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+            self.short_circuited += 1
+        raise CircuitOpen(f"{self.host} circuit {self.state}")
+
+    def success(self) -> None:
+        with self._lock:
+            self.state, self.fails, self.probing = CLOSED, 0, False
+
+    def failure(self, err: str) -> None:
+        with self._lock:
+            self.fails += 1
+            self.last_error = err[:200]
+            if self.state == HALF_OPEN or self.fails >= BREAKER_FAILS:
+                if self.state != OPEN:
+                    self.trips += 1
+                self.state, self.opened_at = OPEN, time.time()
+            self.probing = False
+
+    def release(self) -> None:
+        # 試探請求以非上游錯誤結束（如 4xx）：不改狀態，只讓出試探名額
+        with self._lock:
+            self.probing = False
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            st = self.state
+            if st == OPEN and time.time() - self.opened_at >= BREAKER_OPEN_SEC:
+                st = HALF_OPEN
+            return {"state": st, "fails": self.fails, "trips": self.trips,
+                    "short_circuited": self.short_circuited, "last_error": self.last_error,
+                    "open_for_sec": round(time.time() - self.opened_at, 1) if st != CLOSED else 0}
+
+class TokenBucket:
+    """預約式 token bucket：reserve() 立即扣 token 並回傳需等待的秒數（不在鎖內 sleep，同步/async 共用）"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = MAX_WAIT_SEC) -> Optional[float]:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+_buckets: Dict[str, TokenBucket] = {}
+_breakers: Dict[str, Breaker] = {}
+_negative: Dict[str, Tuple[float, str]] = {}     # key -> (到期時間, 錯誤摘要)
+_stats: Dict[str, Dict[str, float]] = {}
+_lock = threading.Lock()
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc
+
+def _bucket(host: str) -> Optional[TokenBucket]:
+    conf = RATE_LIMITS.get(host)
+    if conf is None:
+        return None
+    with _lock:
+        b = _buckets.get(host)
+        if b is None:
+            b = _buckets[host] = TokenBucket(*conf)
+    return b
+
+def _breaker(host: str) -> Breaker:
+    with _lock:
+        b = _breakers.get(host)
+        if b is None:
+            b = _breakers[host] = Breaker(host)
+    return b
+
+def _neg_key(method: str, url: str, kw: Dict[str, Any]) -> Optional[str]:
+    if method != "GET":
+        return None
+    params = kw.get("params") or {}
+    return url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+def _neg_check(key: Optional[str]) -> None:
+    if key is None:
+        return
+    with _lock:
+        hit = _negative.get(key)
+        if hit and hit[0] > time.time():
+            raise CircuitOpen(f"recent failure cached: {hit[1]}")
+        if hit:
+            _negative.pop(key, None)
+
+def _neg_put(key: Optional[str], err: str) -> None:
+    if key is None:
+        return
+    with _lock:
+        if len(_negative) > 500:
+            now = time.time()
+            for k in [k for k, v in _negative.items() if v[0] <= now]:
+                _negative.pop(k, None)
+        _negative[key] = (time.time() + NEG_TTL_SEC, err[:200])
+
+def _is_upstream_fault(r: Optional[httpx.Response]) -> bool:
+    # 連線/逾時錯誤、5xx、429 才算上游故障；其他 4xx 是請求本身的問題
+    return r is None or r.status_code >= 500 or r.status_code == 429
+
+def _stat(host: str) -> Dict[str, float]:
+    with _lock:
+        s = _stats.get(host)
+        if s is None:
+            s = _stats[host] = {"requests": 0, "errors": 0, "throttled": 0, "rejected": 0,
+                                "wait_ms_sum": 0.0, "wait_ms_max": 0.0}
+    return s
+
+def _reserve(url: str) -> Tuple[str, float]:
+    host = _host(url)
+    s = _stat(host)
+    b = _bucket(host)
+    wait = b.reserve() if b else 0.0
+    with _lock:
+        if wait is None:
+            s["rejected"] += 1
+            raise RateLimited(f"{host} rate limit: queue longer than {MAX_WAIT_SEC:.0f}s")
+        s["requests"] += 1
+        if wait > 0:
+            s["throttled"] += 1
+            s["wait_ms_sum"] += wait * 1000
+            s["wait_ms_max"] = max(s["wait_ms_max"], wait * 1000)
+    return host, wait
+
+def _before(method: str, url: str, kw: Dict[str, Any]) -> Tuple[str, float, Optional[str], Breaker]:
+    deadline.timeout(kw.get("timeout") or DEFAULT_TIMEOUT)     # 預算已耗盡就不必排隊
+    nk = _neg_key(method, url, kw)
+    _neg_check(nk)
+    br = _breaker(_host(url))
+    br.allow()
+    try:
+        host, wait = _reserve(url)
+        left = deadline.remaining()
+        if left is not None and wait + deadline.MIN_CALL_SEC > left:
+            raise deadline.DeadlineExceeded(f"{host} rate-limit wait {wait:.1f}s exceeds budget")
+    except Exception:
+        br.release()
+        raise
+    return host, wait, nk, br
+
+def _budget(kw: Dict[str, Any]) -> bool:
+    """套用剩餘預算到 timeout；回傳是否被縮短（縮短後的逾時不算上游故障）"""
+    want = kw.get("timeout") or DEFAULT_TIMEOUT
+    kw["timeout"] = deadline.timeout(want)
+    return kw["timeout"] < want
+
+def _fault(e: BaseException, shrunk: bool) -> bool:
+    if shrunk and isinstance(e, httpx.TimeoutException):
+        return False
+    return isinstance(e, httpx.TransportError)
+
+def _failed(host: str, nk: Optional[str], br: Breaker, err: str, fault: bool) -> None:
+    with _lock:
+        _stats[host]["errors"] += 1
+    if fault:
+        br.failure(err)
+        _neg_put(nk, err)
+    else:
+        br.release()
+
+def _done(host: str, nk: Optional[str], br: Breaker, r: httpx.Response) -> httpx.Response:
+    if r.is_error:
+        _failed(host, nk, br, f"HTTP {r.status_code}", _is_upstream_fault(r))
+    else:
+        br.success()
+    r.raise_for_status()
+    return r
+
+# ---------- 同步（排程/執行緒） ---------- #
+_client: Optional[httpx.Client] = None
+
+def client() -> httpx.Client:
+    global _client
+    if _client is None or _client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(headers=UA, timeout=DEFAULT_TIMEOUT, follow_redirects=True, limits=LIMITS)
+    return _client
+
+def _send(method: str, url: str, **kw) -> httpx.Response:
+    host, wait, nk, br = _before(method, url, kw)
+    if wait > 0:
+        time.sleep(wait)
+    shrunk = False
+    try:
+        shrunk = _budget(kw)
+        r = client().request(method, url, **kw)
+    except BaseException as e:
+        _failed(host, nk, br, f"{type(e).__name__}: {e}", _fault(e, shrunk))
+        raise
+    return _done(host, nk, br, r)
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = DEFAULT_TIMEOUT,
+        headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    return _send("GET", url, params=params, timeout=timeout, headers=headers)
+
+def post(url: str, data: Any = None, json: Any = None, timeout: float = DEFAULT_TIMEOUT,
+         headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    return _send("POST", url, data=data, json=json, timeout=timeout, headers=headers)
+
+def close() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        _client.close()
+    _client = None
+
+atexit.register(close)
+
+# ---------- async（webhook） ---------- #
+_aclient: Optional[httpx.AsyncClient] = None
+
+def aclient() -> httpx.AsyncClient:
+    global _aclient
+    if _aclient is None or _aclient.is_closed:
+        _aclient = httpx.AsyncClient(headers=UA, timeout=DEFAULT_TIMEOUT, follow_redirects=True, limits=LIMITS)
+    return _aclient
+
+async def _asend(method: str, url: str, **kw) -> httpx.Response:
+    host, wait, nk, br = _before(method, url, kw)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    shrunk = False
+    try:
+        shrunk = _budget(kw)
+        r = await aclient().request(method, url, **kw)
+    except BaseException as e:
+        _failed(host, nk, br, f"{type(e).__name__}: {e}", _fault(e, shrunk))
+        raise
+    return _done(host, nk, br, r)
+
+async def aget(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = DEFAULT_TIMEOUT,
+               headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    return await _asend("GET", url, params=params, timeout=timeout, headers=headers)
+
+async def apost(url: str, data: Any = None, json: Any = None, timeout: float = DEFAULT_TIMEOUT,
+                headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    return await _asend("POST", url, data=data, json=json, timeout=timeout, headers=headers)
+
+async def aclose() -> None:
+    global _aclient
+    if _aclient is not None and not _aclient.is_closed:
+        await _aclient.aclose()
+    _aclient = None
+
+# ---------- 觀測 ---------- #
+def stats() -> Dict[str, Any]:
+    with _lock:
+        hosts = {}
+        for h, s in _stats.items():
+            b = _buckets.get(h)
+            hosts[h] = {
+                "requests": int(s["requests"]), "errors": int(s["errors"]),
+                "throttled": int(s["throttled"]), "rejected": int(s["rejected"]),
+                "wait_ms_avg": round(s["wait_ms_sum"] / max(1, s["throttled"]), 1),
+                "wait_ms_max": round(s["wait_ms_max"], 1),
+                "limit": {"rate": b.rate, "burst": b.burst} if b else None,
+            }
+    return {"hosts": hosts, "max_wait_sec": MAX_WAIT_SEC}
+
+def breakers() -> Dict[str, Any]:
+    with _lock:
+        items = list(_breakers.items())
+        now = time.time()
+        neg = sum(1 for v in _negative.values() if v[0] > now)
+    return {"breakers": {h: b.status() for h, b in items}, "negative_cached": neg,
+            "fails_to_open": BREAKER_FAILS, "open_sec": BREAKER_OPEN_SEC, "neg_ttl_sec": NEG_TTL_SEC}
@@ -0,0 +1,75 @@
+# app/us_breadth.py 〔v8R7-USB〕
+# 美股廣度引擎：S&P 500 成分股（約 503 檔）。
+# - 成分股清單存本機檔（SENTINEL_SP500），每週更新一次；更新失敗沿用舊檔
+# - 報價走統一報價服務（大 chunk 並行抓，3 個請求掃完）
+# - 漲跌家數、等權 vs 市值加權報酬、類股離散度一次用 NumPy 算完；
+#   最新結果寫入共用 SQLite，各 worker 的 format_us_block 與徽章只讀它，不自行抓取（骨架見 market_scan）
+from __future__ import annotations
+import os, csv, io
+from typing import Any, Dict, List
+import numpy as np
+from app import upstream
+from app.market_scan import CachedList, MarketScan, column, sector_stats, sector_rows
+
+CONSTITUENTS_PATH = os.environ.get("SENTINEL_SP500", "/tmp/sentinel-v8-sp500.json")
+CONSTITUENTS_MAX_AGE_SEC = int(os.environ.get("SENTINEL_SP500_MAX_AGE", str(7 * 86400)))
+CONSTITUENTS_CSV = os.environ.get(
+    "SENTINEL_SP500_URL",
+    "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/main/data/constituents.csv")
+SCAN_CHUNK_SIZE = 200
+LATEST_MAX_AGE_OPEN = 900        # 盤中：15 分鐘內的結果才算數
+LATEST_MAX_AGE_CLOSED = 18 * 3600
+RISK_ON_PCT_CAP = 3.0            # Risk-On：平均漲跌幅 ±3% 封頂
+LATEST_KEY = "us_breadth"
+
+def _parse(text: str) -> List[Dict[str, str]]:
+    out = []
+    for r in csv.DictReader(io.StringIO(text)):
+        sym = (r.get("Symbol") or "").strip().upper()
+        if not sym:
+            continue
+        # Yahoo 用連字號（BRK.B → BRK-B）
+        out.append({"symbol": sym.replace(".", "-"),
+                    "name": (r.get("Security") or r.get("Name") or sym).strip(),
+                    "sector": (r.get("GICS Sector") or r.get("Sector") or "Other").strip()})
+    return out
+
+def _download() -> List[Dict[str, str]]:
+    return _parse(upstream.get(CONSTITUENTS_CSV, timeout=15).text)
+
+def risk_on_from(adv_ratio: float, mean_pct: float) -> int:
+    """Risk-On 指數（0~100）：一半看上漲比例（廣度），一半看平均漲跌幅"""
+    momentum = float(np.clip(mean_pct / RISK_ON_PCT_CAP, -1.0, 1.0))
+    return int(round(50 * adv_ratio + 25 * (1 + momentum)))
+
+def _summarize(items: List[Dict[str, str]], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    pct, cap = column(items, rows, "pct"), column(items, rows, "cap")
+    names, ok, p, s, n, avg = sector_stats(items, pct, "S&P 500 報價全數取得失敗")
+    w = np.nan_to_num(cap[ok], nan=0.0)
+    eq = float(p.mean())
+    adv, dec = int((p > 0).sum()), int((p < 0).sum())
+    return {
+        "total": len(items), "quoted": int(p.size),
+        "adv": adv, "dec": dec, "unch": int(p.size - adv - dec),
+        "eq_ret": round(eq, 2),
+        "cap_ret": round(float((w * p).sum() / w.sum()), 2) if w.sum() > 0 else None,
+        "dispersion": round(float(avg[n > 0].std()), 2),    # 類股平均報酬的橫斷面標準差
+        "risk_on": risk_on_from(adv / p.size, eq),
+        "sectors": sector_rows(names, n, avg),
+    }
+
+_CONSTITUENTS = CachedList(CONSTITUENTS_PATH, CONSTITUENTS_MAX_AGE_SEC, _download, "USB")
+_SCAN = MarketScan("USB", "US", _CONSTITUENTS, LATEST_KEY, _summarize, chunk_size=SCAN_CHUNK_SIZE,
+                   max_age_open=LATEST_MAX_AGE_OPEN, max_age_closed=LATEST_MAX_AGE_CLOSED,
+                   no_list_msg="S&P 500 成分股清單取得失敗")
+constituents = _CONSTITUENTS.items
+scan = _SCAN.scan
+latest = _SCAN.latest
+status = _SCAN.status
+
+def breadth_line(res: Dict[str, Any]) -> str:
+    line = f"S&P 500 廣度：漲 {res['adv']}／跌 {res['dec']}｜等權 {res['eq_ret']:+.1f}%"
+    if res.get("cap_ret") is not None:
+        line += f"／市值權 {res['cap_ret']:+.1f}%"
+    return f"{line}｜類股離散 {res['dispersion']:.1f}"
+
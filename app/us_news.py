@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import List, Dict
-from app import news_scoring
+from app import news_scoring, deadline
 
 # 你可增減
 US_SYMBOLS_NEWS = [
@@ -8,17 +8,43 @@ US_SYMBOLS_NEWS = [
     "AAPL", "NVDA", "MSFT", "AMZN", "TSLA", "META", "GOOGL", "AMD", "NFLX", "JPM"
 ]
 
-def us_recent_news(k_each: int = 2) -> Dict[str, List[Dict]]:
-    # 對上述關鍵字逐一收集中文新聞（利用 news_scoring 的翻譯/加權/快取）
+# 冷啟動同步抓新聞所需的最低預算；預算偏緊時只抓會顯示的前幾個主題
+COLD_FETCH_MIN_SEC = 4.0
+ALL_TOPICS_MIN_SEC = 12.0
+
+def _cold_topics(max_topics: int | None) -> List[str]:
+    if not deadline.allows(COLD_FETCH_MIN_SEC):
+        return []
+    if max_topics and not deadline.allows(ALL_TOPICS_MIN_SEC):
+        return US_SYMBOLS_NEWS[:max_topics]
+    return US_SYMBOLS_NEWS
+
+def us_recent_news(k_each: int = 2, max_topics: int | None = None) -> Dict[str, List[Dict]]:
+    # 讀背景預算好的中文新聞（news_refresher）；冷啟動尚無任何預算結果時才同步抓取（受請求預算限制）
+    peeks = news_scoring.peek_many(US_SYMBOLS_NEWS, k=k_each)
+    if any(peeks.values()):
+        hmap = {s: (p["headlines"] if p else []) for s, p in peeks.items()}
+    else:
+        topics = _cold_topics(max_topics)
+        hmap = news_scoring.batch_recent_headlines(topics, k=k_each) if topics else {}
     out: Dict[str, List[Dict]] = {}
     for kw in US_SYMBOLS_NEWS:
-        heads = news_scoring.recent_headlines(kw, k=k_each)
+        heads = hmap.get(kw.upper())
         if heads:
             out[kw] = heads
     return out
 
-def format_us_news_block(k_each: int = 2, max_topics: int = 6) -> str:
-    m = us_recent_news(k_each=k_each)
+async def aus_recent_news(k_each: int = 2, max_topics: int | None = None) -> Dict[str, List[Dict]]:
+    peeks = news_scoring.peek_many(US_SYMBOLS_NEWS, k=k_each)
+    if any(peeks.values()):
+        hmap = {s: (p["headlines"] if p else []) for s, p in peeks.items()}
+    else:
+        topics = _cold_topics(max_topics)
+        hmap = await news_scoring.abatch_recent_headlines(topics, k=k_each) if topics else {}
+    return {kw: hmap[kw.upper()] for kw in US_SYMBOLS_NEWS if hmap.get(kw.upper())}
+
+def format_us_news_block(k_each: int = 2, max_topics: int = 6, news: Dict[str, List[Dict]] | None = None) -> str:
+    m = news if news is not None else us_recent_news(k_each=k_each, max_topics=max_topics)
     if not m:
         return "🗞️ 美股新聞：暫無重點或取得失敗。"
     lines = ["🗞️ 美股新聞重點（中文）"]
@@ -32,3 +58,6 @@ def format_us_news_block(k_each: int = 2, max_topics: int = 6) -> str:
         if count >= max_topics:
             break
     return "\n".join(lines)
+
+async def aformat_us_news_block(k_each: int = 2, max_topics: int = 6) -> str:
+    return format_us_news_block(k_each=k_each, max_topics=max_topics, news=await aus_recent_news(k_each=k_each, max_topics=max_topics))
@@ -1,26 +1,37 @@
 # app/us_stocks.py 〔v8R7〕
 # 美股雷達：Stooq/或現行資料源 → 三行分組 & 詳細清單；支援 show_price
 from __future__ import annotations
-import math
-import requests
+import math, asyncio
+from typing import Optional
+import numpy as np
+from app import quotes, us_breadth
 
 US_SYMBOLS = ["NVDA","MSFT","AAPL","AMZN","GOOGL","META","TSLA","INTC","AMD","PLTR"]
 
-# 這裡示範用 Yahoo quote（免金鑰）；你原本若有 stooq 可保留原邏輯，回傳結構一致即可
 def _yahoo_quote(symbols: list[str]) -> list[dict]:
-    url = "https://query1.finance.yahoo.com/v7/finance/quote"
-    q = ",".join(symbols)
-    r = requests.get(url, params={"symbols": q}, timeout=10)
-    r.raise_for_status()
-    data = r.json().get("quoteResponse", {}).get("result", [])
-    out = []
-    for d in data:
-        sym = d.get("symbol", "")
-        price = d.get("regularMarketPrice")
-        pct = d.get("regularMarketChangePercent")
-        name = d.get("shortName") or sym
-        out.append({"symbol": sym, "name": name, "price": price, "pct": pct})
-    return out
+    # 走統一報價服務（跨市場合併請求 + 依交易時段的 TTL 快取）
+    return quotes.get_quotes(symbols)
+
+async def _ayahoo_quote(symbols: list[str]) -> list[dict]:
+    return await asyncio.to_thread(quotes.get_quotes, symbols)
+
+def cached_quotes(max_age: int) -> Optional[list[dict]]:
+    # 徽章用：只讀報價服務的快取，不觸發抓取
+    return quotes.peek(US_SYMBOLS, max_age=max_age) or None
+
+# Risk-On 指數（0~100）：有 S&P 500 廣度彙整時以它為準；否則退回觀察清單十檔
+def risk_on_index(rows: list[dict]) -> Optional[int]:
+    pct = np.array([r["pct"] for r in rows if r.get("pct") is not None], dtype=float)
+    pct = pct[~np.isnan(pct)]
+    if pct.size == 0:
+        return None
+    return us_breadth.risk_on_from(float((pct > 0).mean()), float(pct.mean()))
+
+def risk_on(rows: list[dict] | None = None, max_age: Optional[int] = None) -> Optional[int]:
+    b = us_breadth.latest(max_age)
+    if b is not None:
+        return b["risk_on"]
+    return risk_on_index(rows) if rows else None
 
 def _fmt_pct(p):
     if p is None or (isinstance(p, float) and math.isnan(p)):
@@ -44,14 +55,19 @@ def _group_three_lines(rows: list[dict], show_price: bool) -> str:
     def join(lst): return "｜".join(cell(r) for r in lst if r.get("pct") is not None)
     return "\n".join([s for s in [join(line1), join(line2), join(line3)] if s])
 
-def format_us_block(phase: str = "night", show_price: bool = True) -> str:
-    rows = _yahoo_quote(US_SYMBOLS)
+def format_us_block(phase: str = "night", show_price: bool = True, rows: list[dict] | None = None) -> str:
+    rows = rows if rows is not None else _yahoo_quote(US_SYMBOLS)
     header = "📈 美股開盤雷達" if phase == "night" else "📈 美股隔夜回顧"
+    ro = risk_on(rows)
+    if ro is not None:
+        header = f"{header}｜Risk-On：{ro}"
     tri = _group_three_lines(rows, show_price=show_price)
-    return f"{header}\n{tri}"
+    # 全市場廣度：只讀排程定時彙整的結果，不在報表裡觸發掃描
+    b = us_breadth.latest()
+    return f"{header}\n{tri}\n{us_breadth.breadth_line(b)}" if b else f"{header}\n{tri}"
 
-def format_us_full(show_price: bool = True) -> str:
-    rows = _yahoo_quote(US_SYMBOLS)
+def format_us_full(show_price: bool = True, rows: list[dict] | None = None) -> str:
+    rows = rows if rows is not None else _yahoo_quote(US_SYMBOLS)
     lines = ["📈 美股觀察清單（十巨頭）"]
     for r in rows:
         if show_price:
@@ -59,3 +75,6 @@ def format_us_full(show_price: bool = True) -> str:
         else:
             lines.append(f"{r['symbol']} {_fmt_pct(r['pct'])}")
     return "\n".join(lines)
+
+async def aformat_us_full(show_price: bool = True) -> str:
+    return format_us_full(show_price=show_price, rows=await _ayahoo_quote(US_SYMBOLS))
@@ -0,0 +1,63 @@
+# tests/test_deadline.py
+# 預算 scope 巢狀取較緊者、detached 脫離、allows/timeout 判斷、bind 帶進自建執行緒
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import deadline
+
+def test_no_scope_allows_everything():
+    assert deadline.current() is None
+    assert deadline.remaining() is None
+    assert deadline.allows(1e9)
+    assert deadline.timeout(7.0) == 7.0
+
+def test_nested_scope_keeps_tighter_outer():
+    with deadline.scope(2) as outer:
+        with deadline.scope(60) as inner:
+            assert inner is outer
+            assert deadline.remaining() <= 2
+            assert not deadline.allows(5)
+        assert deadline.current() is outer
+    assert deadline.current() is None
+
+def test_nested_scope_can_tighten():
+    with deadline.scope(60) as outer:
+        with deadline.scope(1) as inner:
+            assert inner is not outer
+            assert deadline.remaining() <= 1
+        assert deadline.current() is outer
+        assert deadline.allows(30)
+
+def test_detached_drops_budget():
+    with deadline.scope(1):
+        with deadline.detached():
+            assert deadline.current() is None
+            assert deadline.allows(100)
+        assert deadline.current() is not None
+
+def test_timeout_shrinks_and_exhausts():
+    with deadline.scope(2):
+        assert deadline.timeout(10) <= 2
+        assert deadline.timeout(0.5) == 0.5
+    with deadline.scope(0):
+        assert not deadline.allows(deadline.MIN_CALL_SEC)
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.timeout(10)
+
+def test_bind_carries_scope_into_thread_pool():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with deadline.scope(3) as d:
+            assert pool.submit(deadline.current).result() is None
+            assert pool.submit(deadline.bind(deadline.current)).result() is d
+
+def test_async_tasks_each_see_their_own_scope():
+    async def run(budget):
+        with deadline.scope(budget) as d:
+            await asyncio.sleep(0)
+            return deadline.current() is d and deadline.remaining() <= budget
+
+    async def main():
+        return await asyncio.gather(run(1), run(5), run(9))
+    assert asyncio.run(main()) == [True, True, True]
@@ -0,0 +1,37 @@
+# tests/test_lexicon.py
+# Lexicon.hits 必須與舊的「逐一 re.search」迴圈完全一致（情緒詞庫與政策詞庫皆然）
+import random
+import re
+
+import pytest
+
+from app.lexicon import Lexicon
+from app.news_scoring import BULLY, BEARY
+from app.badges_radar import POLICY_POS, POLICY_NEG
+
+LEXICONS = [(BULLY, BEARY), (POLICY_POS, POLICY_NEG)]
+
+def _loop(pos, neg, text):
+    return ({i for i, p in enumerate(pos) if re.search(p, text, re.I)},
+            {i for i, p in enumerate(neg) if re.search(p, text, re.I)})
+
+def _titles(pos, neg, n=5000, seed=7):
+    rng = random.Random(seed)
+    words = [re.sub(r"\\(.)", r"\1", p) for p in pos + neg]
+    words += ["ETF", "SEC", "申請", "但", "另一檔", "獲", "ed", "-off", " ", "，", "BTC", "Approved", "SELL"]
+    return ["".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(n)]
+
+def test_policy_regression_example():
+    lex = Lexicon(pos=POLICY_POS, neg=POLICY_NEG)
+    text = "SEC 對 ETF 申請延後，但另一檔獲批准"
+    assert lex.hits(text) == _loop(POLICY_POS, POLICY_NEG, text)
+
+@pytest.mark.parametrize("pos,neg", LEXICONS)
+def test_hits_match_per_pattern_loop(pos, neg):
+    lex = Lexicon(pos=pos, neg=neg)
+    for t in _titles(pos, neg):
+        assert lex.hits(t) == _loop(pos, neg, t), t
+
+def test_overlapping_literals():
+    lex = Lexicon(pos=["approve", "approved"], neg=["sell", "sell\\-off"])
+    assert lex.hits("Approved after sell-off") == ({0, 1}, {0, 1})
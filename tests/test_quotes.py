@@ -0,0 +1,83 @@
+# tests/test_quotes.py
+# 交易時段判斷、依時段選 TTL，以及快取命中/過期重抓/抓不到回退舊值
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app import quotes
+
+TPE = ZoneInfo("Asia/Taipei")
+NY = ZoneInfo("America/New_York")
+
+def _ts(tz, *a):
+    return datetime(*a, tzinfo=tz).timestamp()
+
+@pytest.mark.parametrize("market,ts,want", [
+    ("TW", _ts(TPE, 2026, 10, 14, 10, 0), True),      # 週三盤中
+    ("TW", _ts(TPE, 2026, 10, 14, 13, 30), True),     # 收盤那一刻
+    ("TW", _ts(TPE, 2026, 10, 14, 13, 31), False),
+    ("TW", _ts(TPE, 2026, 10, 14, 8, 59), False),
+    ("TW", _ts(TPE, 2026, 10, 17, 10, 0), False),     # 週六
+    ("US", _ts(NY, 2026, 10, 14, 9, 30), True),
+    ("US", _ts(NY, 2026, 10, 14, 16, 1), False),
+    ("US", _ts(TPE, 2026, 10, 14, 22, 0), True),      # 台北晚上 = 紐約上午
+])
+def test_session_open(market, ts, want):
+    assert quotes.session_open(market, ts) is want
+
+def test_ttl_follows_symbol_market():
+    tw_open = _ts(TPE, 2026, 10, 14, 10, 0)           # 台股盤中、美股休市（紐約凌晨）
+    assert quotes.market_of("2330.TW") == "TW" and quotes.market_of("6488.TWO") == "TW"
+    assert quotes.market_of("%5ETWII") == "TW" and quotes.market_of("AAPL") == "US"
+    assert quotes.ttl_for("2330.TW", tw_open) == quotes.TTL_OPEN_SEC
+    assert quotes.ttl_for("AAPL", tw_open) == quotes.TTL_CLOSED_SEC
+    us_open = _ts(NY, 2026, 10, 14, 11, 0)
+    assert quotes.ttl_for("2330.TW", us_open) == quotes.TTL_CLOSED_SEC
+    assert quotes.ttl_for("AAPL", us_open) == quotes.TTL_OPEN_SEC
+
+@pytest.fixture
+def fake_yahoo(monkeypatch):
+    calls = []
+    state = {"fail": False, "price": 1.0}
+
+    def fetch_chunk(chunk):
+        calls.append(list(chunk))
+        if state["fail"]:
+            raise RuntimeError("down")
+        return {s: {"symbol": s, "name": s, "price": state["price"], "pct": 0.0, "cap": None} for s in chunk}
+
+    monkeypatch.setattr(quotes, "_fetch_chunk", fetch_chunk)
+    monkeypatch.setattr(quotes, "_cache", {})
+    monkeypatch.setattr(quotes, "_inflight", {})
+    return calls, state
+
+def _expire(symbols):
+    for s in symbols:
+        ts, q = quotes._cache[s]
+        quotes._cache[s] = (ts - quotes.TTL_CLOSED_SEC - 1, q)
+
+def test_fresh_cache_is_not_refetched(fake_yahoo):
+    calls, _ = fake_yahoo
+    syms = ["2330.TW", "AAPL", "MSFT"]
+    assert [q["symbol"] for q in quotes.get_quotes(syms, chunk_size=2)] == syms
+    assert calls == [["2330.TW", "AAPL"], ["MSFT"]]
+    quotes.get_quotes(syms)
+    assert len(calls) == 2
+
+def test_expired_refetched_and_stale_served_on_failure(fake_yahoo):
+    calls, state = fake_yahoo
+    quotes.get_quotes(["AAPL"])
+    _expire(["AAPL"])
+    state["price"] = 2.0
+    assert quotes.get_quotes(["AAPL"])[0]["price"] == 2.0
+    _expire(["AAPL"])
+    state["fail"] = True
+    assert quotes.get_quotes(["AAPL"])[0]["price"] == 2.0    # 寧可舊，不要空
+    assert len(calls) == 3
+
+def test_no_cache_and_failure_raises(fake_yahoo):
+    _, state = fake_yahoo
+    state["fail"] = True
+    with pytest.raises(RuntimeError):
+        quotes.get_quotes(["NVDA"])
@@ -0,0 +1,69 @@
+# tests/test_rank_engine.py
+# rank_engine 與舊版純 Python 排名比對：百分位（同值共享平均名次）、top_n 排序與穩定性
+import random
+
+import numpy as np
+import pytest
+
+from app import rank_engine
+
+def _old_vol_rank(vols):
+    # 舊版 build_table 的 vol_rank（值皆相異時與 pct_rank 相同）
+    sv = sorted(vols)
+    def rank(v):
+        if len(sv) <= 1:
+            return 0.5
+        pos = 0
+        for i, x in enumerate(sv):
+            if v >= x:
+                pos = i
+        return pos / (len(sv) - 1)
+    return [rank(v) for v in vols]
+
+def _avg_rank(vals):
+    # 同值取平均名次的參考實作
+    sv = sorted(vals)
+    n = len(vals)
+    return [((sv.index(v) + n - 1 - sv[::-1].index(v)) / 2) / (n - 1) for v in vals]
+
+def _old_choose_top(pct, total, n):
+    # 舊版 choose_top：依總分穩定排序後，多取 pct>=0 前 n、空取 pct<0 總分最低 n
+    rows = sorted(range(len(total)), key=lambda i: total[i], reverse=True)
+    longs = [i for i in rows if pct[i] >= 0][:n]
+    shorts = sorted([i for i in rows if pct[i] < 0], key=lambda i: total[i])[:n]
+    return longs, shorts
+
+def test_pct_rank_small_cases():
+    assert rank_engine.pct_rank([]).size == 0
+    assert rank_engine.pct_rank([7.0]).tolist() == [0.5]
+    assert rank_engine.pct_rank([3, 1, 2]).tolist() == [1.0, 0.0, 0.5]
+
+def test_pct_rank_ties_share_average_rank():
+    got = rank_engine.pct_rank([5, 1, 5, 5, 0])
+    assert got.tolist() == pytest.approx([0.75, 0.25, 0.75, 0.75, 0.0])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pct_rank_matches_reference(seed):
+    rng = random.Random(seed)
+    distinct = rng.sample(range(10_000), 200)
+    assert rank_engine.pct_rank(distinct).tolist() == pytest.approx(_old_vol_rank(distinct))
+    tied = [rng.randint(0, 20) for _ in range(200)]
+    assert rank_engine.pct_rank(tied).tolist() == pytest.approx(_avg_rank(tied))
+
+@pytest.mark.parametrize("seed", range(20))
+def test_pick_long_short_matches_old_choose_top(seed):
+    rng = random.Random(seed)
+    n = rng.randint(0, 60)
+    pct = [rng.choice([-5.0, -1.0, 0.0, 2.0, 8.0]) * rng.random() for _ in range(n)]
+    total = [round(rng.choice([0, 10, 20, 30]) + rng.randint(0, 3) * 0.5, 1) for _ in range(n)]   # 大量同分
+    for k in (0, 1, 3, 10, 100):
+        longs, shorts = rank_engine.pick_long_short(pct, total, k)
+        assert (longs.tolist(), shorts.tolist()) == _old_choose_top(pct, total, k)
+
+def test_top_n_ties_keep_original_order():
+    v = np.array([1.0, 3.0, 3.0, 2.0, 3.0])
+    assert rank_engine.top_n(v, 2).tolist() == [1, 2]
+    assert rank_engine.top_n(v, 2, largest=False).tolist() == [0, 3]
+    assert rank_engine.top_n(v, 3, mask=v != 2.0).tolist() == [1, 2, 4]
+    assert rank_engine.rank_desc(v).tolist() == [1, 2, 4, 3, 0]
+    assert rank_engine.top_n(v, 0).size == 0
@@ -0,0 +1,97 @@
+# tests/test_state_store.py
+# 逐鍵 upsert/刪除，以及他程序寫入時以 data_version 偵測、只合併別人改過的鍵（本地未存修改優先）
+import json
+import sqlite3
+
+import pytest
+
+from app import state_store as ss
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ss, "DB_PATH", str(tmp_path / "state.sqlite"))
+    monkeypatch.setattr(ss, "STATE_PATH", str(tmp_path / "legacy.json"))
+    monkeypatch.setattr(ss, "_conn", None)
+    monkeypatch.setattr(ss, "_state_cache", None)
+    monkeypatch.setattr(ss, "_persisted", {})
+    monkeypatch.setattr(ss, "_data_version", -1)
+    monkeypatch.setattr(ss, "_blobs", {})
+    yield ss
+    if ss._conn is not None:
+        ss._conn.close()
+
+def _rows(path):
+    with sqlite3.connect(path) as c:
+        return {(ns, k): json.loads(v) for ns, k, v in c.execute("SELECT ns, k, v FROM kv")}
+
+def _other_write(path, ns, k, v):
+    # 另一個程序：自己的連線直接寫 kv（與 state_store 同樣的 JSON 編碼）
+    c = sqlite3.connect(path, isolation_level=None)
+    if v is None:
+        c.execute("DELETE FROM kv WHERE ns = ? AND k = ?", (ns, k))
+    else:
+        c.execute("INSERT INTO kv (ns, k, v) VALUES (?, ?, ?) ON CONFLICT(ns, k) DO UPDATE SET v = excluded.v",
+                  (ns, k, ss._dump(v)))
+    c.close()
+
+def test_defaults_and_per_key_rows(store):
+    st = store.get_state()
+    assert st["prefs"]["color_scheme"] == "tw" and st["watches"] == {}
+    store.set_pref("show_price", False)
+    store.set_watch("btc", 2_000_000_000)
+    st["note"] = "x"; store.save_state()
+    rows = _rows(store.DB_PATH)
+    assert rows[("prefs", "show_price")] is False
+    assert rows[("watches", "BTC")]["until"] == 2_000_000_000
+    assert rows[("meta", "note")] == "x"
+
+def test_save_only_writes_changed_keys(store, monkeypatch):
+    store.set_pref("a", 1)
+    store.set_pref("b", 2)
+    seen = []
+    real = store._write
+    monkeypatch.setattr(store, "_write", lambda up, dl: (seen.append((dict(up), list(dl))), real(up, dl)))
+    store.get_state()["prefs"]["b"] = 3
+    store.save_state()
+    assert seen == [({("prefs", "b"): "3"}, [])]
+    store.del_watch("nothing")
+    store.get_state()["prefs"].pop("a")
+    store.save_state()
+    assert seen[-1] == ({}, [("prefs", "a")])
+    assert ("prefs", "a") not in _rows(store.DB_PATH)
+
+def test_merges_other_writers_keys(store):
+    store.set_pref("mine", 1)
+    _other_write(store.DB_PATH, "prefs", "theirs", "v")
+    _other_write(store.DB_PATH, "watches", "ETH", {"until": 5, "last_alert": 0})
+    st = store.get_state()
+    assert st["prefs"]["theirs"] == "v" and st["prefs"]["mine"] == 1
+    assert "ETH" in st["watches"]
+    _other_write(store.DB_PATH, "watches", "ETH", None)
+    assert "ETH" not in store.get_state()["watches"]
+
+def test_unsaved_local_edit_wins_conflict(store):
+    store.set_pref("k", "base")
+    store.get_state()["prefs"]["k"] = "local"          # 尚未 save
+    _other_write(store.DB_PATH, "prefs", "k", "remote")
+    assert store.get_state()["prefs"]["k"] == "local"
+    store.save_state()
+    assert _rows(store.DB_PATH)[("prefs", "k")] == "local"
+
+def test_remote_change_applies_when_local_clean(store):
+    store.set_pref("k", "base")
+    _other_write(store.DB_PATH, "prefs", "k", "remote")
+    assert store.get_state()["prefs"]["k"] == "remote"
+    store.save_state()                                  # 沒有本地修改：不寫回舊值
+    assert _rows(store.DB_PATH)[("prefs", "k")] == "remote"
+
+def test_blob_roundtrip_and_cross_writer(store):
+    store.put_blob("scan", {"n": 1})
+    assert store.get_blob("scan") == {"n": 1}
+    c = sqlite3.connect(store.DB_PATH, isolation_level=None)
+    c.execute("UPDATE blob SET v = ? WHERE k = ?", (ss._dump({"n": 2}), "scan"))
+    c.close()
+    assert store.get_blob("scan") == {"n": 2}
+    assert store.get_blob("missing") is None
+    store.put_blob("swr::a", 1); store.put_blob("swr::b", 2)
+    assert store.get_blobs("swr::") == {"swr::a": 1, "swr::b": 2}
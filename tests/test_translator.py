@@ -0,0 +1,43 @@
+# tests/test_translator.py
+# 批次翻譯的純函式：拆行對齊、繁中判斷、依字數/則數切請求
+import pytest
+
+from app import translator
+from app.translator import _chunks, _split_lines, is_traditional_zh
+
+def test_split_lines_aligned():
+    assert _split_lines("甲\n 乙 \n丙\n", 3) == ["甲", "乙", "丙"]
+
+@pytest.mark.parametrize("joined,n", [
+    ("甲\n乙", 3),          # 行數少了（翻譯合併了兩行）
+    ("甲\n乙\n丙", 2),      # 行數多了
+    ("甲\n \n丙", 3),       # 有空行
+])
+def test_split_lines_mismatch_returns_none(joined, n):
+    assert _split_lines(joined, n) is None
+
+@pytest.mark.parametrize("text,want", [
+    ("比特幣 ETF 獲批准，價格創新高", True),
+    ("美國證券交易委員會延後決定", True),
+    ("比特币价格上涨", False),               # 簡體
+    ("ビットコイン価格が上昇", False),         # 日文假名
+    ("Bitcoin ETF approved by SEC 新", False),  # 以英文為主
+    ("Bitcoin rallies", False),
+    ("", False),
+])
+def test_is_traditional_zh(text, want):
+    assert is_traditional_zh(text) is want
+
+def test_chunks_respect_item_limit(monkeypatch):
+    monkeypatch.setattr(translator, "BATCH_MAX_ITEMS", 3)
+    texts = {f"k{i}": "x" for i in range(7)}
+    assert _chunks(list(texts), texts) == [["k0", "k1", "k2"], ["k3", "k4", "k5"], ["k6"]]
+
+def test_chunks_respect_char_limit(monkeypatch):
+    monkeypatch.setattr(translator, "BATCH_MAX_CHARS", 10)
+    texts = {"a": "x" * 4, "b": "x" * 4, "c": "x" * 4, "d": "x" * 20}
+    # 每則算字數 +1（換行）：a+b=10 剛好，c 另起；超長的 d 自成一批
+    assert _chunks(list(texts), texts) == [["a", "b"], ["c"], ["d"]]
+
+def test_chunks_empty():
+    assert _chunks([], {}) == []
@@ -0,0 +1,112 @@
+# tests/test_upstream_breaker.py
+# 斷路器狀態轉換：closed → open → half-open（只放一個試探）→ closed / 重新 open；
+# 以及經 upstream.get 時哪些錯誤算上游故障（5xx/429/連線錯誤）、失敗快取
+import httpx
+import pytest
+
+from app import upstream
+from app.upstream import CLOSED, HALF_OPEN, OPEN, Breaker, CircuitOpen
+
+def _trip(b: Breaker) -> None:
+    for _ in range(upstream.BREAKER_FAILS):
+        b.allow()
+        b.failure("boom")
+
+def _age(b: Breaker) -> None:
+    b.opened_at -= upstream.BREAKER_OPEN_SEC + 1
+
+def test_opens_after_consecutive_failures():
+    b = Breaker("h")
+    for _ in range(upstream.BREAKER_FAILS - 1):
+        b.failure("boom")
+    assert b.state == CLOSED
+    b.failure("boom")
+    assert b.state == OPEN and b.trips == 1
+    with pytest.raises(CircuitOpen):
+        b.allow()
+    assert b.short_circuited == 1
+
+def test_success_resets_failure_count():
+    b = Breaker("h")
+    for _ in range(upstream.BREAKER_FAILS - 1):
+        b.failure("boom")
+    b.success()
+    b.failure("boom")
+    assert b.state == CLOSED
+
+def test_half_open_single_probe_then_close():
+    b = Breaker("h")
+    _trip(b)
+    _age(b)
+    assert b.status()["state"] == HALF_OPEN
+    b.allow()                       # 試探名額
+    assert b.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        b.allow()                   # 試探進行中，其餘照樣短路
+    b.success()
+    assert b.state == CLOSED and b.fails == 0
+    b.allow()
+
+def test_half_open_probe_failure_reopens():
+    b = Breaker("h")
+    _trip(b)
+    _age(b)
+    b.allow()
+    b.failure("still down")
+    assert b.state == OPEN and b.trips == 2
+    with pytest.raises(CircuitOpen):
+        b.allow()
+
+def test_half_open_release_keeps_state():
+    b = Breaker("h")
+    _trip(b)
+    _age(b)
+    b.allow()
+    b.release()                     # 試探以 4xx 結束：不改狀態，讓出名額
+    assert b.state == HALF_OPEN
+    b.allow()
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    calls = []
+    status = {"code": 200}
+
+    def handler(req: httpx.Request) -> httpx.Response:
+        calls.append(str(req.url))
+        return httpx.Response(status["code"], json={})
+
+    monkeypatch.setattr(upstream, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(upstream, "_breakers", {})
+    monkeypatch.setattr(upstream, "_negative", {})
+    monkeypatch.setattr(upstream, "_stats", {})
+    return calls, status
+
+def test_upstream_5xx_trips_breaker(mock_upstream):
+    calls, status = mock_upstream
+    status["code"] = 503
+    for i in range(upstream.BREAKER_FAILS):
+        with pytest.raises(httpx.HTTPStatusError):
+            upstream.get(f"http://down.test/x{i}")
+    assert upstream.breakers()["breakers"]["down.test"]["state"] == OPEN
+    with pytest.raises(CircuitOpen):
+        upstream.get("http://down.test/y")
+    assert len(calls) == upstream.BREAKER_FAILS      # 短路的請求沒有打出去
+
+def test_upstream_4xx_is_not_a_fault(mock_upstream):
+    calls, status = mock_upstream
+    status["code"] = 404
+    for i in range(upstream.BREAKER_FAILS + 2):
+        with pytest.raises(httpx.HTTPStatusError):
+            upstream.get(f"http://ok.test/x{i}")
+    assert upstream.breakers()["breakers"]["ok.test"]["state"] == CLOSED
+
+def test_upstream_negative_cache(mock_upstream):
+    calls, status = mock_upstream
+    status["code"] = 500
+    with pytest.raises(httpx.HTTPStatusError):
+        upstream.get("http://flaky.test/q", params={"a": 1})
+    with pytest.raises(CircuitOpen):
+        upstream.get("http://flaky.test/q", params={"a": 1})   # 同一 GET 短期直接回失敗
+    status["code"] = 200
+    assert upstream.get("http://flaky.test/q", params={"a": 2}).status_code == 200
+    assert len(calls) == 2